@@ -0,0 +1,106 @@
+"""
+Codec benchmark: ratio, compression and decompression speed per codec.
+
+Uses the members of real CBZ files when given (``--corpus``); otherwise a
+synthetic chapter mix: JPEG-like pages (entropy-coded, nearly
+incompressible), uncompressed scans with flat areas and noise, and
+ComicInfo.xml metadata.
+
+Usage:
+    python benchmarks/bench_codecs.py [--corpus DIR] [--codecs lzma:9 zstd:19 ...]
+"""
+
+import argparse
+import io
+import random
+import sys
+import time
+import zipfile
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from comick_merger.codecs_policy import available_codecs, parse_codec, write_member  # noqa: E402
+
+
+DEFAULT_CODECS = ["store", "deflate:1", "deflate:6", "deflate:9", "bzip2:9",
+                  "lzma:0", "lzma:6", "lzma:9", "zstd:3", "zstd:10", "zstd:19"]
+
+
+def synthetic_corpus(chapters: int, seed: int = 0) -> List[Tuple[str, bytes]]:
+    rng = random.Random(seed)
+    members = []
+    for chapter in range(chapters):
+        for page in range(20):
+            # JPEG: header and tables, then entropy-coded data
+            header = b"\xff\xd8\xff\xe0\x00\x10JFIF" + bytes(range(64)) * 4
+            members.append((f"ch{chapter:03d}/page_{page:03d}.jpg",
+                            header + rng.randbytes(rng.randrange(150_000, 400_000))))
+        for page in range(2):
+            # Uncompressed scan: white margins, grey gradients and some noise
+            rows = []
+            for row in range(600):
+                line = bytearray(b"\xff" * 800)
+                if 50 <= row < 550:
+                    line[50:750] = bytes((row + col // 8) & 0xF0 for col in range(700))
+                    for _ in range(20):
+                        line[rng.randrange(800)] = rng.randrange(256)
+                rows.append(bytes(line))
+            members.append((f"ch{chapter:03d}/scan_{page:03d}.bmp", b"BM" + b"".join(rows)))
+        members.append((f"ch{chapter:03d}/ComicInfo.xml",
+                        (f"<ComicInfo><Series>Series</Series><Number>{chapter}</Number>"
+                         f"<Summary>{'Lorem ipsum dolor sit amet. ' * 40}</Summary></ComicInfo>").encode()))
+    return members
+
+
+def corpus_from(directory: Path) -> List[Tuple[str, bytes]]:
+    members = []
+    for path in sorted(directory.rglob("*.cbz")):
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    members.append((f"{path.stem}/{info.filename}", zf.read(info)))
+    return members
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", type=Path, default=None, help="Directory of CBZ files")
+    parser.add_argument("--chapters", type=int, default=3, help="Synthetic chapters (without --corpus)")
+    parser.add_argument("--codecs", nargs="+", default=DEFAULT_CODECS)
+    args = parser.parse_args()
+
+    members = corpus_from(args.corpus) if args.corpus else synthetic_corpus(args.chapters)
+    total = sum(len(data) for _, data in members)
+    print(f"{len(members):,} members, {total / 2**20:.1f} MiB "
+          f"({'corpus ' + str(args.corpus) if args.corpus else 'synthetic'})")
+    print(f"{'codec':<11} {'ratio':>7} {'MiB out':>9} {'write MiB/s':>12} {'read MiB/s':>11}")
+
+    for spec in args.codecs:
+        if spec.partition(":")[0] not in available_codecs():
+            print(f"{spec:<11} unavailable in this Python")
+            continue
+        codec = parse_codec(spec)
+        buffer = io.BytesIO()
+
+        start = time.perf_counter()
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            for name, data in members:
+                write_member(zf, name, data, codec)
+        write_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with zipfile.ZipFile(buffer) as zf:
+            for info in zf.infolist():
+                zf.read(info)
+        read_seconds = time.perf_counter() - start
+
+        size = len(buffer.getvalue())
+        print(f"{spec:<11} {total / size:7.3f} {size / 2**20:9.1f} "
+              f"{total / 2**20 / write_seconds:12.1f} {total / 2**20 / read_seconds:11.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
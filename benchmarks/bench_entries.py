@@ -0,0 +1,92 @@
+"""
+Entry storage benchmark: per-archive lists of str vs the shared EntryTable.
+
+Builds the entries of N synthetic archives in both representations, then
+runs conflict detection over each, reporting wall time and the peak memory
+allocated (tracemalloc, measured in a separate pass so it does not skew
+the timings).
+
+Usage:
+    python benchmarks/bench_entries.py [--archives 10000] [--pages 100]
+"""
+
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from comick_merger.entries import EntryTable  # noqa: E402
+
+
+def entry_names(archive: int, pages: int) -> List[str]:
+    """Names of a synthetic chapter: pages shared by all archives, plus a unique one."""
+    names = [f"page_{page:03d}.jpg" for page in range(pages - 1)]
+    names.append(f"chapter_{archive:05d}/ComicInfo.xml")
+    return names
+
+
+def build_lists(archives: int, pages: int) -> List[List[str]]:
+    return [entry_names(archive, pages) for archive in range(archives)]
+
+
+def detect_lists(entries: List[List[str]]) -> Dict[str, List[int]]:
+    """The former CBZMerger.detect_conflicts."""
+    path_to_indices: Dict[str, List[int]] = {}
+    for idx, names in enumerate(entries):
+        for entry in names:
+            if entry not in path_to_indices:
+                path_to_indices[entry] = []
+            path_to_indices[entry].append(idx)
+    return {path: indices for path, indices in path_to_indices.items() if len(indices) > 1}
+
+
+def build_table(archives: int, pages: int) -> EntryTable:
+    table = EntryTable()
+    for archive in range(archives):
+        for name in entry_names(archive, pages):
+            table.append(name, archive, size=250_000, compressed_size=240_000, crc=archive, method=8)
+    return table
+
+
+def measure(label: str, build: Callable, detect: Callable, archives: int, pages: int) -> None:
+    gc.collect()
+    start = time.perf_counter()
+    data = build(archives, pages)
+    built = time.perf_counter()
+    conflicts = detect(data)
+    done = time.perf_counter()
+    del data, conflicts
+
+    gc.collect()
+    tracemalloc.start()
+    data = build(archives, pages)
+    held = tracemalloc.get_traced_memory()[0]
+    conflicts = detect(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    count = len(conflicts)
+    del data, conflicts
+
+    print(f"{label:<14} build {built - start:6.2f}s  detect {done - built:6.2f}s  "
+          f"held {held / 2**20:7.1f} MiB  peak {peak / 2**20:7.1f} MiB  ({count} conflicts)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--archives", type=int, default=10_000)
+    parser.add_argument("--pages", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{args.archives * args.pages:,} entries ({args.archives:,} archives x {args.pages} pages)")
+    measure("list[str]", build_lists, detect_lists, args.archives, args.pages)
+    measure("EntryTable", build_table, EntryTable.find_conflicts, args.archives, args.pages)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+Archive scan benchmark: zipfile.ZipFile(...).infolist() vs zipio.read_entries.
+
+Builds one archive of tiny stored pages in a temporary directory and lists
+it repeatedly with both readers.
+
+Usage:
+    python benchmarks/bench_scan.py [--pages 5000] [--repeat 20]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from comick_merger import zipio  # noqa: E402
+from comick_merger.entries import EntryTable  # noqa: E402
+
+
+def build_archive(path: Path, pages: int) -> None:
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as zf:
+        for page in range(pages):
+            zf.writestr(f"Chapter 001/page_{page:05d}.jpg", b"\xff\xd8\xff\xd9")
+
+
+def scan_zipfile(path: Path) -> int:
+    table = EntryTable()
+    with zipfile.ZipFile(path) as zf:
+        for info in zf.infolist():
+            if not info.is_dir():
+                table.append(info.filename, 0, info.file_size, info.compress_size,
+                             info.CRC, info.compress_type, info.header_offset)
+    return len(table)
+
+
+def scan_zipio(path: Path) -> int:
+    with open(path, 'rb') as fp:
+        return len(zipio.read_entries(fp))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.cbz"
+        build_archive(path, args.pages)
+        print(f"{args.pages:,} members, {path.stat().st_size / 2**20:.1f} MiB, {args.repeat} scans")
+
+        for label, scan in (("zipfile", scan_zipfile), ("zipio", scan_zipio)):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                count = scan(path)
+            elapsed = (time.perf_counter() - start) / args.repeat
+            print(f"{label:<8} {elapsed * 1000:8.2f} ms/scan  "
+                  f"{elapsed / count * 1e6:6.2f} us/member")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
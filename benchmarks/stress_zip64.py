@@ -0,0 +1,240 @@
+"""
+ZIP64 stress test: merge 100k+ members into an output larger than 4 GiB.
+
+Builds synthetic inputs on local disk, merges them, then checks the run
+against limits and the output for readability:
+
+- many small archives of tiny pages, for the member count (over the
+  65,535 members a ZIP without ZIP64 records can list);
+- a few sparse archives of zero-filled pages, for the volume: their
+  local headers are written and their data left as holes, so they take
+  almost no disk space but read back as real bytes.
+
+The merge stores members as they are (``--compression store``), so the
+output really exceeds 4 GiB and its central directory needs ZIP64 offsets
+and end records. Expect the output size in free space under ``--workdir``
+(twice that with ``--shards``). Peak RSS comes from ``resource`` and is
+not measured on Windows.
+
+Usage:
+    python benchmarks/stress_zip64.py [--members 100000] [--gib 4.5] [--shards 1]
+                                      [--workdir DIR] [--max-rss-mib 512] [--max-seconds 0]
+"""
+
+import argparse
+import gc
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+import zlib
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from comick_merger import zipio  # noqa: E402
+from comick_merger.cbz_merger import CBZMerger  # noqa: E402
+from comick_merger.entries import MemberList  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Tiny pages per synthetic chapter
+PAGES_PER_CHAPTER = 500
+
+# Zero-filled pages per sparse archive
+PAGES_PER_SPARSE_ARCHIVE = 256
+
+# Members read back from each end of the output, and at random, without --full-check
+SAMPLED_MEMBERS = 200
+
+_ZERO_CHUNK = bytes(1024 * 1024)
+
+
+def zeros_crc(size: int) -> int:
+    """CRC-32 of ``size`` zero bytes."""
+    crc = 0
+    for _ in range(size // len(_ZERO_CHUNK)):
+        crc = zlib.crc32(_ZERO_CHUNK, crc)
+    return zlib.crc32(_ZERO_CHUNK[:size % len(_ZERO_CHUNK)], crc)
+
+
+def build_chapters(directory: Path, members: int) -> List[Path]:
+    """Archives of tiny stored pages, PAGES_PER_CHAPTER each, ``members`` in total."""
+    paths = []
+    for chapter in range(-(-members // PAGES_PER_CHAPTER)):
+        path = directory / f"chapter{chapter:05d}.cbz"
+        count = min(PAGES_PER_CHAPTER, members - chapter * PAGES_PER_CHAPTER)
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as zf:
+            for page in range(count):
+                zf.writestr(f"page_{page:04d}.jpg", b"\xff\xd8" + page.to_bytes(2, 'little') + b"\xff\xd9")
+        paths.append(path)
+    return paths
+
+
+def build_sparse(directory: Path, total_bytes: int, page_size: int) -> List[Path]:
+    """
+    Archives of zero-filled stored pages adding up to ``total_bytes``.
+
+    Only headers are written; the page data are holes left by seeking.
+    """
+    pages = -(-total_bytes // page_size)
+    crc = zeros_crc(page_size)
+    paths = []
+    for archive in range(-(-pages // PAGES_PER_SPARSE_ARCHIVE)):
+        path = directory / f"volume{archive:03d}.cbz"
+        count = min(PAGES_PER_SPARSE_ARCHIVE, pages - archive * PAGES_PER_SPARSE_ARCHIVE)
+        directory_records = []
+        with open(path, 'wb') as fp:
+            for page in range(count):
+                name = f"scan_{page:04d}.png".encode()
+                offset = fp.tell()
+                fp.write(zipio.local_header(name, zipfile.ZIP_STORED, crc, page_size, page_size))
+                fp.seek(page_size, 1)
+                directory_records.append(zipio.central_header(name, zipfile.ZIP_STORED, crc,
+                                                              page_size, page_size, offset))
+            directory_offset = fp.tell()
+            records = b"".join(directory_records)
+            fp.write(records)
+            fp.write(zipio.end_records(count, directory_offset, len(records)))
+        paths.append(path)
+    return paths
+
+
+def directory_memory(members: int) -> None:
+    """Print the memory held by the writer's member list, ZipInfo list vs MemberList."""
+    def fill(filelist):
+        for index in range(members):
+            zinfo = zipfile.ZipInfo(f"{index // PAGES_PER_CHAPTER:05d}_page_{index:07d}.jpg",
+                                    (2024, 5, 17, 12, 30, 42))
+            zinfo.header_offset = index * 6_000_000
+            zinfo.file_size = zinfo.compress_size = 250_000
+            zinfo.CRC = index
+            filelist.append(zinfo)
+        return filelist
+
+    for label, factory in (("list[ZipInfo]", list), ("MemberList", MemberList)):
+        gc.collect()
+        tracemalloc.start()
+        filelist = fill(factory())
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del filelist
+        print(f"  {label:<14} {held / 2**20:8.1f} MiB for {members:,} members "
+              f"({held / members:.0f} bytes each)")
+
+
+def peak_rss_mib() -> float:
+    """Peak resident set size of this process so far, or 0 where unknown."""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def check_output(path: Path, expected: int, full: bool) -> List[str]:
+    """
+    Read the output back with zipio and zipfile.
+
+    Returns:
+        Problems found (empty if the archive is sound)
+    """
+    problems = []
+    with open(path, 'rb') as fp:
+        end = zipio.find_end_record(fp)
+        listed = len(zipio.read_entries(fp))
+    if not end.zip64:
+        problems.append("no ZIP64 end record")
+    if end.entry_count != expected or listed != expected:
+        problems.append(f"{end.entry_count} members in the end record, {listed} listed, {expected} expected")
+
+    with zipfile.ZipFile(path) as zf:
+        members = zf.infolist()
+        if len(members) != expected:
+            problems.append(f"zipfile lists {len(members)} members, {expected} expected")
+        if full:
+            sample = members
+        else:
+            beyond = [zinfo for zinfo in members if zinfo.header_offset > zipio.ZIP64_LIMIT]
+            if not beyond:
+                problems.append("no member past 4 GiB")
+            rng = random.Random(0)
+            sample = (members[:SAMPLED_MEMBERS] + members[-SAMPLED_MEMBERS:] + beyond[:SAMPLED_MEMBERS]
+                      + rng.sample(members, min(SAMPLED_MEMBERS, len(members))))
+        for zinfo in sample:
+            try:
+                with zf.open(zinfo) as member:
+                    while member.read(len(_ZERO_CHUNK)):
+                        pass  # ZipExtFile checks the CRC at the end
+            except zipfile.BadZipFile as e:
+                problems.append(f"{zinfo.filename}: {e}")
+                break
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--members", type=int, default=100_000, help="Tiny pages to merge")
+    parser.add_argument("--gib", type=float, default=4.5, help="GiB of zero-filled pages to merge")
+    parser.add_argument("--page-mib", type=float, default=4.0, help="Size of each zero-filled page")
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--workdir", type=Path, default=None,
+                        help="Local disk directory for inputs and output (default: system temp)")
+    parser.add_argument("--max-rss-mib", type=float, default=512, help="Fail above this peak RSS (0: no limit)")
+    parser.add_argument("--max-seconds", type=float, default=0, help="Fail if the merge takes longer (0: no limit)")
+    parser.add_argument("--full-check", action="store_true", help="Read back every member, not a sample")
+    parser.add_argument("--keep", action="store_true", help="Keep the inputs and output")
+    args = parser.parse_args()
+
+    print("Central directory memory while writing:")
+    directory_memory(args.members)
+
+    workdir = Path(tempfile.mkdtemp(prefix="stress_zip64_", dir=args.workdir))
+    try:
+        start = time.perf_counter()
+        sources = build_chapters(workdir, args.members)
+        sources += build_sparse(workdir, int(args.gib * 2**30), int(args.page_mib * 2**20))
+        merger = CBZMerger(sources)
+        expected = sum(len(cbz.entries) for cbz in merger.cbz_files)
+        print(f"Inputs: {len(sources)} archives, {expected:,} members, "
+              f"built and scanned in {time.perf_counter() - start:.1f}s")
+
+        output = workdir / "omnibus.cbz"
+        stats = merger.merge(output, compression="store", shards=args.shards)
+        peak = peak_rss_mib()
+        size = output.stat().st_size
+        print(f"Merge:  {size / 2**30:.2f} GiB in {stats.seconds:.1f}s "
+              f"({stats.write_rate / 2**20:.0f} MiB/s), peak RSS {peak:.0f} MiB")
+
+        start = time.perf_counter()
+        problems = check_output(output, expected, args.full_check)
+        print(f"Check:  {'full' if args.full_check else 'sampled'} read-back in {time.perf_counter() - start:.1f}s")
+
+        if size <= zipio.ZIP64_LIMIT:
+            problems.append(f"output is {size} bytes, not over 4 GiB (raise --gib)")
+        if args.max_rss_mib and peak > args.max_rss_mib:
+            problems.append(f"peak RSS {peak:.0f} MiB over {args.max_rss_mib:.0f} MiB")
+        if args.max_seconds and stats.seconds > args.max_seconds:
+            problems.append(f"merge took {stats.seconds:.1f}s, over {args.max_seconds:.0f}s")
+    finally:
+        if args.keep:
+            print(f"Kept {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    for problem in problems:
+        print(f"[FAIL] {problem}")
+    if not problems:
+        print("[OK] Output is a readable ZIP64 archive")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
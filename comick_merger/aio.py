@@ -0,0 +1,169 @@
+"""asyncio API for merging CBZ files without blocking the event loop."""
+
+import asyncio
+import contextlib
+import inspect
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
+
+from comick_merger.cbz_merger import CBZMerger, CBZSource, MergeCancelled, MergeProgress, MergeStats
+
+
+# Merges running at the same time on the shared executor
+DEFAULT_MAX_WORKERS = 4
+
+# Progress events buffered before the merge thread waits for the consumer
+DEFAULT_MAX_PENDING = 256
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Return the shared executor used by merges.
+
+    It is separate from the loop's default executor, so a burst of merges
+    queues here instead of starving other ``run_in_executor`` users, and
+    at most DEFAULT_MAX_WORKERS merges do file I/O at once.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=DEFAULT_MAX_WORKERS,
+                thread_name_prefix="comick-merge"
+            )
+        return _executor
+
+
+def _merge_in_thread(
+    sources: List[CBZSource],
+    output_path: Path,
+    merge_options: Dict[str, Any],
+    publish: Callable[[MergeProgress], None],
+    cancel_event: threading.Event
+) -> MergeStats:
+    """Scan and merge in a worker thread; runs on the executor."""
+    def scanned_until_cancelled():
+        # CBZMerger scans each source as it is produced: stop between two scans
+        for source in sources:
+            if cancel_event.is_set():
+                raise MergeCancelled(f"Merge into {output_path} cancelled")
+            yield source
+
+    merger = CBZMerger(scanned_until_cancelled())
+    return merger.merge(output_path, progress=publish, cancel_event=cancel_event, **merge_options)
+
+
+def iter_merge_async(
+    sources: List[CBZSource],
+    output_path: Path,
+    *,
+    executor: Optional[Executor] = None,
+    max_pending: int = DEFAULT_MAX_PENDING,
+    **merge_options: Any
+) -> AsyncIterator[MergeProgress]:
+    """
+    Merge CBZ files in a worker thread, yielding progress events.
+
+    The merge thread blocks when ``max_pending`` events are waiting, so a
+    slow consumer throttles the merge instead of growing an unbounded queue.
+    Cancelling the consuming task, or closing the generator early (wrap it
+    in ``contextlib.aclosing``), stops the scan at the next source or the
+    merge at the next entry, and removes its partial output before the
+    cancellation propagates.
+
+    Args:
+        sources: CBZ files to merge, in order
+        output_path: Path for the output CBZ file
+        executor: Executor running the merge (default: get_executor())
+        max_pending: Progress events buffered before the merge waits
+        **merge_options: Passed to CBZMerger.merge (use_prefixes, compression, ...)
+    """
+    return _iter_merge(sources, output_path, executor, max_pending, merge_options, [])
+
+
+async def _iter_merge(
+    sources: List[CBZSource],
+    output_path: Path,
+    executor: Optional[Executor],
+    max_pending: int,
+    merge_options: Dict[str, Any],
+    results: List[MergeStats]
+) -> AsyncIterator[MergeProgress]:
+    """Body of iter_merge_async; appends the merge stats to ``results`` once done."""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    slots = threading.Semaphore(max_pending)
+    cancel_event = threading.Event()
+
+    def publish(event: MergeProgress) -> None:
+        # Wait for a free slot, waking up regularly to notice cancellation
+        while not slots.acquire(timeout=0.1):
+            if cancel_event.is_set():
+                raise MergeCancelled(f"Merge into {output_path} cancelled")
+        loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    future = loop.run_in_executor(
+        executor or get_executor(), _merge_in_thread,
+        list(sources), output_path, merge_options, publish, cancel_event
+    )
+    future.add_done_callback(lambda _: queue.put_nowait(None))
+
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            slots.release()
+            yield event
+
+        # Propagate errors from the merge thread
+        results.append(await future)
+    finally:
+        if not future.done():
+            cancel_event.set()
+            # Let the worker notice and clean up its partial file
+            await asyncio.wait({future})
+            if not future.cancelled():
+                future.exception()  # Expected MergeCancelled, mark it retrieved
+
+
+async def merge_async(
+    sources: List[CBZSource],
+    output_path: Path,
+    *,
+    progress: Optional[Callable[[MergeProgress], Union[None, Awaitable[None]]]] = None,
+    executor: Optional[Executor] = None,
+    **merge_options: Any
+) -> MergeStats:
+    """
+    Merge CBZ files without blocking the event loop.
+
+    Args:
+        sources: CBZ files to merge, in order
+        output_path: Path for the output CBZ file
+        progress: Called with each MergeProgress; may be a coroutine function
+        executor: Executor running the merge (default: get_executor())
+        **merge_options: Passed to CBZMerger.merge (use_prefixes, compression, ...)
+
+    Returns:
+        The MergeStats of the merge
+
+    Raises:
+        asyncio.CancelledError: If the task is cancelled; the output is not written
+    """
+    results: List[MergeStats] = []
+    events = _iter_merge(sources, output_path, executor, DEFAULT_MAX_PENDING, merge_options, results)
+    # aclosing: an exception in the loop body must stop the merge right away,
+    # not whenever the loop finalizes the abandoned generator
+    async with contextlib.aclosing(events):
+        async for event in events:
+            if progress is not None:
+                result = progress(event)
+                if inspect.isawaitable(result):
+                    await result
+    return results[0]
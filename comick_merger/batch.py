@@ -0,0 +1,331 @@
+"""Batch merging by any number of workers sharing a directory-based job queue.
+
+The queue is a directory (typically on a NAS mounted by every merge host)::
+
+    pending/<job>.json            waiting to be claimed
+    claimed/<job>@<worker>.json   being merged; the file mtime is the lease
+    done/<job>.json               result of a finished job
+    failed/<job>.json             error of a job that raised
+    tmp/                          files being written, published by rename
+
+Claiming a job is a rename from ``pending`` to ``claimed``, which only one
+worker can win. Workers refresh the mtime of their claim while merging;
+claims not refreshed within the lease are renamed back to ``pending`` by
+any worker, so jobs of a dead worker are picked up again.
+
+Jobs are identified by their output path, and each merge is written to a
+worker-private file then renamed over the output, so running a job twice
+(a worker presumed dead that was only slow) produces the same file.
+"""
+
+import hashlib
+import json
+import os
+import re
+import socket
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from comick_merger.cbz_merger import CBZMerger, MergeCancelled
+from comick_merger.codecs_policy import parse_policy
+from comick_merger.pool import DEFAULT_MAX_OPEN
+from comick_merger.throttle import format_throughput, parse_rate
+
+
+# Seconds a claim stays valid without being refreshed
+DEFAULT_LEASE = 300.0
+
+# Seconds between polls of an empty queue
+DEFAULT_POLL = 2.0
+
+_UNSAFE = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+def job_id_for(output: Path) -> str:
+    """Queue id of the job producing ``output``: readable, and unique per output path."""
+    digest = hashlib.sha1(str(Path(output).absolute()).encode('utf-8', 'surrogateescape')).hexdigest()
+    return f"{_UNSAFE.sub('_', Path(output).stem)[:40]}-{digest[:12]}"
+
+
+def default_worker_id() -> str:
+    """Host name and process id, unique among the workers sharing a queue."""
+    return _UNSAFE.sub('_', f"{socket.gethostname()}-{os.getpid()}")
+
+
+@dataclass
+class BatchJob:
+    """One merge: sources in order, output path and options."""
+    job_id: str
+    sources: List[str]
+    output: str
+    use_prefixes: bool = True
+    force: bool = False  # Merge even if the output is up to date
+    compression: Optional[str] = None  # Policy spec (see codecs_policy.parse_policy)
+    reproducible: bool = False  # Byte-identical output for identical contents
+    max_open: int = DEFAULT_MAX_OPEN  # Source archives open at once
+    read_limit: Optional[int] = None  # Bytes per second read from the sources
+    write_limit: Optional[int] = None  # Bytes per second written
+
+
+class WorkQueue:
+    """
+    Job queue stored in a shared directory.
+
+    Every operation is a single rename, create or unlink, so any number of
+    processes on any number of hosts can use the same queue without locks.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.pending = self.root / "pending"
+        self.claimed = self.root / "claimed"
+        self.done = self.root / "done"
+        self.failed = self.root / "failed"
+        self.tmp = self.root / "tmp"
+        for directory in (self.pending, self.claimed, self.done, self.failed, self.tmp):
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def _publish(self, target: Path, data: dict) -> None:
+        """Write JSON to ``target`` atomically."""
+        tmp_path = self.tmp / f"{target.name}.{default_worker_id()}.{threading.get_ident()}"
+        tmp_path.write_text(json.dumps(data), encoding='utf-8')
+        os.replace(tmp_path, target)
+
+    def enqueue(self, sources: List[Path], output: Path, use_prefixes: bool = True,
+                force: bool = False, compression: Optional[str] = None,
+                reproducible: bool = False, max_open: int = DEFAULT_MAX_OPEN,
+                read_limit: Union[str, int, None] = None,
+                write_limit: Union[str, int, None] = None) -> str:
+        """
+        Add a merge job and return its id.
+
+        Enqueuing the same output again replaces the waiting job and clears
+        the result of a previous run.
+
+        Paths are stored as absolute paths, and must name the same files on
+        every host using the queue.
+
+        Limits (``500K``, ``20M``... see throttle.parse_rate) apply to this
+        job only, whichever worker runs it.
+
+        Raises:
+            ValueError: If ``compression`` is not a valid policy spec, or a
+                        limit is not a valid rate
+        """
+        parse_policy(compression)
+        if max_open < 1:
+            raise ValueError(f"max_open must be positive, got {max_open}")
+        job = BatchJob(
+            job_id=job_id_for(output),
+            sources=[str(Path(source).absolute()) for source in sources],
+            output=str(Path(output).absolute()),
+            use_prefixes=use_prefixes,
+            force=force,
+            compression=compression,
+            reproducible=reproducible,
+            max_open=max_open,
+            read_limit=parse_rate(read_limit),
+            write_limit=parse_rate(write_limit),
+        )
+        for directory in (self.done, self.failed):
+            (directory / f"{job.job_id}.json").unlink(missing_ok=True)
+        self._publish(self.pending / f"{job.job_id}.json", asdict(job))
+        return job.job_id
+
+    def claim(self, worker_id: str) -> Optional[Tuple[BatchJob, Path]]:
+        """
+        Take the next pending job.
+
+        Returns:
+            (job, claim file), or None when nothing is pending
+        """
+        for path in sorted(self.pending.glob("*.json")):
+            claim_path = self.claimed / f"{path.stem}@{worker_id}.json"
+            try:
+                # Start the lease now rather than at enqueue time, before the
+                # claim becomes visible to workers reaping expired ones
+                os.utime(path)
+                os.rename(path, claim_path)
+            except FileNotFoundError:
+                continue  # Another worker was faster
+            job = BatchJob(**json.loads(claim_path.read_text(encoding='utf-8')))
+            return job, claim_path
+        return None
+
+    def renew(self, claim_path: Path) -> bool:
+        """Extend a lease; returns False if the claim was lost."""
+        try:
+            os.utime(claim_path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def complete(self, claim_path: Path, job: BatchJob, result: dict) -> None:
+        """Record a finished job and release its claim."""
+        self._publish(self.done / f"{job.job_id}.json", result)
+        claim_path.unlink(missing_ok=True)
+
+    def fail(self, claim_path: Path, job: BatchJob, error: str) -> None:
+        """Record a failed job and release its claim."""
+        self._publish(self.failed / f"{job.job_id}.json", {"job": asdict(job), "error": error})
+        claim_path.unlink(missing_ok=True)
+
+    def reap_expired(self, lease: float) -> List[str]:
+        """Put jobs whose claim was not refreshed within ``lease`` seconds back in the queue."""
+        requeued = []
+        deadline = time.time() - lease
+        for claim_path in self.claimed.glob("*.json"):
+            try:
+                if claim_path.stat().st_mtime >= deadline:
+                    continue
+                job_id = claim_path.stem.rpartition("@")[0]
+                os.rename(claim_path, self.pending / f"{job_id}.json")
+            except FileNotFoundError:
+                continue  # Completed or reaped meanwhile
+            requeued.append(job_id)
+        return requeued
+
+    def status(self) -> Dict[str, int]:
+        """Number of jobs in each state."""
+        return {
+            "pending": sum(1 for _ in self.pending.glob("*.json")),
+            "claimed": sum(1 for _ in self.claimed.glob("*.json")),
+            "done": sum(1 for _ in self.done.glob("*.json")),
+            "failed": sum(1 for _ in self.failed.glob("*.json")),
+        }
+
+
+def _run_job(queue: WorkQueue, job: BatchJob, claim_path: Path, worker_id: str,
+             lease: float) -> Optional[dict]:
+    """
+    Merge one claimed job while keeping its lease alive.
+
+    Returns:
+        The job result, or None if the lease was lost and the job dropped
+    """
+    lost = threading.Event()
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(lease / 4):
+            if not queue.renew(claim_path):
+                lost.set()
+                return
+
+    output = Path(job.output)
+    staging = output.with_name(f".{output.name}.{worker_id}.tmp")
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    thread = threading.Thread(target=heartbeat, name=f"lease-{job.job_id}", daemon=True)
+    thread.start()
+    started = time.monotonic()
+    try:
+        merger = CBZMerger([Path(source) for source in job.sources])
+        conflicts = merger.detect_conflicts()
+        # Merging goes to a staging file, so check the real output here
+        skipped = not job.force and merger.is_up_to_date(output, job.use_prefixes,
+                                                         compression=job.compression,
+                                                         reproducible=job.reproducible)
+        throughput = {"merge_seconds": 0.0, "bytes_read": 0, "bytes_written": 0, "throttled_seconds": 0.0}
+        if not skipped:
+            try:
+                stats = merger.merge(staging, use_prefixes=job.use_prefixes, cancel_event=lost, force=True,
+                                     compression=job.compression, reproducible=job.reproducible,
+                                     max_open=job.max_open, read_limit=job.read_limit,
+                                     write_limit=job.write_limit)
+            except MergeCancelled:
+                return None
+            throughput = {"merge_seconds": round(stats.seconds, 3), "bytes_read": stats.bytes_read,
+                          "bytes_written": stats.bytes_written,
+                          "throttled_seconds": round(stats.throttled_seconds, 3)}
+            if not queue.renew(claim_path):
+                return None  # Another worker owns the job now and writes the same output
+            os.replace(staging, output)
+    finally:
+        stop.set()
+        thread.join()
+        staging.unlink(missing_ok=True)
+
+    return {
+        "job_id": job.job_id,
+        "output": job.output,
+        "worker": worker_id,
+        "conflicts": len(conflicts),
+        "skipped": skipped,
+        "seconds": round(time.monotonic() - started, 3),
+        **throughput,
+    }
+
+
+def run_worker(
+    queue_dir: Path,
+    worker_id: Optional[str] = None,
+    lease: float = DEFAULT_LEASE,
+    poll: float = DEFAULT_POLL,
+    wait: bool = False,
+    log: Optional[Callable[[str], None]] = print
+) -> Dict[str, int]:
+    """
+    Claim and merge jobs until the queue is drained.
+
+    Without ``wait``, the worker returns once nothing is pending and no
+    other worker holds a claim (claims of dead workers are reaped first).
+
+    Args:
+        queue_dir: Shared queue directory
+        worker_id: Name of this worker in claim files (default: host-pid)
+        lease: Seconds after which a claim that was not refreshed expires;
+               keep it well above clock skew between hosts
+        poll: Seconds between polls while waiting
+        wait: Keep polling for new jobs forever
+        log: Called with one line per event (None: silent)
+
+    Returns:
+        Number of jobs done (of which ``skipped`` were already up to date),
+        failed and dropped (lease lost) by this worker
+    """
+    queue = WorkQueue(queue_dir)
+    worker_id = _UNSAFE.sub('_', worker_id) if worker_id else default_worker_id()
+    stats = {"done": 0, "skipped": 0, "failed": 0, "dropped": 0}
+
+    def emit(message: str):
+        if log is not None:
+            log(f"[{worker_id}] {message}")
+
+    while True:
+        for job_id in queue.reap_expired(lease):
+            emit(f"Requeued expired job {job_id}")
+
+        claimed = queue.claim(worker_id)
+        if claimed is None:
+            if not wait and not any(queue.claimed.glob("*.json")):
+                return stats
+            time.sleep(poll)
+            continue
+
+        job, claim_path = claimed
+        emit(f"Merging {len(job.sources)} files into {job.output}")
+        try:
+            result = _run_job(queue, job, claim_path, worker_id, lease)
+        except Exception as e:
+            queue.fail(claim_path, job, str(e))
+            stats["failed"] += 1
+            emit(f"Failed {job.job_id}: {e}")
+            continue
+
+        if result is None:
+            stats["dropped"] += 1
+            emit(f"Lost the lease on {job.job_id}, dropped")
+        else:
+            queue.complete(claim_path, job, result)
+            stats["done"] += 1
+            if result["skipped"]:
+                stats["skipped"] += 1
+                emit(f"Up to date {job.job_id}, skipped")
+            else:
+                throughput = format_throughput(result["bytes_read"], result["bytes_written"],
+                                               result["merge_seconds"], result["throttled_seconds"])
+                emit(f"Done {job.job_id} in {result['seconds']}s ({throughput})")
@@ -0,0 +1,120 @@
+"""Small thread-safe LRU cache bounded by total weight."""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, List, Optional, TypeVar
+
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Least-recently-used cache bounded by the total weight of its values.
+
+    By default every value weighs 1, so ``max_weight`` is an item count.
+    Pass ``weigher`` to bound by something else (e.g. bytes of memory).
+    """
+
+    def __init__(
+        self,
+        max_weight: int,
+        weigher: Optional[Callable[[V], int]] = None,
+        on_evict: Optional[Callable[[K, V], None]] = None
+    ):
+        """
+        Args:
+            max_weight: Maximum total weight kept in the cache
+            weigher: Returns the weight of a value (default: 1)
+            on_evict: Called with (key, value) when a value is evicted to make room
+        """
+        if max_weight < 1:
+            raise ValueError(f"max_weight must be positive, got {max_weight}")
+
+        self.max_weight = max_weight
+        self._weigher = weigher or (lambda value: 1)
+        self._on_evict = on_evict
+        self._data: 'OrderedDict[K, V]' = OrderedDict()
+        self._weights: dict = {}
+        self._weight = 0
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._data
+
+    @property
+    def weight(self) -> int:
+        """Current total weight of the cached values."""
+        return self._weight
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """Return the cached value and mark it as recently used."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: K, value: V) -> None:
+        """
+        Cache a value, evicting the least recently used ones if needed.
+
+        Values heavier than ``max_weight`` are not cached.
+        """
+        weight = self._weigher(value)
+        evicted = []
+
+        with self._lock:
+            if key in self._data:
+                self._weight -= self._weights.pop(key)
+                del self._data[key]
+
+            if weight > self.max_weight:
+                return
+
+            self._data[key] = value
+            self._weights[key] = weight
+            self._weight += weight
+
+            while self._weight > self.max_weight:
+                old_key, old_value = self._data.popitem(last=False)
+                self._weight -= self._weights.pop(old_key)
+                self.evictions += 1
+                evicted.append((old_key, old_value))
+
+        # Callbacks run outside the lock: they may be slow (closing files)
+        if self._on_evict is not None:
+            for old_key, old_value in evicted:
+                self._on_evict(old_key, old_value)
+
+    def keys(self) -> List[K]:
+        """Cached keys, least recently used first."""
+        with self._lock:
+            return list(self._data)
+
+    def pop(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """Remove a value without calling ``on_evict``."""
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._weight -= self._weights.pop(key)
+            return self._data.pop(key)
+
+    def clear(self) -> None:
+        """Remove every value without calling ``on_evict``."""
+        with self._lock:
+            self._data.clear()
+            self._weights.clear()
+            self._weight = 0
@@ -1,39 +1,547 @@
 """Core logic for merging CBZ files."""
 
+import hashlib
+import io
+import os
+import re
+import threading
+import time
 import zipfile
+from array import array
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Dict, Set
-from dataclasses import dataclass
+from typing import Any, BinaryIO, List, Dict, Set, Callable, Hashable, Iterable, Optional, Sequence, Tuple, Union
+from dataclasses import dataclass, replace
+
+from comick_merger import zipio
+from comick_merger.codecs_policy import (
+    DEFAULT_POLICY, CompressionPolicy, compress_member, parse_policy, write_member
+)
+from comick_merger.entries import EntryTable, EntryView, MemberList
+from comick_merger.journal import MergeJournal, journal_path
+from comick_merger.pool import DEFAULT_MAX_OPEN, SourcePool
+from comick_merger.profiling import span
+from comick_merger.shards import append_fragment, fragment_path, shard_bounds
+from comick_merger.throttle import TokenBucket
+
+
+# Extensions counted as pages when reporting archive contents
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.avif', '.jxl'}
+
+# Metadata file kept alongside the pages of a folder source (lowercased)
+COMIC_INFO_NAME = 'comicinfo.xml'
+
+_DIGITS = re.compile(r'(\d+)')
+
+
+def natural_sort_key(name: str) -> Tuple:
+    """Sort key ordering embedded numbers numerically (page_2 before page_10)."""
+    parts = _DIGITS.split(name.lower())
+    # Odd indices are the digit runs
+    return tuple(int(part) if i % 2 else part for i, part in enumerate(parts))
+
+
+def archive_fingerprint(path: Path) -> str:
+    """
+    Return a cheap identity for an archive on disk.
+
+    Built from the resolved path, size and modification time, so it changes
+    whenever the file is replaced or rewritten, without reading its contents.
+    """
+    stat = path.stat()
+    identity = f"{path.resolve()}\0{stat.st_size}\0{stat.st_mtime_ns}"
+    return hashlib.sha1(identity.encode('utf-8', 'surrogateescape')).hexdigest()
+
+
+# Anything CBZMerger accepts as an input archive
+CBZSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+
+class BufferReader(io.RawIOBase):
+    """
+    Read-only, seekable stream over an in-memory buffer.
+
+    Unlike ``io.BytesIO(buffer)``, the buffer is never copied as a whole:
+    each read only copies the requested slice out of a memoryview.
+    """
+
+    def __init__(self, buffer: Union[bytes, bytearray, memoryview]):
+        super().__init__()
+        self._view = memoryview(buffer).cast('B')
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = len(self._view) + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            # Same error as a real file, which zipfile expects when probing
+            raise OSError(f"Negative seek position: {pos}")
+        self._pos = pos
+        return pos
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(self._pos + size, len(self._view))
+        data = self._view[self._pos:end].tobytes() if end > self._pos else b''
+        self._pos = max(self._pos, end)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self._view[self._pos:self._pos + len(buffer)]
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+class DirectoryReader:
+    """
+    Reads the files of an image directory by entry name, like ZipFile.read.
+
+    Nothing is kept open: each read opens one file.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def read(self, entry: str) -> bytes:
+        return (self.root / entry).read_bytes()
+
+    def close(self):
+        pass
+
+    def __enter__(self) -> 'DirectoryReader':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class MergeCancelled(Exception):
+    """Raised when a merge is cancelled through its cancel event."""
+
+
+@dataclass(frozen=True)
+class MergeProgress:
+    """Progress of a running merge, reported after each written entry."""
+    cbz_index: int  # Index of the CBZ file being merged
+    cbz_count: int
+    entries_done: int  # Entries written so far, across all CBZ files
+    entries_total: int
+    entry: str  # Path of the last written entry in the output
+
+    @property
+    def fraction(self) -> float:
+        """Completion ratio between 0 and 1."""
+        return self.entries_done / self.entries_total if self.entries_total else 1.0
+
+
+@dataclass
+class MergeStats:
+    """Outcome of a merge."""
+    fingerprint: str  # Identity of the inputs and options, stored in the output
+    skipped: bool = False  # True if the output was already up to date (memoization hit)
+    entries_written: int = 0
+    seconds: float = 0.0
+    sources_opened: int = 0  # Times a source archive was opened (see SourcePool)
+    sources_reused: int = 0  # Reads served by an already open source
+    bytes_read: int = 0  # Compressed bytes of the members read from the sources
+    bytes_written: int = 0  # Bytes of output written by this run
+    throttled_seconds: float = 0.0  # Time spent waiting on read_limit and write_limit
+
+    @property
+    def read_rate(self) -> float:
+        """Observed read throughput, in bytes per second."""
+        return self.bytes_read / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def write_rate(self) -> float:
+        """Observed write throughput, in bytes per second."""
+        return self.bytes_written / self.seconds if self.seconds > 0 else 0.0
+
+
+# Prefix of the archive comment holding the merge fingerprint
+FINGERPRINT_COMMENT = b"comick-merger fingerprint="
+
+# Bump when the output of a merge changes for the same inputs and options
+FINGERPRINT_VERSION = 1
+
+# Timestamp of every member of a reproducible merge
+REPRODUCIBLE_DATE_TIME = zipio.DOS_EPOCH
+
+# Decompressed bytes read ahead of the writer; within this window members are
+# read in source order, so arbitrary output orders stay close to sequential reads
+READAHEAD_BYTES = 32 * 1024 * 1024
+
+# Members read ahead at most, whatever their size
+READAHEAD_MEMBERS = 1024
+
+
+def output_entry_name(prefix: str, entry: str, use_prefixes: bool) -> str:
+    """Path of an entry in the merged archive: 00_image.jpg, or 00/image.jpg with folders."""
+    return f"{prefix}_{entry}" if use_prefixes else f"{prefix}/{entry}"
+
+
+def temp_output_path(output_path: Path) -> Path:
+    """Path of the partial output written before being renamed into place."""
+    return output_path.with_name(output_path.name + '.part')
 
 
 @dataclass
 class CBZFile:
     """Represents a CBZ file with its path and contents."""
     path: Path
-    entries: List[str]  # List of file paths inside the CBZ
+    entries: Sequence[str]  # File paths inside the CBZ, usually an EntryView
+    size: int = 0  # Size of the archive on disk, in bytes
+    source: Any = None  # In-memory buffer or stream; None when read from path
+    mtime_ns: int = 0  # Modification time when scanned; 0 for in-memory sources
+    directory: bool = False  # A folder of page files rather than an archive
+
+    def open(self) -> Union[zipfile.ZipFile, DirectoryReader]:
+        """Open the archive for reading, from disk or from its in-memory source."""
+        if self.directory:
+            return DirectoryReader(self.path)
+        if self.source is None:
+            return zipfile.ZipFile(self.path, 'r')
+        if isinstance(self.source, (bytes, bytearray, memoryview)):
+            return zipfile.ZipFile(BufferReader(self.source), 'r')
+        return zipfile.ZipFile(self.source, 'r')
+
+    def open_stream(self) -> BinaryIO:
+        """
+        Open the archive as a raw binary stream.
+
+        Stream sources are returned as is (callers must not close them);
+        files and buffers get a new stream each time.
+
+        Raises:
+            ValueError: For image directories, which are not archives
+        """
+        if self.directory:
+            raise ValueError(f"Image folder is not an archive: {self.path}")
+        if self.source is None:
+            return open(self.path, 'rb')
+        if isinstance(self.source, (bytes, bytearray, memoryview)):
+            return BufferReader(self.source)
+        return self.source
+
+    @property
+    def shared_stream(self) -> bool:
+        """True if reads go through the caller's own file object, one reader at a time."""
+        return self.source is not None and not isinstance(self.source, (bytes, bytearray, memoryview))
+
+    def is_current(self) -> bool:
+        """
+        Return True if the file on disk still has the scanned size and modification time.
+
+        In-memory sources are always current; image folders never are,
+        since a rewritten page does not always touch the folder (listing
+        one again is cheap).
+        """
+        if self.source is not None:
+            return True
+        if self.directory:
+            return False
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return False
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+    @property
+    def page_count(self) -> int:
+        """Number of image entries in the archive."""
+        return sum(1 for entry in self.entries
+                   if Path(entry).suffix.lower() in IMAGE_EXTENSIONS)
+
+    @property
+    def cover_entry(self) -> Optional[str]:
+        """
+        Entry used as the archive cover.
+
+        An image named like "cover" wins, otherwise the first image in
+        natural order.
+        """
+        images = [entry for entry in self.entries
+                  if Path(entry).suffix.lower() in IMAGE_EXTENSIONS]
+        if not images:
+            return None
+
+        covers = [entry for entry in images if 'cover' in Path(entry).stem.lower()]
+        return min(covers or images, key=natural_sort_key)
+
+    @property
+    def directory_digest(self) -> bytes:
+        """Hash of the archive's central directory fields (see EntryTable.digest)."""
+        if isinstance(self.entries, EntryView):
+            return self.entries.digest()
+        return hashlib.sha1("\0".join(self.entries).encode('utf-8', 'surrogateescape')).digest()
+
+    def read_cover(self) -> Optional[bytes]:
+        """Read the raw bytes of the cover image, or None if there are no images."""
+        entry = self.cover_entry
+        if entry is None:
+            return None
+
+        with self.open() as zf:
+            return zf.read(entry)
+
+    @staticmethod
+    def _read_entries(fp: BinaryIO, path: Path, table: Optional[EntryTable], archive_id: int) -> EntryView:
+        """
+        Append the file entries of an archive to a table (a new one if None).
+
+        The central directory is decoded directly; archives the lean reader
+        does not handle go through zipfile instead.
+        """
+        try:
+            return zipio.read_entries(fp, table, archive_id)
+        except zipio.UnsupportedZip:
+            pass
+
+        if not zipfile.is_zipfile(fp):
+            raise ValueError(f"Not a valid ZIP/CBZ file: {path}")
+
+        if table is None:
+            table = EntryTable()
+        start = len(table)
+        with zipfile.ZipFile(fp, 'r') as zf:
+            infos = zf.infolist()
+        for info in infos:
+            # Filter out directories, keep only files
+            if info.is_dir():
+                continue
+            table.append(info.filename, archive_id, info.file_size, info.compress_size,
+                         info.CRC, info.compress_type, info.header_offset)
+        return table.view(start)
 
     @classmethod
-    def from_path(cls, path: Path) -> 'CBZFile':
-        """Create a CBZFile from a path."""
+    def from_path(cls, path: Path, table: Optional[EntryTable] = None, archive_id: int = 0) -> 'CBZFile':
+        """
+        Create a CBZFile from a path.
+
+        Args:
+            path: Archive on disk, or folder of pages (see from_directory)
+            table: Table receiving the entries, shared between archives to
+                   keep per-entry overhead low (default: a new table)
+            archive_id: Id of the archive in that table
+        """
         if not path.exists():
             raise FileNotFoundError(f"CBZ file not found: {path}")
+        if path.is_dir():
+            return cls.from_directory(path, table, archive_id)
 
-        if not zipfile.is_zipfile(path):
-            raise ValueError(f"Not a valid ZIP/CBZ file: {path}")
+        with span("CBZFile.from_path"), open(path, 'rb') as fp:
+            entries = cls._read_entries(fp, path, table, archive_id)
+            stat = os.fstat(fp.fileno())
 
-        with zipfile.ZipFile(path, 'r') as zf:
-            # Filter out directories, keep only files
-            entries = [name for name in zf.namelist() if not name.endswith('/')]
+        return cls(path=path, entries=entries, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+    @classmethod
+    def from_directory(cls, path: Path, table: Optional[EntryTable] = None, archive_id: int = 0) -> 'CBZFile':
+        """
+        Create a CBZFile from a folder of pages, as if it had been zipped.
+
+        Images in the folder and its subfolders become entries (relative
+        paths, natural order), with ComicInfo.xml; hidden and other files
+        are skipped. Only file sizes are
+        read here: pages are read when merging, and stored in the table as
+        uncompressed members without a CRC.
 
-        return cls(path=path, entries=entries)
+        Args:
+            path: Folder of pages
+            table: Same as from_path
+            archive_id: Same as from_path
+        """
+        files: List[Tuple[str, int]] = []
+        mtime_ns = path.stat().st_mtime_ns  # Changes when files are added or removed
+        pending = [(path, "")]
+        while pending:
+            directory, prefix = pending.pop()
+            with os.scandir(directory) as scan:
+                for entry in scan:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append((Path(entry.path), f"{prefix}{entry.name}/"))
+                    elif entry.is_file() and (os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS
+                                              or entry.name.lower() == COMIC_INFO_NAME):
+                        stat = entry.stat()
+                        files.append((f"{prefix}{entry.name}", stat.st_size))
+                        mtime_ns = max(mtime_ns, stat.st_mtime_ns)
+        files.sort(key=lambda file: natural_sort_key(file[0]))
+
+        if table is None:
+            table = EntryTable()
+        start = len(table)
+        for name, size in files:
+            table.append(name, archive_id, size, size, 0, zipfile.ZIP_STORED)
+        return cls(path=path, entries=table.view(start), size=sum(size for _, size in files),
+                   mtime_ns=mtime_ns, directory=True)
+
+    @classmethod
+    def from_source(
+        cls,
+        source: CBZSource,
+        name: Optional[str] = None,
+        table: Optional[EntryTable] = None,
+        archive_id: int = 0
+    ) -> 'CBZFile':
+        """
+        Create a CBZFile from a path, an in-memory buffer or a binary stream.
+
+        Buffers (bytes, bytearray, memoryview) are read in place without
+        being copied. Streams must be seekable; they are not closed and are
+        read again when merging, so they must stay open until then.
+
+        Args:
+            source: Path, buffer or seekable binary file object
+            name: Display name for non-path sources (default: the stream's
+                  ``name`` attribute, or "<memory>")
+            table: Same as from_path
+            archive_id: Same as from_path
+        """
+        if isinstance(source, (str, os.PathLike)):
+            return cls.from_path(Path(source), table, archive_id)
+
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            fp = BufferReader(source)
+        elif hasattr(source, 'read') and hasattr(source, 'seek'):
+            if not source.seekable():
+                raise ValueError("CBZ stream must be seekable")
+            fp = source
+        else:
+            raise TypeError(f"Unsupported CBZ source type: {type(source).__name__}")
+
+        if name is None:
+            name = getattr(source, 'name', None)
+        path = Path(name if isinstance(name, str) else "<memory>")
+
+        entries = cls._read_entries(fp, path, table, archive_id)
+        size = fp.seek(0, io.SEEK_END)
+        return cls(path=path, entries=entries, size=size, source=source)
+
+
+class ConflictIndex:
+    """
+    Incrementally tracks entry paths shared by several archives.
+
+    Archives are registered under an arbitrary hashable key (the GUI uses
+    their path), so adding, removing or reordering archives never requires
+    rescanning the ones already known.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, List[str]] = {}
+        self._owners: Dict[str, Set[Hashable]] = {}
+        self._conflicting: Set[str] = set()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: Hashable, entries: Iterable[str]) -> None:
+        """Register the entries of an archive, replacing any previous ones."""
+        if key in self._entries:
+            self.remove(key)
+
+        entries = list(entries)
+        self._entries[key] = entries
+        for entry in set(entries):
+            owners = self._owners.setdefault(entry, set())
+            owners.add(key)
+            if len(owners) > 1:
+                self._conflicting.add(entry)
+
+    def remove(self, key: Hashable) -> None:
+        """Forget an archive. Unknown keys are ignored."""
+        entries = self._entries.pop(key, None)
+        if entries is None:
+            return
+
+        for entry in set(entries):
+            owners = self._owners[entry]
+            owners.discard(key)
+            if len(owners) < 2:
+                self._conflicting.discard(entry)
+            if not owners:
+                del self._owners[entry]
+
+    def clear(self) -> None:
+        """Forget every archive."""
+        self._entries.clear()
+        self._owners.clear()
+        self._conflicting.clear()
+
+    def conflicts(self, order: Sequence[Hashable]) -> Dict[str, List[int]]:
+        """
+        Report conflicts for the archives in the given order.
+
+        Args:
+            order: Keys of the archives, in merge order. Keys that were never
+                   added are skipped.
+
+        Returns:
+            Dict mapping conflicting paths to the positions (in ``order``) of
+            the archives containing them, sorted by first position then path.
+        """
+        position = {key: idx for idx, key in enumerate(order)}
+        conflicts: Dict[str, List[int]] = {}
+
+        for entry in self._conflicting:
+            indices = sorted(position[key] for key in self._owners[entry]
+                             if key in position)
+            if len(indices) > 1:
+                conflicts[entry] = indices
+
+        return dict(sorted(conflicts.items(), key=lambda item: (item[1][0], item[0])))
 
 
 class CBZMerger:
     """Handles merging multiple CBZ files into one."""
 
-    def __init__(self, cbz_paths: List[Path]):
-        """Initialize with a list of CBZ file paths."""
-        self.cbz_files = [CBZFile.from_path(path) for path in cbz_paths]
+    def __init__(self, cbz_paths: Iterable[CBZSource]):
+        """
+        Initialize with CBZ sources, in merge order.
+
+        Paths, in-memory buffers and seekable binary streams can be mixed
+        freely (see CBZFile.from_source). The entries of all archives are
+        stored in one shared EntryTable. Sources may come from an iterator
+        (e.g. discovery.iter_inputs): each is scanned as soon as it is
+        produced.
+        """
+        self.table = EntryTable()
+        self.cbz_files = [CBZFile.from_source(source, table=self.table, archive_id=idx)
+                          for idx, source in enumerate(cbz_paths)]
+
+    @classmethod
+    def from_cbz_files(cls, cbz_files: List[CBZFile]) -> 'CBZMerger':
+        """
+        Create a merger from already scanned CBZ files, without rescanning them.
+
+        Their entries are copied into the merger's own table, since scanned
+        files may be shared (cached, or merged in another order elsewhere).
+        """
+        merger = cls.__new__(cls)
+        merger.table = EntryTable()
+        merger.cbz_files = [replace(cbz, entries=merger.table.extend(cbz.entries, idx))
+                            for idx, cbz in enumerate(cbz_files)]
+        return merger
 
     def detect_conflicts(self) -> Dict[str, List[int]]:
         """
@@ -42,58 +550,442 @@ class CBZMerger:
         Returns:
             Dict mapping conflicting paths to list of CBZ indices that contain them.
         """
-        path_to_indices: Dict[str, List[int]] = {}
-
-        for idx, cbz in enumerate(self.cbz_files):
-            for entry in cbz.entries:
-                if entry not in path_to_indices:
-                    path_to_indices[entry] = []
-                path_to_indices[entry].append(idx)
-
-        # Keep only paths that appear in multiple CBZ files
-        conflicts = {path: indices for path, indices in path_to_indices.items()
-                    if len(indices) > 1}
-
-        return conflicts
+        # Archive ids in the table are the indices in cbz_files
+        with span("detect_conflicts"):
+            return self.table.find_conflicts()
 
     def _calculate_prefix_padding(self) -> int:
         """Calculate the number of digits needed for prefixes."""
         num_files = len(self.cbz_files)
         return len(str(num_files - 1))
 
+    def prefixes(self) -> List[str]:
+        """Zero-padded prefix of each CBZ file, in merge order."""
+        padding = self._calculate_prefix_padding()
+        return [str(idx).zfill(padding) for idx in range(len(self.cbz_files))]
+
+    def member_rows(self, order: Optional[Sequence[int]] = None) -> array:
+        """
+        Table rows of the members to write, in output order.
+
+        Members are numbered 0..N-1 across all archives in merge order (the
+        first archive's entries, then the second's...); ``order`` lists
+        those numbers in the order the output should contain them.
+
+        Raises:
+            ValueError: If ``order`` is not a permutation of the members
+        """
+        rows = array('Q')
+        for cbz in self.cbz_files:
+            rows.extend(range(cbz.entries.start, cbz.entries.stop))
+        if order is None:
+            return rows
+
+        total = len(rows)
+        in_range = not total or 0 <= min(order) <= max(order) < total
+        if len(order) != total or len(set(order)) != total or not in_range:
+            raise ValueError(f"Order must list each of the {total} members exactly once")
+        return array('Q', [rows[member] for member in order])
+
+    def global_order(self, key: Callable[[int, str], Any]) -> List[int]:
+        """
+        Order every member by ``key(cbz_index, entry)`` across all archives.
+
+        The sort is stable: members with equal keys keep the merge order.
+        The result can be passed as ``order`` to merge().
+        """
+        members = [(idx, entry) for idx, cbz in enumerate(self.cbz_files) for entry in cbz.entries]
+        return sorted(range(len(members)), key=lambda member: key(*members[member]))
+
+    def covers_first_order(self) -> List[int]:
+        """Order putting the cover of every archive first, then all other members."""
+        covers = []
+        start = 0
+        for cbz in self.cbz_files:
+            cover = cbz.cover_entry
+            if cover is not None:
+                covers.append(start + list(cbz.entries).index(cover))
+            start += len(cbz.entries)
+        chosen = set(covers)
+        return covers + [member for member in range(start) if member not in chosen]
+
+    def fingerprint(self, use_prefixes: bool, order: Optional[Sequence[int]] = None,
+                    compression: Union[str, CompressionPolicy, None] = None,
+                    reproducible: bool = False) -> str:
+        """
+        Identify the merge: ordered inputs and options.
+
+        Each input contributes its resolved path, size and modification
+        time as scanned, and a hash of its central directory, so the
+        fingerprint changes whenever an input is added, removed, reordered
+        or rewritten. Computing it reads no file.
+
+        Reproducible merges leave out paths and times, which would make
+        identical contents give different archive comments: inputs are
+        identified by size and central directory (names, sizes, CRCs)
+        only. Image folders have no CRCs before their pages are read, so
+        they keep their modification time.
+        """
+        digest = hashlib.sha1(f"v{FINGERPRINT_VERSION}\0prefixes={use_prefixes}".encode())
+        if reproducible:
+            digest.update(b"reproducible\0")
+        for cbz in self.cbz_files:
+            if reproducible:
+                identity = f"{cbz.size}\0{cbz.mtime_ns if cbz.directory else 0}"
+            elif cbz.source is None:
+                identity = f"{cbz.path.absolute()}\0{cbz.size}\0{cbz.mtime_ns}"
+            else:
+                identity = f"<memory>\0{cbz.size}"
+            digest.update(identity.encode('utf-8', 'surrogateescape') + b"\0")
+            digest.update(cbz.directory_digest)
+        if order is not None:
+            digest.update(b"order\0" + array('Q', order).tobytes())
+        policy = parse_policy(compression)
+        if policy != DEFAULT_POLICY:
+            digest.update(f"compression={policy}\0".encode())
+        return digest.hexdigest()
+
+    def is_up_to_date(self, output_path: Path, use_prefixes: bool = True,
+                      order: Optional[Sequence[int]] = None,
+                      compression: Union[str, CompressionPolicy, None] = None,
+                      reproducible: bool = False) -> bool:
+        """
+        Return True if ``output_path`` was produced by this exact merge.
+
+        Only the end of the output is read: its archive comment must hold
+        the current fingerprint and its central directory the expected
+        number of members.
+        """
+        expected = FINGERPRINT_COMMENT + self.fingerprint(use_prefixes, order, compression, reproducible).encode()
+        try:
+            with open(output_path, 'rb') as fp:
+                end = zipio.find_end_record(fp)
+        except (OSError, zipio.UnsupportedZip):
+            return False
+        entries_total = sum(len(cbz.entries) for cbz in self.cbz_files)
+        return end.comment == expected and end.entry_count == entries_total
+
+    def _read_members(self, pool: SourcePool, rows: Sequence[int],
+                      read_bucket: Optional[TokenBucket] = None) -> Iterable[Tuple[int, bytes]]:
+        """
+        Yield (row, decompressed data) for table rows, in the given order.
+
+        Rows are read ahead in windows, each window in source order (by
+        archive, then position in the archive), so an output order jumping
+        between archives reads each source in long forward runs and reuses
+        its open handle. ``read_bucket`` is charged the compressed size of
+        each member before it is read.
+        """
+        table = self.table
+        window: List[int] = []
+        window_bytes = 0
+        for position, row in enumerate(rows):
+            window.append(row)
+            window_bytes += table.sizes[row]
+            if (window_bytes < READAHEAD_BYTES and len(window) < READAHEAD_MEMBERS
+                    and position + 1 < len(rows)):
+                continue
+
+            data: Dict[int, bytes] = {}
+            with span("merge.read"):
+                for member in sorted(range(len(window)),
+                                     key=lambda m: (table.archive_ids[window[m]], table.header_offsets[window[m]])):
+                    if read_bucket is not None:
+                        read_bucket.consume(table.compressed_sizes[window[member]])
+                    data[member] = pool.read(table.archive_ids[window[member]], table.name(window[member]))
+            for member, window_row in enumerate(window):
+                yield window_row, data.pop(member)
+            window = []
+            window_bytes = 0
+
+    def _write_fragment(
+        self,
+        path: Path,
+        rows: Sequence[int],
+        prefixes: List[str],
+        use_prefixes: bool,
+        policy: CompressionPolicy,
+        max_open: int,
+        check_cancel: Callable[[], None],
+        report: Callable[[int, str], None],
+        date_time: Optional[Tuple[int, int, int, int, int, int]] = None,
+        read_bucket: Optional[TokenBucket] = None,
+        write_bucket: Optional[TokenBucket] = None
+    ) -> Tuple[MemberList, Dict[str, int]]:
+        """
+        Write the local headers and data of some members to a fragment file.
+
+        Returns:
+            (members, with offsets relative to the fragment, source pool stats)
+        """
+        members = MemberList()
+        with SourcePool(self.cbz_files, max_open) as pool, open(path, 'wb') as fp:
+            for row, data in self._read_members(pool, rows, read_bucket):
+                check_cancel()
+                idx = self.table.archive_ids[row]
+                new_path = output_entry_name(prefixes[idx], self.table.name(row), use_prefixes)
+                with span("merge.compress"):
+                    zinfo, compressed = compress_member(new_path, data, policy.codec_for(new_path), date_time)
+                zinfo.header_offset = fp.tell()
+                fp.write(zinfo.FileHeader())
+                fp.write(compressed)
+                if write_bucket is not None:
+                    write_bucket.consume(fp.tell() - zinfo.header_offset)
+                members.append(zinfo)
+                report(idx, new_path)
+            return members, pool.stats()
+
+    def _write_shards(
+        self,
+        output_zip: zipfile.ZipFile,
+        temp_path: Path,
+        rows: Sequence[int],
+        shards: int,
+        max_open: int,
+        check_cancel: Callable[[], None],
+        **fragment_options
+    ) -> Dict[str, int]:
+        """
+        Write members with one thread per contiguous slice, then stitch the fragments.
+
+        Slices have similar uncompressed sizes. Compression and file I/O
+        release the GIL, so threads write in parallel.
+
+        Returns:
+            Source pool stats summed over the shards
+        """
+        bounds = shard_bounds([self.table.sizes[row] for row in rows], shards)
+        paths = [fragment_path(temp_path, shard) for shard in range(len(bounds) - 1)]
+        failed = threading.Event()
+
+        def check_shard():
+            if failed.is_set():
+                raise MergeCancelled("Another shard failed")
+            check_cancel()
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, len(paths)), thread_name_prefix="shard") as executor:
+                futures = [
+                    executor.submit(self._write_fragment, path, rows[lo:hi],
+                                    max_open=max(1, max_open // len(paths)),
+                                    check_cancel=check_shard, **fragment_options)
+                    for path, lo, hi in zip(paths, bounds, bounds[1:])
+                ]
+                wait(futures, return_when=FIRST_EXCEPTION)
+                failed.set()  # Only matters if a shard raised; the others stop early
+            errors = [future.exception() for future in futures if future.exception() is not None]
+            if errors:
+                raise next((error for error in errors if not isinstance(error, MergeCancelled)), errors[0])
+
+            stats = {"opened": 0, "reused": 0}
+            write_bucket = fragment_options.get("write_bucket")
+            with span("merge.stitch"):
+                for path, future in zip(paths, futures):
+                    members, pool_stats = future.result()
+                    if write_bucket is not None:
+                        write_bucket.consume(path.stat().st_size)
+                    append_fragment(output_zip, path, members)
+                    for key in stats:
+                        stats[key] += pool_stats[key]
+            return stats
+        finally:
+            for path in paths:
+                path.unlink(missing_ok=True)
+
     def merge(
         self,
         output_path: Path,
-        use_prefixes: bool = True
-    ) -> None:
+        use_prefixes: bool = True,
+        progress: Optional[Callable[[MergeProgress], None]] = None,
+        cancel_event: Optional[threading.Event] = None,
+        journal: bool = False,
+        resume: bool = False,
+        force: bool = False,
+        order: Optional[Sequence[int]] = None,
+        max_open: int = DEFAULT_MAX_OPEN,
+        compression: Union[str, CompressionPolicy, None] = None,
+        shards: int = 1,
+        reproducible: bool = False,
+        read_limit: Optional[int] = None,
+        write_limit: Optional[int] = None
+    ) -> MergeStats:
         """
         Merge all CBZ files into a single output CBZ.
 
+        The archive is written to a ``.part`` file next to the output and only
+        renamed into place once complete, so an existing output is never left
+        half-written. The merge fingerprint is stored in the archive comment;
+        when an existing output already carries the current fingerprint, the
+        merge is skipped.
+
         Args:
             output_path: Path for the output CBZ file
             use_prefixes: If True, add prefixes (00_, 01_, etc.) to prevent conflicts.
                          If False, add folders (00/, 01/, etc.)
+            progress: Called with a MergeProgress after each written entry
+            cancel_event: When set, the merge stops at the next entry and
+                          raises MergeCancelled
+            journal: Record each written entry in ``<output>.part.journal``.
+                     If the merge fails, the partial file and journal are
+                     kept so it can be resumed.
+            resume: Continue an interrupted journaled merge with the same
+                    inputs and options, after checking its journal against
+                    the partial file (implies journal). Starts from scratch
+                    when there is nothing valid to resume.
+            force: Merge even if the output is up to date
+            order: Output order of the members across all archives (see
+                   member_rows, global_order and covers_first_order);
+                   default: archive by archive. Entry names are unchanged.
+            max_open: Source archives kept open at once, over all shards
+                      (the number of shards is capped at max_open)
+            compression: Codec of the output members: a CompressionPolicy
+                         or a spec such as ``lzma:9``, ``archive`` or
+                         ``zstd:10,.jpg=store`` (see codecs_policy.parse_policy);
+                         default: deflate at level 6
+            shards: Number of threads writing contiguous slices of the
+                    output to fragment files, stitched together at the
+                    end (needs free space for a second copy of the
+                    output). Cannot be combined with journal or resume.
+                    Stream sources cannot be read by several threads, so
+                    the merge then uses a single writer.
+            reproducible: Make the output depend on the inputs' contents
+                          and the options only: every member is dated
+                          REPRODUCIBLE_DATE_TIME and the fingerprint leaves
+                          out paths and times (see fingerprint), so merging
+                          the same contents twice gives identical bytes,
+                          whatever the shards, paths or file times
+            read_limit: Compressed bytes per second read from the sources,
+                        shared by all shards (default: unlimited)
+            write_limit: Bytes per second written to the output, fragments
+                         and their stitching included (default: unlimited)
+
+        Returns:
+            MergeStats, with ``skipped`` set if the output was up to date
+
+        Raises:
+            MergeCancelled: If cancel_event was set during the merge
+            ValueError: If ``order`` is not a permutation of the members,
+                        ``compression`` is not a valid policy, or shards
+                        are combined with a journal
         """
-        conflicts = self.detect_conflicts()
+        if shards < 1:
+            raise ValueError(f"shards must be positive, got {shards}")
+        if shards > 1 and (journal or resume):
+            raise ValueError("Sharded merges cannot be journaled or resumed")
+        if any(cbz.shared_stream for cbz in self.cbz_files):
+            shards = 1  # Shard threads would seek the same file object concurrently
+        # Each shard keeps at least one source open
+        shards = min(shards, max(max_open, 1))
+        # Waits end early on cancellation; the next check raises
+        sleep = cancel_event.wait if cancel_event is not None else time.sleep
+        read_bucket = TokenBucket(read_limit, sleep=sleep) if read_limit else None
+        write_bucket = TokenBucket(write_limit, sleep=sleep) if write_limit else None
 
-        padding = self._calculate_prefix_padding()
+        started = time.monotonic()
+        with span("merge.plan"):
+            rows = self.member_rows(order)
+            policy = parse_policy(compression)
+            fingerprint = self.fingerprint(use_prefixes, order, policy, reproducible)
+            up_to_date = not force and self.is_up_to_date(output_path, use_prefixes, order, policy, reproducible)
+        if up_to_date:
+            return MergeStats(fingerprint, skipped=True, seconds=time.monotonic() - started)
+
+        prefixes = self.prefixes()
+        date_time = REPRODUCIBLE_DATE_TIME if reproducible else None
+        entries_total = len(rows)
+        entries_done = 0
+        temp_path = temp_output_path(output_path)
+        journal = journal or resume
+
+        checkpoint = None
+        completed = False
+        written: List[zipfile.ZipInfo] = []
+        resume_offset = 0
+        if journal:
+            checkpoint = MergeJournal(journal_path(temp_path), fingerprint)
+            if resume:
+                written, resume_offset = checkpoint.recover(temp_path)
+            else:
+                checkpoint.start()
 
-        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as output_zip:
-            for idx, cbz in enumerate(self.cbz_files):
-                prefix = str(idx).zfill(padding)
+        progress_lock = threading.Lock()
 
-                with zipfile.ZipFile(cbz.path, 'r') as input_zip:
-                    for entry in cbz.entries:
-                        # Read the file data
-                        data = input_zip.read(entry)
+        def check_cancel():
+            if cancel_event is not None and cancel_event.is_set():
+                raise MergeCancelled(f"Merge into {output_path} cancelled")
 
-                        # Determine the new path
-                        if use_prefixes:
-                            # Add prefix to filename: 00_image.jpg
-                            new_path = f"{prefix}_{entry}"
+        def report(idx: int, new_path: str):
+            nonlocal entries_done
+            with progress_lock:
+                entries_done += 1
+                if progress is not None:
+                    progress(MergeProgress(
+                        cbz_index=idx,
+                        cbz_count=len(self.cbz_files),
+                        entries_done=entries_done,
+                        entries_total=entries_total,
+                        entry=new_path
+                    ))
+
+        pool = SourcePool(self.cbz_files, max_open)
+        try:
+            with open(temp_path, 'r+b' if written else 'wb') as output_fp:
+                output_fp.seek(resume_offset)
+                with zipfile.ZipFile(output_fp, 'w', zipfile.ZIP_DEFLATED) as output_zip:
+                    output_zip.comment = FINGERPRINT_COMMENT + fingerprint.encode()
+                    # Packed columns instead of a ZipInfo per member; zipfile writes
+                    # the same central directory from it on close
+                    output_zip.filelist = MemberList()
+
+                    # Members kept from the interrupted run still belong in the central directory
+                    for zinfo in written:
+                        output_zip.filelist.append(zinfo)
+                    entries_done = len(written)
+
+                    with span("merge.write"):
+                        if shards > 1:
+                            pool_stats = self._write_shards(
+                                output_zip, temp_path, rows, shards, max_open, check_cancel,
+                                prefixes=prefixes, use_prefixes=use_prefixes, policy=policy, report=report,
+                                date_time=date_time, read_bucket=read_bucket, write_bucket=write_bucket
+                            )
                         else:
-                            # Put in folder: 00/image.jpg
-                            new_path = f"{prefix}/{entry}"
+                            for row, data in self._read_members(pool, rows[entries_done:], read_bucket):
+                                check_cancel()
+                                idx = self.table.archive_ids[row]
+                                new_path = output_entry_name(prefixes[idx], self.table.name(row), use_prefixes)
+                                with span("merge.compress"):
+                                    zinfo = write_member(output_zip, new_path, data,
+                                                         policy.codec_for(new_path), date_time)
+                                if write_bucket is not None:
+                                    write_bucket.consume(output_zip.start_dir - zinfo.header_offset)
+
+                                if checkpoint is not None:
+                                    # Bytes must reach the OS before the journal claims them
+                                    output_fp.flush()
+                                    checkpoint.record(zinfo, output_fp.tell())
+                                report(idx, new_path)
+                            pool_stats = pool.stats()
+
+                    with span("merge.finish"):
+                        output_zip.close()  # Central directory and end records
+                bytes_written = output_fp.tell() - resume_offset
 
-                        # Write to output
-                        output_zip.writestr(new_path, data)
+            os.replace(temp_path, output_path)
+            completed = True
+            buckets = [bucket for bucket in (read_bucket, write_bucket) if bucket is not None]
+            return MergeStats(fingerprint, entries_written=entries_done - len(written),
+                              seconds=time.monotonic() - started,
+                              sources_opened=pool_stats["opened"],
+                              sources_reused=pool_stats["reused"],
+                              bytes_read=sum(self.table.compressed_sizes[row] for row in rows[len(written):]),
+                              bytes_written=bytes_written,
+                              throttled_seconds=sum(bucket.waited for bucket in buckets))
+        except BaseException:
+            if checkpoint is None:
+                temp_path.unlink(missing_ok=True)
+            raise
+        finally:
+            pool.close()
+            if checkpoint is not None:
+                checkpoint.close(remove=completed)
@@ -2,14 +2,257 @@
 
 import sys
 import argparse
+import cProfile
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional
 
-from comick_merger.cbz_merger import CBZMerger
+from comick_merger.cbz_merger import CBZMerger, temp_output_path
+from comick_merger import __version__, batch, discovery, patch, profiling, server
+from comick_merger.codecs_policy import POLICIES, parse_policy
+from comick_merger.pool import DEFAULT_MAX_OPEN
+from comick_merger.throttle import format_throughput, parse_rate
 
 
-def main():
+def _print_conflicts(conflicts: Dict[str, List[int]], cbz_files: List[Path]):
+    """Print a summary of the detected conflicts."""
+    if conflicts:
+        print(f"\n[WARNING] Found {len(conflicts)} file path conflicts:")
+        for path, indices in list(conflicts.items())[:10]:
+            cbz_names = [cbz_files[i].name for i in indices]
+            print(f"  - {path}")
+            print(f"    Found in: {', '.join(cbz_names)}")
+
+        if len(conflicts) > 10:
+            print(f"  ... and {len(conflicts) - 10} more conflicts\n")
+    else:
+        print("[OK] No conflicts detected\n")
+
+
+def _discover(paths: List[Path], output: Path) -> Iterator[Path]:
+    """Archives given or found under the given directories, except the output itself."""
+    excluded = {output.absolute(), temp_output_path(output.absolute())}
+    return (path for path in discovery.iter_inputs(paths) if path.absolute() not in excluded)
+
+
+def serve_main(argv: List[str]) -> int:
+    """Entry point for ``comick-cli serve``."""
+    parser = argparse.ArgumentParser(
+        prog="comick-cli serve",
+        description="Run a persistent merge server that keeps archive metadata warm"
+    )
+    parser.add_argument(
+        '--address',
+        type=server.parse_address,
+        default=None,
+        help="unix:PATH or tcp:HOST:PORT (default: $COMICK_SERVER or a per-user Unix socket)"
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=server.DEFAULT_WORKERS,
+        help=f"Merges run at the same time (default: {server.DEFAULT_WORKERS})"
+    )
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=server.DEFAULT_QUEUE_SIZE,
+        help=f"Jobs allowed to wait for a worker (default: {server.DEFAULT_QUEUE_SIZE})"
+    )
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=server.DEFAULT_CACHE_SIZE,
+        help=f"Archives kept in the metadata cache (default: {server.DEFAULT_CACHE_SIZE})"
+    )
+    parser.add_argument(
+        '--allow-remote',
+        action='store_true',
+        help="Accept a non-loopback TCP address. Anyone who can connect may read and "
+             "write any file this user can: only use on a trusted network"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        return server.serve(args.address, workers=args.workers, queue_size=args.queue_size,
+                            cache_size=args.cache_size, allow_remote=args.allow_remote)
+    except Exception as e:
+        print(f"[ERROR] Error: {e}", file=sys.stderr)
+        return 1
+
+
+def batch_main(argv: List[str]) -> int:
+    """Entry point for ``comick-cli batch``."""
+    parser = argparse.ArgumentParser(
+        prog="comick-cli batch",
+        description="Share merge jobs between workers through a queue directory"
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = commands.add_parser('enqueue', help="Add a merge job to the queue")
+    enqueue.add_argument('queue', type=Path, help="Queue directory")
+    enqueue.add_argument('cbz_files', nargs='+', type=Path,
+                         help="CBZ files to merge (in order), or directories to search")
+    enqueue.add_argument('-o', '--output', type=Path, required=True, help="Output CBZ file path")
+    enqueue.add_argument('--folders', action='store_true',
+                         help="Use folders (00/, 01/) instead of prefixes (00_, 01_)")
+    enqueue.add_argument('--force', action='store_true',
+                         help="Merge even if the output is already up to date")
+    enqueue.add_argument('--compression', default=None, metavar='POLICY',
+                         help="Codec of the output members, as for a single merge")
+    enqueue.add_argument('--reproducible', action='store_true',
+                         help="Same output bytes for the same input contents, as for a single merge")
+    enqueue.add_argument('--max-open', type=int, default=DEFAULT_MAX_OPEN,
+                         help=f"Input files this job keeps open at once (default: {DEFAULT_MAX_OPEN})")
+    enqueue.add_argument('--read-limit', type=parse_rate, default=None, metavar='RATE',
+                         help="Bytes per second this job reads from its inputs (e.g. 20M)")
+    enqueue.add_argument('--write-limit', type=parse_rate, default=None, metavar='RATE',
+                         help="Bytes per second this job writes (e.g. 20M)")
+
+    work = commands.add_parser('work', help="Merge queued jobs until the queue is empty")
+    work.add_argument('queue', type=Path, help="Queue directory")
+    work.add_argument('--worker-id', default=None, help="Worker name (default: host-pid)")
+    work.add_argument('--lease', type=float, default=batch.DEFAULT_LEASE,
+                      help=f"Seconds before a silent worker's job is retried (default: {batch.DEFAULT_LEASE:g})")
+    work.add_argument('--poll', type=float, default=batch.DEFAULT_POLL,
+                      help=f"Seconds between queue polls (default: {batch.DEFAULT_POLL:g})")
+    work.add_argument('--wait', action='store_true', help="Keep waiting for new jobs")
+
+    status = commands.add_parser('status', help="Count jobs in each state")
+    status.add_argument('queue', type=Path, help="Queue directory")
+
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'enqueue':
+            # Directories are expanded now, so every worker merges the same files
+            sources = list(_discover(args.cbz_files, args.output))
+            job_id = batch.WorkQueue(args.queue).enqueue(sources, args.output,
+                                                         use_prefixes=not args.folders,
+                                                         force=args.force,
+                                                         compression=args.compression,
+                                                         reproducible=args.reproducible,
+                                                         max_open=args.max_open,
+                                                         read_limit=args.read_limit,
+                                                         write_limit=args.write_limit)
+            print(f"Queued {job_id}")
+            return 0
+
+        if args.command == 'status':
+            counts = batch.WorkQueue(args.queue).status()
+            print(", ".join(f"{state}: {count}" for state, count in counts.items()))
+            return 0
+
+        stats = batch.run_worker(args.queue, worker_id=args.worker_id, lease=args.lease,
+                                 poll=args.poll, wait=args.wait)
+        print(f"Done: {stats['done']} ({stats['skipped']} up to date), "
+              f"failed: {stats['failed']}, dropped: {stats['dropped']}")
+        return 1 if stats["failed"] else 0
+    except Exception as e:
+        print(f"[ERROR] Error: {e}", file=sys.stderr)
+        return 1
+
+
+def _merge_locally(args: argparse.Namespace, sources: Iterable[Path], cbz_files: List[Path],
+                   walk: bool, use_prefixes: bool) -> int:
+    """Scan, check and merge in this process."""
+    try:
+        if walk:
+            print("Scanning directories...")
+        else:
+            print(f"Loading {len(cbz_files)} CBZ files...")
+        merger = CBZMerger(sources)
+        cbz_files = [cbz.path for cbz in merger.cbz_files]
+        if walk:
+            print(f"Found {len(cbz_files)} CBZ files")
+            if len(cbz_files) < 2:
+                print("Error: Need at least 2 CBZ files to merge", file=sys.stderr)
+                return 1
+
+        # Check for conflicts
+        conflicts = merger.detect_conflicts()
+        _print_conflicts(conflicts, cbz_files)
+
+        if args.check_only:
+            return 0
+
+        # Perform merge
+        print(f"Merging using {'prefixes' if use_prefixes else 'folders'}...")
+
+        stats = merger.merge(
+            output_path=args.output,
+            use_prefixes=use_prefixes,
+            journal=args.journal,
+            resume=args.resume,
+            force=args.force,
+            order=merger.covers_first_order() if args.covers_first else None,
+            max_open=args.max_open,
+            compression=args.compression,
+            shards=args.shards,
+            reproducible=args.reproducible,
+            read_limit=args.read_limit,
+            write_limit=args.write_limit
+        )
+
+        if stats.skipped:
+            print(f"[OK] Up to date (inputs unchanged), merge skipped: {args.output}")
+            return 0
+
+        print(f"Wrote {stats.entries_written} entries in {stats.seconds:.2f}s "
+              f"(inputs opened {stats.sources_opened} times, reused {stats.sources_reused} times)")
+        print(format_throughput(stats.bytes_read, stats.bytes_written, stats.seconds,
+                                stats.throttled_seconds))
+        print(f"\n[OK] Success! Merged CBZ saved to: {args.output}")
+        return 0
+
+    except Exception as e:
+        print(f"\n[ERROR] Error: {e}", file=sys.stderr)
+        return 1
+
+
+def patch_main(argv: List[str]) -> int:
+    """Entry point for ``comick-cli patch``."""
+    parser = argparse.ArgumentParser(
+        prog="comick-cli patch",
+        description="Replace or remove one chapter of a merged CBZ, copying the others as they are"
+    )
+    parser.add_argument('archive', type=Path, help="Merged CBZ file to edit")
+    parser.add_argument('chapter', type=int, help="Chapter number, as in the member prefixes (03_, 03/)")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument('--replace', type=Path, metavar='SOURCE',
+                        help="CBZ file or image folder holding the new chapter (added if missing)")
+    action.add_argument('--remove', action='store_true', help="Remove the chapter")
+    parser.add_argument('--compression', default=None, metavar='POLICY',
+                        help="Codec of the new chapter's members, as for a merge")
+    parser.add_argument('--in-place', action='store_true',
+                        help="Edit the archive directly when the new chapter fits (not crash safe)")
+    args = parser.parse_args(argv)
+
+    try:
+        stats = patch.replace_chapter(args.archive, args.chapter, args.replace,
+                                      compression=args.compression, in_place=args.in_place)
+    except Exception as e:
+        print(f"[ERROR] Error: {e}", file=sys.stderr)
+        return 1
+
+    verb = "Removed" if args.remove else "Replaced"
+    how = "in place" if stats.in_place else f"{stats.bytes_copied / (1024 * 1024):.1f} MB copied"
+    print(f"[SUCCESS] {verb} chapter {args.chapter} in {args.archive}: "
+          f"{stats.members_removed} members removed, {stats.members_written} written, "
+          f"{stats.members_kept} kept ({how}, {stats.seconds:.2f}s)")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None):
     """Main CLI entry point."""
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ['serve']:
+        return serve_main(argv[1:])
+    if argv[:1] == ['batch']:
+        return batch_main(argv[1:])
+    if argv[:1] == ['patch']:
+        return patch_main(argv[1:])
+
     parser = argparse.ArgumentParser(
         description="Merge multiple CBZ (Comic Book Zip) files into one",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -18,11 +261,51 @@ Examples:
   # Merge with prefixes (default)
   comick-cli chapter1.cbz chapter2.cbz chapter3.cbz -o complete.cbz
 
+  # Merge every archive found under a library folder, in natural order
+  comick-cli "Library/One Piece" -o one_piece.cbz
+
   # Merge using folders instead of prefixes
   comick-cli *.cbz -o complete.cbz --folders
 
   # Check for conflicts without merging
   comick-cli *.cbz --check-only
+
+  # Re-merge even though no input changed since the last run
+  comick-cli *.cbz -o complete.cbz --force
+
+  # Archival copy: best ratio; or a hot copy with pages stored as is
+  comick-cli *.cbz -o archive.cbz --compression lzma:9
+  comick-cli *.cbz -o hot.cbz --compression "zstd:3,.jpg=store"
+
+  # Nightly merge whose output only changes when the inputs' contents do
+  comick-cli *.cbz -o omnibus.cbz --reproducible
+
+  # Large omnibus: compress and write with 8 parallel writers
+  comick-cli *.cbz -o omnibus.cbz --shards 8
+
+  # Share the disks politely with other services
+  comick-cli *.cbz -o omnibus.cbz --read-limit 20M --write-limit 10M --max-open 16
+
+  # Put the cover of every chapter first, then all other pages
+  comick-cli *.cbz -o omnibus.cbz --covers-first
+
+  # Find where a slow merge spends its time
+  comick-cli *.cbz -o omnibus.cbz --profile merge.prof
+  comick-cli *.cbz -o omnibus.cbz --sample merge.speedscope.json
+
+  # Journal a long merge, then resume it after a crash
+  comick-cli *.cbz -o omnibus.cbz --journal
+  comick-cli *.cbz -o omnibus.cbz --resume
+
+  # Replace chapter 3 of an existing omnibus without re-merging the others
+  comick-cli patch omnibus.cbz 3 --replace chapter3_v2.cbz
+
+  # Start a persistent server; later invocations use it automatically
+  comick-cli serve
+
+  # Queue jobs in a shared directory, then run workers on any host
+  comick-cli batch enqueue /nas/queue vol1/*.cbz -o /nas/out/vol1.cbz
+  comick-cli batch work /nas/queue
         """
     )
 
@@ -30,7 +313,8 @@ Examples:
         'cbz_files',
         nargs='+',
         type=Path,
-        help="CBZ files to merge (in order)"
+        help="CBZ files to merge (in order); directories are searched recursively "
+             "for archives (detected by content), merged in natural order"
     )
 
     parser.add_argument(
@@ -52,7 +336,102 @@ Examples:
         help="Only check for conflicts, don't merge"
     )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        '--journal',
+        action='store_true',
+        help="Keep a checkpoint journal so an interrupted merge can be resumed"
+    )
+
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help="Resume an interrupted journaled merge of the same files (implies --journal)"
+    )
+
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help="Merge even if the output is already up to date with the inputs"
+    )
+
+    parser.add_argument(
+        '--compression',
+        default=None,
+        metavar='POLICY',
+        help="Codec and level of the output members: store, deflate[:0-9], bzip2[:1-9], "
+             "lzma[:0-9], zstd[:1-22] (Python 3.14+), optionally followed by per-extension "
+             "overrides (lzma:9,.jpg=store), or a preset: " + ", ".join(POLICIES)
+    )
+
+    parser.add_argument(
+        '--shards',
+        type=int,
+        default=1,
+        metavar='N',
+        help="Write the output with N parallel writers, each producing a slice "
+             "stitched into the final archive (default: 1)"
+    )
+
+    parser.add_argument(
+        '--reproducible',
+        action='store_true',
+        help="Produce the same bytes whenever the input contents and options are the same "
+             "(fixed timestamps, no paths or file times in the archive comment)"
+    )
+
+    parser.add_argument(
+        '--covers-first',
+        action='store_true',
+        help="Write the cover of every file first, then all other pages"
+    )
+
+    parser.add_argument(
+        '--max-open',
+        type=int,
+        default=DEFAULT_MAX_OPEN,
+        help=f"Maximum number of input files kept open at once (default: {DEFAULT_MAX_OPEN})"
+    )
+
+    parser.add_argument(
+        '--profile',
+        type=Path,
+        default=None,
+        metavar='FILE',
+        help="Run the merge under cProfile and save the stats to FILE (merges locally)"
+    )
+
+    parser.add_argument(
+        '--sample',
+        type=Path,
+        default=None,
+        metavar='FILE',
+        help="Sample the stacks of every thread while merging and save them to FILE: "
+             "speedscope JSON if it ends in .json, collapsed stacks for flame graphs otherwise"
+    )
+
+    parser.add_argument(
+        '--read-limit',
+        type=parse_rate,
+        default=None,
+        metavar='RATE',
+        help="Maximum bytes per second read from the inputs, e.g. 500K, 20M or 1G (default: unlimited)"
+    )
+
+    parser.add_argument(
+        '--write-limit',
+        type=parse_rate,
+        default=None,
+        metavar='RATE',
+        help="Maximum bytes per second written to the output (default: unlimited)"
+    )
+
+    parser.add_argument(
+        '--no-server',
+        action='store_true',
+        help="Always merge in this process, even if a merge server is running"
+    )
+
+    args = parser.parse_args(argv)
 
     # Validate input files
     cbz_files: List[Path] = []
@@ -62,47 +441,84 @@ Examples:
             return 1
         cbz_files.append(path)
 
-    if len(cbz_files) < 2:
+    # Directories are walked in the background and their archives merged as found
+    walk = any(path.is_dir() for path in cbz_files)
+    sources: Iterable[Path] = cbz_files
+    if walk:
+        sources = _discover(cbz_files, args.output)
+    elif len(cbz_files) < 2:
         print("Error: Need at least 2 CBZ files to merge", file=sys.stderr)
         return 1
 
-    try:
-        print(f"Loading {len(cbz_files)} CBZ files...")
-        merger = CBZMerger(cbz_files)
-
-        # Check for conflicts
-        conflicts = merger.detect_conflicts()
-
-        if conflicts:
-            print(f"\n[WARNING] Found {len(conflicts)} file path conflicts:")
-            for path, indices in list(conflicts.items())[:10]:
-                cbz_names = [cbz_files[i].name for i in indices]
-                print(f"  - {path}")
-                print(f"    Found in: {', '.join(cbz_names)}")
+    use_prefixes = not args.folders
 
-            if len(conflicts) > 10:
-                print(f"  ... and {len(conflicts) - 10} more conflicts\n")
-        else:
-            print("[OK] No conflicts detected\n")
+    try:
+        parse_policy(args.compression)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
 
-        if args.check_only:
+    profiled = args.profile is not None or args.sample is not None
+    running = None
+    if not args.no_server and not profiled:
+        running = server.ping()
+        if running is not None and running.get("version") != __version__:
+            # A server started from an older install would merge with its own code
+            print(f"[WARNING] The merge server runs version {running.get('version')}, not {__version__}: "
+                  "restart it (comick-cli serve). Merging locally.", file=sys.stderr)
+            running = None
+    if running is not None:
+        if walk:
+            cbz_files = list(sources)
+            if len(cbz_files) < 2:
+                print("Error: Need at least 2 CBZ files to merge", file=sys.stderr)
+                return 1
+        response = server.submit_merge(cbz_files, args.output, use_prefixes=use_prefixes,
+                                       check_only=args.check_only, journal=args.journal,
+                                       resume=args.resume, force=args.force,
+                                       covers_first=args.covers_first, compression=args.compression,
+                                       shards=args.shards, reproducible=args.reproducible,
+                                       max_open=args.max_open, read_limit=args.read_limit,
+                                       write_limit=args.write_limit)
+        if response is not None:
+            print(f"Processed {len(cbz_files)} CBZ files on the merge server")
+            if not response.get("ok"):
+                print(f"\n[ERROR] Error: {response.get('error')}", file=sys.stderr)
+                return 1
+            _print_conflicts(response["conflicts"], cbz_files)
+            if response.get("skipped"):
+                print(f"[OK] Up to date (inputs unchanged), merge skipped: {args.output}")
+            elif not args.check_only:
+                print(format_throughput(response.get("bytes_read", 0), response.get("bytes_written", 0),
+                                        response.get("seconds", 0.0),
+                                        response.get("throttled_seconds", 0.0)))
+                print(f"\n[OK] Success! Merged CBZ saved to: {args.output}")
             return 0
 
-        # Perform merge
-        use_prefixes = not args.folders
-        print(f"Merging using {'prefixes' if use_prefixes else 'folders'}...")
+    if args.profile is None and args.sample is None:
+        return _merge_locally(args, sources, cbz_files, walk, use_prefixes)
 
-        merger.merge(
-            output_path=args.output,
-            use_prefixes=use_prefixes
-        )
-
-        print(f"\n[OK] Success! Merged CBZ saved to: {args.output}")
-        return 0
-
-    except Exception as e:
-        print(f"\n[ERROR] Error: {e}", file=sys.stderr)
-        return 1
+    # Profile a local merge: cProfile sees the main thread only, the sampler every thread
+    profiling.reset_spans()
+    profiler = cProfile.Profile() if args.profile is not None else None
+    sampler = profiling.Sampler() if args.sample is not None else None
+    if sampler is not None:
+        sampler.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        return _merge_locally(args, sources, cbz_files, walk, use_prefixes)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"Profile written to {args.profile} (python -m pstats {args.profile})")
+        if sampler is not None:
+            sampler.stop()
+            sampler.write(args.sample)
+            print(f"Stack samples written to {args.sample}")
+        print("Timing spans:")
+        print(profiling.format_spans(profiling.span_totals()))
 
 
 if __name__ == "__main__":
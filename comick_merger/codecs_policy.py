@@ -0,0 +1,216 @@
+"""
+Compression codecs and per-member compression policies for merged archives.
+
+Not named ``compression``: run as a script, this package's folder is on
+``sys.path`` and would shadow the standard library package of Python
+3.14, which zipfile and the zstd codec import.
+"""
+
+import bz2
+import lzma
+import struct
+import time
+import zipfile
+import zlib
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+from typing import Dict, Optional, Tuple, Union
+
+
+# zipfile writes Zstandard members from Python 3.14 on; None when unsupported
+ZIP_ZSTANDARD: Optional[int] = getattr(zipfile, 'ZIP_ZSTANDARD', None)
+
+# Codec name -> (ZIP method, lowest level, highest level, default level)
+CODECS: Dict[str, Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]] = {
+    "store": (zipfile.ZIP_STORED, None, None, None),
+    "deflate": (zipfile.ZIP_DEFLATED, 0, 9, 6),
+    "bzip2": (zipfile.ZIP_BZIP2, 1, 9, 9),
+    "lzma": (zipfile.ZIP_LZMA, 0, 9, 6),
+    "zstd": (ZIP_ZSTANDARD, 1, 22, 3),
+}
+
+# General purpose flag zipfile sets on LZMA members: the stream ends with an end marker
+_LZMA_EOS_FLAG = 0x02
+
+
+@dataclass(frozen=True)
+class Codec:
+    """A compression method with an explicit level."""
+    name: str  # One of CODECS
+    level: Optional[int] = None  # None for store
+
+    @property
+    def method(self) -> int:
+        """ZIP compression method number."""
+        return CODECS[self.name][0]
+
+    def __str__(self) -> str:
+        return self.name if self.level is None else f"{self.name}:{self.level}"
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a whole member, in the form stored in a ZIP archive."""
+        if self.name == "store":
+            return data
+        if self.name == "deflate":
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+            return compressor.compress(data) + compressor.flush()
+        if self.name == "bzip2":
+            return bz2.compress(data, self.level)
+        if self.name == "lzma":
+            # Same framing as zipfile (LZMA SDK version, properties), which
+            # always uses the default preset
+            props = lzma._encode_filter_properties({'id': lzma.FILTER_LZMA1, 'preset': self.level})
+            compressor = lzma.LZMACompressor(lzma.FORMAT_RAW, filters=[
+                lzma._decode_filter_properties(lzma.FILTER_LZMA1, props)
+            ])
+            return struct.pack('<BBH', 9, 4, len(props)) + props + compressor.compress(data) + compressor.flush()
+        from compression import zstd  # Python 3.14+, checked by parse_codec
+        return zstd.compress(data, self.level)
+
+
+def available_codecs() -> Dict[str, Tuple[int, int]]:
+    """Codecs the running Python can write, with their (lowest, highest) level."""
+    return {name: (low, high) for name, (method, low, high, _) in CODECS.items() if method is not None}
+
+
+def parse_codec(spec: str) -> Codec:
+    """
+    Parse a codec like ``lzma:9``, ``zstd`` or ``store``.
+
+    The level defaults to the codec's usual default.
+
+    Raises:
+        ValueError: For unknown or unavailable codecs and out of range levels
+    """
+    name, _, level_text = spec.strip().lower().partition(":")
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec {name!r} (expected one of: {', '.join(CODECS)})")
+    method, low, high, default = CODECS[name]
+    if method is None:
+        raise ValueError(f"Codec {name!r} needs a newer Python (zipfile cannot write it)")
+
+    if low is None:
+        if level_text:
+            raise ValueError(f"Codec {name!r} has no level")
+        return Codec(name)
+    try:
+        level = int(level_text) if level_text else default
+    except ValueError:
+        raise ValueError(f"Invalid level for {name}: {level_text!r}") from None
+    if not low <= level <= high:
+        raise ValueError(f"Level for {name} must be between {low} and {high}, got {level}")
+    return Codec(name, level)
+
+
+@dataclass(frozen=True)
+class CompressionPolicy:
+    """
+    Codec of each output member: a default, overridden by file extension.
+
+    For instance JPEG pages gain almost nothing from recompression and can
+    be stored, while everything else is compressed hard.
+    """
+    default: Codec = Codec("deflate", 6)
+    by_extension: Tuple[Tuple[str, Codec], ...] = ()  # ('.jpg', Codec('store'))...
+
+    def codec_for(self, entry: str) -> Codec:
+        """Codec used for an entry, from its extension."""
+        suffix = PurePosixPath(entry).suffix.lower()
+        for extension, codec in self.by_extension:
+            if suffix == extension:
+                return codec
+        return self.default
+
+    def __str__(self) -> str:
+        return ",".join([str(self.default)] + [f"{ext}={codec}" for ext, codec in self.by_extension])
+
+
+# Default policy: what merges always used (deflate at zlib's default level)
+DEFAULT_POLICY = CompressionPolicy()
+
+# Named policies, usable anywhere a policy spec is expected
+POLICIES: Dict[str, str] = {
+    "default": "deflate:6",
+    # Archival copies: best ratio, slow to write
+    "archive": "lzma:9",
+    # Copies read often: fast decode; pages already compressed are stored
+    "hot": ("zstd:3" if ZIP_ZSTANDARD is not None else "deflate:1")
+           + ",.jpg=store,.jpeg=store,.png=store,.webp=store,.avif=store,.jxl=store",
+}
+
+
+def parse_policy(spec: Union[str, CompressionPolicy, None]) -> CompressionPolicy:
+    """
+    Parse a policy: a name from POLICIES, or a default codec followed by
+    per-extension overrides, e.g. ``lzma:9,.jpg=store,.png=deflate:9``.
+
+    Policies and None (the default policy) are returned as is.
+
+    Raises:
+        ValueError: For malformed specs (see parse_codec)
+    """
+    if spec is None:
+        return DEFAULT_POLICY
+    if isinstance(spec, CompressionPolicy):
+        return spec
+
+    spec = POLICIES.get(spec.strip().lower(), spec)
+    default_spec, *overrides = spec.split(",")
+    by_extension = []
+    for override in overrides:
+        extension, sep, codec_spec = override.partition("=")
+        extension = extension.strip().lower()
+        if not sep or not extension.startswith(".") or len(extension) < 2:
+            raise ValueError(f"Invalid override {override!r} (expected .ext=codec)")
+        by_extension.append((extension, parse_codec(codec_spec)))
+    return CompressionPolicy(parse_codec(default_spec), tuple(by_extension))
+
+
+def compress_member(name: str, data: bytes, codec: Codec,
+                    date_time: Optional[Tuple[int, int, int, int, int, int]] = None
+                    ) -> Tuple[zipfile.ZipInfo, bytes]:
+    """
+    Compress ``data`` with ``codec``.
+
+    Returns:
+        (ZipInfo describing the member, compressed bytes); the caller sets
+        ``header_offset`` and writes ``ZipInfo.FileHeader()`` then the bytes
+    """
+    zinfo = zipfile.ZipInfo(name, date_time or time.localtime(time.time())[:6])
+    # Same on every platform (ZipInfo says "made by Windows" on Windows)
+    zinfo.create_system = 3
+    zinfo.external_attr = 0o600 << 16
+    zinfo.compress_type = codec.method
+    if codec.method == zipfile.ZIP_LZMA:
+        zinfo.flag_bits |= _LZMA_EOS_FLAG
+    compressed = codec.compress(data)
+    zinfo.CRC = zlib.crc32(data)
+    zinfo.file_size = len(data)
+    zinfo.compress_size = len(compressed)
+    return zinfo, compressed
+
+
+def write_member(output_zip: zipfile.ZipFile, name: str, data: bytes, codec: Codec,
+                 date_time: Optional[Tuple[int, int, int, int, int, int]] = None) -> zipfile.ZipInfo:
+    """
+    Compress ``data`` with ``codec`` and append it to an archive open for writing.
+
+    zipfile only honours levels for some methods, so the member is
+    compressed here and its local header written with
+    ``ZipInfo.FileHeader``; the archive lists it in its central directory
+    on close, like the members it wrote itself. The member is added to
+    ``filelist`` only, not to ``NameToInfo``: nothing looks output members
+    up by name, and ``filelist`` may be a compact entries.MemberList.
+
+    Returns:
+        The member's ZipInfo
+    """
+    zinfo, compressed = compress_member(name, data, codec, date_time)
+    fp = output_zip.fp
+    fp.seek(output_zip.start_dir)
+    zinfo.header_offset = output_zip.start_dir
+    fp.write(zinfo.FileHeader())
+    fp.write(compressed)
+    output_zip.start_dir = fp.tell()
+    output_zip.filelist.append(zinfo)
+    return zinfo
@@ -0,0 +1,190 @@
+"""Discovery of input archives and folders of pages in directory trees."""
+
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple, Union
+
+from comick_merger.cbz_merger import IMAGE_EXTENSIONS, natural_sort_key
+
+
+# First bytes of a ZIP archive: a local file header, or the end record of an empty archive
+ZIP_MAGIC = (b"PK\x03\x04", b"PK\x05\x06")
+
+# Paths found ahead of the consumer at most
+DISCOVERY_QUEUE_SIZE = 1024
+
+_DONE = object()
+
+
+def is_zip_archive(path: Union[str, os.PathLike]) -> bool:
+    """Return True if the file starts like a ZIP archive, whatever its extension."""
+    try:
+        with open(path, 'rb') as fp:
+            return fp.read(4) in ZIP_MAGIC
+    except OSError:
+        return False
+
+
+def _contains_archive(directory: Union[str, os.PathLike]) -> bool:
+    """Return True if a ZIP archive lies anywhere under ``directory``; links are not followed."""
+    pending = [directory]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as scan:
+                for entry in scan:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif (entry.is_file() and os.path.splitext(entry.name)[1].lower() not in IMAGE_EXTENSIONS
+                              and is_zip_archive(entry.path)):
+                            return True
+                    except OSError:
+                        pass  # Vanished or unreadable meanwhile
+        except OSError:
+            continue
+    return False
+
+
+def _sort_key(entry: os.DirEntry) -> Tuple:
+    """
+    Natural order of a directory entry, ignoring file extensions.
+
+    ``ch9.cbz`` and ``ch9.5.cbz`` compare as ``ch9`` and ``ch9.5``, so a
+    half chapter comes after its base chapter; folders keep their whole name.
+    """
+    try:
+        is_dir = entry.is_dir(follow_symlinks=False)
+    except OSError:
+        is_dir = False
+    stem, suffix = (entry.name, "") if is_dir else os.path.splitext(entry.name)
+    return natural_sort_key(stem), suffix.lower(), entry.name
+
+
+def _listing(directory: Union[str, os.PathLike]) -> Tuple[bool, List[Tuple[os.DirEntry, bool]]]:
+    """
+    List a directory in natural order.
+
+    Returns:
+        (True if it is a folder of pages: images and no archive, in it or
+        any subfolder, [(entry, True if it is a ZIP archive)]); unreadable
+        directories are empty
+    """
+    try:
+        with os.scandir(directory) as scan:
+            # The key is computed once per entry, not once per comparison
+            keyed = [(_sort_key(entry), entry) for entry in scan]
+    except OSError:
+        return False, []
+    keyed.sort(key=lambda pair: pair[0])
+
+    listing = []
+    has_images = False
+    for _, entry in keyed:
+        is_archive = False
+        try:
+            if entry.is_file():
+                if os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                    has_images = has_images or not entry.name.startswith('.')
+                else:
+                    is_archive = is_zip_archive(entry.path)
+        except OSError:
+            pass  # Vanished or unreadable meanwhile
+        listing.append((entry, is_archive))
+
+    if not has_images or any(is_archive for _, is_archive in listing):
+        return False, listing
+    # Images next to volumes of archives (a series cover) do not make a folder of pages
+    for entry, _ in listing:
+        try:
+            if entry.is_dir(follow_symlinks=False) and _contains_archive(entry.path):
+                return False, listing
+        except OSError:
+            pass
+    return True, listing
+
+
+def walk_sources(root: Path) -> Iterator[Path]:
+    """
+    Yield the ZIP archives and folders of pages under ``root``, recursively.
+
+    Each directory is listed once with ``os.scandir`` and walked depth
+    first in natural order (``ch2`` before ``ch10``, ``ch9.cbz`` before
+    ``ch9.5.cbz``, files and folders interleaved by name), so sources come
+    out in natural order of their path as soon as they are found. A directory holding images and no
+    archive is a folder of pages: it is yielded as one source and not
+    searched further, unless one of its subfolders holds an archive.
+    Symbolic links to directories are not followed.
+    """
+    is_pages, listing = _listing(root)
+    if is_pages:
+        yield root
+        return
+
+    stack = [iter(listing)]
+    while stack:
+        entry, is_archive = next(stack[-1], (None, False))
+        if entry is None:
+            stack.pop()
+        elif is_archive:
+            yield Path(entry.path)
+        else:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                is_pages, listing = _listing(entry.path)
+                if is_pages:
+                    yield Path(entry.path)
+                else:
+                    stack.append(iter(listing))
+
+
+def iter_inputs(paths: Iterable[Path], queue_size: int = DISCOVERY_QUEUE_SIZE) -> Iterator[Path]:
+    """
+    Expand directories among ``paths`` into the sources they contain.
+
+    Files are yielded as given, in order; directories are replaced by the
+    sources ``walk_sources`` finds in them. The walk runs in a background
+    thread, up to ``queue_size`` paths ahead, so the caller can scan each
+    source while the rest of the tree is still being listed. Closing the iterator early
+    stops the walk.
+    """
+    found: 'queue.Queue' = queue.Queue(queue_size)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                found.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for path in paths:
+                path = Path(path)
+                for source in (walk_sources(path) if path.is_dir() else (path,)):
+                    if not put(source):
+                        return
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    thread = threading.Thread(target=produce, name="input-discovery", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = found.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
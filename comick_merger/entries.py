@@ -0,0 +1,308 @@
+"""Compact columnar tables of archive entries and of members being written."""
+
+import hashlib
+import operator
+import zipfile
+from array import array
+from collections import Counter
+from itertools import islice
+from typing import Dict, Iterator, List, Sequence, Tuple, Union, overload
+
+
+class EntryTable:
+    """
+    Entries of one or many archives, stored column by column.
+
+    Names are UTF-8 encoded back to back in a single buffer, delimited by
+    an offsets array; the other columns are typed arrays. A million entries
+    take a few dozen bytes each instead of a Python string plus list slot
+    per entry.
+    """
+
+    def __init__(self):
+        self.names = bytearray()
+        self.name_offsets = array('I', [0])  # Entry i is names[offsets[i]:offsets[i + 1]]
+        self.sizes = array('Q')
+        self.compressed_sizes = array('Q')
+        self.crcs = array('I')
+        self.methods = array('H')
+        self.header_offsets = array('Q')  # Offset of the local header in the source archive
+        self.archive_ids = array('I')
+
+    def __len__(self) -> int:
+        return len(self.archive_ids)
+
+    def append(
+        self,
+        name: Union[str, bytes],
+        archive_id: int,
+        size: int = 0,
+        compressed_size: int = 0,
+        crc: int = 0,
+        method: int = 0,
+        header_offset: int = 0
+    ) -> None:
+        """Add one entry."""
+        if isinstance(name, str):
+            name = name.encode('utf-8', 'surrogateescape')
+        self.names += name
+        self.name_offsets.append(len(self.names))
+        self.sizes.append(size)
+        self.compressed_sizes.append(compressed_size)
+        self.crcs.append(crc)
+        self.methods.append(method)
+        self.header_offsets.append(header_offset)
+        self.archive_ids.append(archive_id)
+
+    def extend(self, entries: Sequence[str], archive_id: int) -> 'EntryView':
+        """
+        Copy the entries of another archive into this table.
+
+        Columns are copied as is from an EntryView; a plain sequence of
+        names only provides names. Returns the view of the copied rows.
+        """
+        start = len(self)
+        if isinstance(entries, EntryView):
+            other, lo, hi = entries.table, entries.start, entries.stop
+            base = len(self.names) - other.name_offsets[lo]
+            self.names += other.names[other.name_offsets[lo]:other.name_offsets[hi]]
+            self.name_offsets.extend(offset + base for offset in other.name_offsets[lo + 1:hi + 1])
+            self.sizes.extend(other.sizes[lo:hi])
+            self.compressed_sizes.extend(other.compressed_sizes[lo:hi])
+            self.crcs.extend(other.crcs[lo:hi])
+            self.methods.extend(other.methods[lo:hi])
+            self.header_offsets.extend(other.header_offsets[lo:hi])
+            self.archive_ids.extend(array('I', [archive_id]) * (hi - lo))
+        else:
+            for name in entries:
+                self.append(name, archive_id)
+        return EntryView(self, start, len(self))
+
+    def truncate(self, length: int) -> None:
+        """Drop every row from ``length`` on."""
+        del self.names[self.name_offsets[length]:]
+        del self.name_offsets[length + 1:]
+        for column in (self.sizes, self.compressed_sizes, self.crcs, self.methods,
+                       self.header_offsets, self.archive_ids):
+            del column[length:]
+
+    def name(self, index: int) -> str:
+        """Decoded name of an entry."""
+        return self.name_bytes(index).decode('utf-8', 'surrogateescape')
+
+    def name_bytes(self, index: int) -> bytes:
+        """Encoded name of an entry."""
+        return bytes(self.names[self.name_offsets[index]:self.name_offsets[index + 1]])
+
+    def name_ids(self) -> Tuple[array, List[bytes]]:
+        """
+        Map every entry to a small integer identifying its name.
+
+        Ids are assigned in order of first appearance, so equal names share
+        an id and comparing names becomes comparing integers.
+
+        Returns:
+            (id of each entry, encoded name of each id)
+        """
+        names = bytes(self.names)
+        offsets = self.name_offsets
+        ids: Dict[bytes, int] = {}
+        name_ids = array('I', [ids.setdefault(names[lo:hi], len(ids))
+                               for lo, hi in zip(offsets, islice(offsets, 1, None))])
+        return name_ids, list(ids)
+
+    def find_conflicts(self) -> Dict[str, List[int]]:
+        """
+        Find names present in more than one archive.
+
+        Returns:
+            Dict mapping conflicting names, in order of first appearance, to
+            the ids of the archives containing them, in table order.
+        """
+        name_ids, unique_names = self.name_ids()
+
+        # Names seen once cannot conflict; counting ids is cheap and usually
+        # rules out most of the table
+        owners: Dict[int, List[int]] = {
+            name_id: [] for name_id, count in sorted(Counter(name_ids).items()) if count > 1
+        }
+        if not owners:
+            return {}
+
+        for name_id, archive_id in zip(name_ids, self.archive_ids):
+            archives = owners.get(name_id)
+            # Rows of an archive are contiguous: a repeat within it is skipped here
+            if archives is not None and (not archives or archives[-1] != archive_id):
+                archives.append(archive_id)
+
+        return {unique_names[name_id].decode('utf-8', 'surrogateescape'): archives
+                for name_id, archives in owners.items() if len(archives) > 1}
+
+    def digest(self, start: int = 0, stop: int = None) -> bytes:
+        """
+        SHA-1 of the names and central directory fields of rows [start, stop).
+
+        Identical for the same rows copied into another table.
+        """
+        stop = len(self) if stop is None else stop
+        offsets = self.name_offsets
+        digest = hashlib.sha1(self.names[offsets[start]:offsets[stop]])
+        digest.update(array('I', map(operator.sub, offsets[start + 1:stop + 1], offsets[start:stop])))
+        for column in (self.sizes, self.compressed_sizes, self.crcs, self.methods, self.header_offsets):
+            digest.update(column[start:stop])
+        return digest.digest()
+
+    def view(self, start: int = 0, stop: int = None) -> 'EntryView':
+        """Sequence of the names in rows [start, stop)."""
+        return EntryView(self, start, len(self) if stop is None else stop)
+
+
+class EntryView(Sequence[str]):
+    """Read-only sequence of entry names backed by a slice of an EntryTable."""
+
+    __slots__ = ('table', 'start', 'stop')
+
+    def __init__(self, table: EntryTable, start: int, stop: int):
+        self.table = table
+        self.start = start
+        self.stop = stop
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[str]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("entry index out of range")
+        return self.table.name(self.start + index)
+
+    def __iter__(self) -> Iterator[str]:
+        table = self.table
+        for index in range(self.start, self.stop):
+            yield table.name(index)
+
+    def digest(self) -> bytes:
+        """See EntryTable.digest."""
+        return self.table.digest(self.start, self.stop)
+
+    def __contains__(self, name: object) -> bool:
+        if not isinstance(name, str):
+            return False
+        return any(entry == name for entry in self)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (EntryView, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"EntryView({list(self)!r})"
+
+
+class MemberList(Sequence[zipfile.ZipInfo]):
+    """
+    Members of an archive being written, standing in for ``ZipFile.filelist``.
+
+    zipfile keeps one ZipInfo per member until it writes the central
+    directory on close: with its name string and date tuple, close to half
+    a kilobyte each, plus a ``NameToInfo`` slot. This list packs each
+    appended member into typed columns (about 50 bytes plus the encoded
+    name) and rebuilds ZipInfo objects one at a time when iterated, so
+    ``ZipFile.close`` writes the same central directory and ZIP64 records
+    while 100k+ members take a few megabytes.
+
+    Only what zipfile writes to the central directory is kept, and the
+    rebuilt ``date_time`` has the 2-second resolution of the ZIP format.
+    """
+
+    def __init__(self):
+        self.names = bytearray()
+        self.name_offsets = array('Q', [0])  # Member i is names[offsets[i]:offsets[i + 1]]
+        self.dos_date_times = array('I')  # DOS date << 16 | DOS time
+        self.crcs = array('I')
+        self.compressed_sizes = array('Q')
+        self.sizes = array('Q')
+        self.header_offsets = array('Q')
+        self.methods = array('H')
+        self.flags = array('H')
+        self.create_versions = array('B')
+        self.extract_versions = array('B')
+        self.create_systems = array('B')
+        self.external_attrs = array('I')
+
+    def __len__(self) -> int:
+        return len(self.crcs)
+
+    def append(self, zinfo: zipfile.ZipInfo) -> None:
+        """
+        Add a member whose local header is written.
+
+        Raises:
+            ValueError: If the member has an extra field, a comment or
+                        internal attributes, which are not kept
+        """
+        if zinfo.extra or zinfo.comment or zinfo.internal_attr:
+            raise ValueError(f"Cannot pack {zinfo.filename!r}: extra field, comment or internal attributes")
+        year, month, day, hour, minute, second = zinfo.date_time
+        self.names += zinfo.filename.encode('utf-8', 'surrogateescape')
+        self.name_offsets.append(len(self.names))
+        self.dos_date_times.append(((year - 1980) << 9 | month << 5 | day) << 16
+                                   | hour << 11 | minute << 5 | second // 2)
+        self.crcs.append(zinfo.CRC)
+        self.compressed_sizes.append(zinfo.compress_size)
+        self.sizes.append(zinfo.file_size)
+        self.header_offsets.append(zinfo.header_offset)
+        self.methods.append(zinfo.compress_type)
+        self.flags.append(zinfo.flag_bits)
+        self.create_versions.append(zinfo.create_version)
+        self.extract_versions.append(zinfo.extract_version)
+        self.create_systems.append(zinfo.create_system)
+        self.external_attrs.append(zinfo.external_attr)
+
+    @overload
+    def __getitem__(self, index: int) -> zipfile.ZipInfo: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[zipfile.ZipInfo]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("member index out of range")
+
+        packed = self.dos_date_times[index]
+        date, time = packed >> 16, packed & 0xFFFF
+        date_time = ((date >> 9) + 1980, date >> 5 & 0xF, date & 0x1F,
+                     time >> 11, time >> 5 & 0x3F, (time & 0x1F) * 2)
+        name = self.names[self.name_offsets[index]:self.name_offsets[index + 1]]
+        zinfo = zipfile.ZipInfo(name.decode('utf-8', 'surrogateescape'), date_time)
+        zinfo.CRC = self.crcs[index]
+        zinfo.compress_size = self.compressed_sizes[index]
+        zinfo.file_size = self.sizes[index]
+        zinfo.header_offset = self.header_offsets[index]
+        zinfo.compress_type = self.methods[index]
+        zinfo.flag_bits = self.flags[index]
+        zinfo.create_version = self.create_versions[index]
+        zinfo.extract_version = self.extract_versions[index]
+        zinfo.create_system = self.create_systems[index]
+        zinfo.external_attr = self.external_attrs[index]
+        return zinfo
+
+    def __iter__(self) -> Iterator[zipfile.ZipInfo]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __repr__(self) -> str:
+        return f"MemberList({len(self)} members)"
@@ -1,38 +1,159 @@
 """PyQt6 GUI for comick-merger."""
 
 import sys
+import time
+from collections import Counter
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Set
 
+from PyQt6 import sip
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QListWidget, QListWidgetItem, QLabel, QFileDialog,
     QMessageBox, QRadioButton, QButtonGroup, QProgressBar,
     QAbstractItemView, QTextEdit, QSplitter
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
-from PyQt6.QtGui import QDragEnterEvent, QDropEvent
+from PyQt6.QtCore import Qt, QThread, QThreadPool, QRunnable, QObject, QTimer, QSize, QStandardPaths, pyqtSignal
+from PyQt6.QtGui import QDragEnterEvent, QDropEvent, QBrush, QColor, QIcon, QImage, QPixmap
 
-from comick_merger.cbz_merger import CBZMerger
+from comick_merger.cbz_merger import CBZFile, CBZMerger, ConflictIndex, MergeProgress
+from comick_merger.discovery import is_zip_archive, iter_inputs
+from comick_merger.thumbnails import ThumbnailLoader
+
+
+THUMBNAIL_SIZE = QSize(36, 48)
+
+
+def thumbnail_cache_dir() -> Path:
+    """Default on-disk thumbnail cache location."""
+    base = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.CacheLocation)
+    return Path(base or Path.home() / ".cache" / "comick-merger") / "thumbnails"
+
+
+def _format_size(size: int) -> str:
+    """Format a byte count for display."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class _ScanSignals(QObject):
+    """Signals emitted by metadata scan tasks (QRunnable cannot emit itself)."""
+
+    loaded = pyqtSignal(str, object)  # Path, CBZFile
+    failed = pyqtSignal(str, str)  # Path, error message
+
+
+class _ScanTask(QRunnable):
+    """Reads the metadata of one CBZ file on a pool thread."""
+
+    def __init__(self, path: Path, signals: _ScanSignals):
+        super().__init__()
+        self.path = path
+        self.signals = signals
+
+    def run(self):
+        try:
+            cbz = CBZFile.from_path(self.path)
+        except Exception as e:
+            self.signals.failed.emit(str(self.path), str(e))
+        else:
+            self.signals.loaded.emit(str(self.path), cbz)
+
+
+class MetadataScanner(QObject):
+    """
+    Scans CBZ files in a background thread pool as soon as they are added.
+
+    Results are delivered on the GUI thread through the ``loaded`` and
+    ``failed`` signals. Paths already queued are not scanned twice.
+    """
+
+    loaded = pyqtSignal(object, object)  # Path, CBZFile
+    failed = pyqtSignal(object, str)  # Path, error message
+
+    def __init__(self, parent=None, max_threads: int = 4):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max(1, min(max_threads, QThreadPool.globalInstance().maxThreadCount())))
+        self._pending: Set[Path] = set()
+        self._signals = _ScanSignals(self)
+        self._signals.loaded.connect(self._on_loaded)
+        self._signals.failed.connect(self._on_failed)
+
+    def is_pending(self, path: Path) -> bool:
+        """Return True if the path is queued or being scanned."""
+        return path in self._pending
+
+    def scan(self, path: Path):
+        """Queue a path for scanning."""
+        if path in self._pending:
+            return
+        self._pending.add(path)
+        self._pool.start(_ScanTask(path, self._signals))
+
+    def _on_loaded(self, path: str, cbz: CBZFile):
+        self._pending.discard(Path(path))
+        self.loaded.emit(Path(path), cbz)
+
+    def _on_failed(self, path: str, error: str):
+        self._pending.discard(Path(path))
+        self.failed.emit(Path(path), error)
+
+
+class FolderDiscovery(QThread):
+    """Walks dropped folders in the background, delivering archives in batches as they are found."""
+
+    found = pyqtSignal(list)  # Paths, in natural order
+
+    # Largest batch, and longest wait before a partial batch is delivered
+    BATCH_SIZE = 200
+    BATCH_SECONDS = 0.1
+
+    def __init__(self, folders: List[Path], parent=None):
+        super().__init__(parent)
+        self.folders = folders
+
+    def run(self):
+        batch: List[Path] = []
+        sent = time.monotonic()
+        for path in iter_inputs(self.folders):
+            if self.isInterruptionRequested():
+                return
+            batch.append(path)
+            if len(batch) >= self.BATCH_SIZE or time.monotonic() - sent >= self.BATCH_SECONDS:
+                self.found.emit(batch)
+                batch = []
+                sent = time.monotonic()
+        if batch:
+            self.found.emit(batch)
 
 
 class MergeWorker(QThread):
     """Worker thread for merging CBZ files."""
 
     progress = pyqtSignal(str)  # Progress message
+    step = pyqtSignal(int, int)  # Entries done, entries total
     finished = pyqtSignal(bool, str)  # Success, message
 
-    def __init__(self, cbz_paths: List[Path], output_path: Path, use_prefixes: bool):
+    def __init__(self, cbz_paths: List[Path], output_path: Path, use_prefixes: bool,
+                 metadata: Optional[Dict[Path, CBZFile]] = None):
         super().__init__()
         self.cbz_paths = cbz_paths
         self.output_path = output_path
         self.use_prefixes = use_prefixes
+        self.metadata = dict(metadata or {})
+        self._last_percent = -1
 
     def run(self):
         """Run the merge operation."""
         try:
             self.progress.emit("Loading CBZ files...")
-            merger = CBZMerger(self.cbz_paths)
+            # Reuse metadata scanned in the background, reload what is missing or stale
+            merger = CBZMerger.from_cbz_files([
+                self._load(path) for path in self.cbz_paths
+            ])
 
             self.progress.emit("Detecting conflicts...")
             conflicts = merger.detect_conflicts()
@@ -44,23 +165,125 @@ class MergeWorker(QThread):
                 )
 
             self.progress.emit("Merging files...")
-            merger.merge(self.output_path, use_prefixes=self.use_prefixes)
+            stats = merger.merge(self.output_path, use_prefixes=self.use_prefixes,
+                                 progress=self._report_step)
 
             self.progress.emit("Done!")
-            self.finished.emit(True, f"Successfully merged {len(self.cbz_paths)} CBZ files!")
+            if stats.skipped:
+                self.finished.emit(True, "Output is already up to date with these files, nothing to do.")
+            else:
+                self.finished.emit(True, f"Successfully merged {len(self.cbz_paths)} CBZ files!")
 
         except Exception as e:
             self.finished.emit(False, f"Error: {str(e)}")
 
+    def _load(self, path: Path) -> CBZFile:
+        """Scanned metadata of a file, reloaded if missing or changed since the scan."""
+        cbz = self.metadata.get(path)
+        if cbz is None or not cbz.is_current():
+            cbz = CBZFile.from_path(path)
+        return cbz
+
+    def _report_step(self, event: MergeProgress):
+        # Only emit when the percentage changes to avoid flooding the GUI thread
+        percent = event.entries_done * 100 // max(event.entries_total, 1)
+        if percent != self._last_percent:
+            self._last_percent = percent
+            self.step.emit(event.entries_done, event.entries_total)
+
 
 class CBZListWidget(QListWidget):
-    """Custom list widget that accepts drag & drop of CBZ files."""
+    """
+    Custom list widget that accepts drag & drop of CBZ files and folders.
+
+    Cover thumbnails are requested only for the visible rows; rows scrolled
+    out of view go back to a shared placeholder icon so memory stays bounded
+    by the loader cache.
+    """
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, thumbnail_cache: Optional[Path] = None):
         super().__init__(parent)
         self.setAcceptDrops(True)
         self.setDragDropMode(QAbstractItemView.DragDropMode.InternalMove)
         self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        # Uniform rows let Qt lay out thousands of items without measuring each
+        self.setUniformItemSizes(True)
+        self.setIconSize(THUMBNAIL_SIZE)
+
+        placeholder = QPixmap(THUMBNAIL_SIZE)
+        placeholder.fill(QColor("#e0e0e0"))
+        self._placeholder = QIcon(placeholder)
+        # Items currently showing a real thumbnail, keyed by id() (items are unhashable)
+        self._with_icon: Dict[int, QListWidgetItem] = {}
+
+        self.thumbnails = ThumbnailLoader(THUMBNAIL_SIZE, disk_cache_dir=thumbnail_cache, parent=self)
+        self.thumbnails.ready.connect(self._thumbnail_ready)
+
+        # Debounce: scrolling fires many events, only the final position matters
+        self._visible_timer = QTimer(self)
+        self._visible_timer.setSingleShot(True)
+        self._visible_timer.setInterval(50)
+        self._visible_timer.timeout.connect(self.update_visible_thumbnails)
+        self.verticalScrollBar().valueChanged.connect(self.schedule_thumbnail_update)
+        self.model().rowsInserted.connect(self._rows_inserted)
+        self.model().rowsRemoved.connect(self.schedule_thumbnail_update)
+        self.model().rowsMoved.connect(self.schedule_thumbnail_update)
+
+    def schedule_thumbnail_update(self, *args):
+        """Refresh visible thumbnails once scrolling or editing settles."""
+        # Signal arguments are dropped: QTimer.start(int) would take them as an interval
+        self._visible_timer.start()
+
+    def _rows_inserted(self, parent, first: int, last: int):
+        for row in range(first, last + 1):
+            self.item(row).setIcon(self._placeholder)
+        self.schedule_thumbnail_update()
+
+    def resizeEvent(self, event):
+        """Request thumbnails for rows revealed by a resize."""
+        super().resizeEvent(event)
+        self.schedule_thumbnail_update()
+
+    def _visible_items(self) -> List[QListWidgetItem]:
+        """Return the items currently shown in the viewport."""
+        if self.count() == 0:
+            return []
+
+        viewport = self.viewport().rect()
+        first = self.indexAt(viewport.topLeft())
+        last = self.indexAt(viewport.bottomLeft())
+        first_row = first.row() if first.isValid() else 0
+        last_row = last.row() if last.isValid() else self.count() - 1
+        return [self.item(row) for row in range(first_row, last_row + 1)]
+
+    def update_visible_thumbnails(self):
+        """Show cached thumbnails for visible rows and request the missing ones."""
+        visible = self._visible_items()
+        visible_ids = {id(item) for item in visible}
+
+        for key in list(self._with_icon):
+            if key not in visible_ids:
+                item = self._with_icon.pop(key)
+                # Items removed from the list may already be deleted on the C++ side
+                if not sip.isdeleted(item):
+                    item.setIcon(self._placeholder)
+
+        wanted = []
+        for item in visible:
+            path = Path(item.data(Qt.ItemDataRole.UserRole))
+            image = self.thumbnails.cached(path)
+            if image is None:
+                wanted.append(path)
+            else:
+                item.setIcon(QIcon(QPixmap.fromImage(image)))
+                self._with_icon[id(item)] = item
+        self.thumbnails.set_wanted(wanted)
+
+    def _thumbnail_ready(self, path: Path, image: QImage):
+        for item in self._visible_items():
+            if Path(item.data(Qt.ItemDataRole.UserRole)) == path:
+                item.setIcon(QIcon(QPixmap.fromImage(image)))
+                self._with_icon[id(item)] = item
 
     def dragEnterEvent(self, event: QDragEnterEvent):
         """Accept drag events with files."""
@@ -77,19 +300,23 @@ class CBZListWidget(QListWidget):
             super().dragMoveEvent(event)
 
     def dropEvent(self, event: QDropEvent):
-        """Handle dropped files."""
+        """Handle dropped files and folders."""
         if event.mimeData().hasUrls():
             cbz_files = []
+            folders = []
             for url in event.mimeData().urls():
                 path = Path(url.toLocalFile())
-                if path.suffix.lower() in ['.cbz', '.zip']:
+                if path.is_dir():
+                    folders.append(path)
+                elif is_zip_archive(path):
                     cbz_files.append(path)
 
-            if cbz_files:
-                # Use window() to get MainWindow regardless of reparenting
-                main_window = self.window()
-                if hasattr(main_window, 'add_cbz_files'):
-                    main_window.add_cbz_files(cbz_files)
+            # Use window() to get MainWindow regardless of reparenting
+            main_window = self.window()
+            if cbz_files and hasattr(main_window, 'add_cbz_files'):
+                main_window.add_cbz_files(cbz_files)
+            if folders and hasattr(main_window, 'add_folders'):
+                main_window.add_folders(folders)
 
             event.acceptProposedAction()
         else:
@@ -103,6 +330,21 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.cbz_paths: List[Path] = []
         self.output_path: Optional[Path] = None
+        # Metadata cache: kept across removals so re-added files are not rescanned
+        self.metadata: Dict[Path, CBZFile] = {}
+        self.scan_errors: Dict[Path, str] = {}
+        self.conflict_index = ConflictIndex()
+        self._items: Dict[Path, QListWidgetItem] = {}
+        self._name_counts: Counter = Counter()
+        # Coalesces conflict report refreshes while many scans complete
+        self._conflict_timer = QTimer(self)
+        self._conflict_timer.setSingleShot(True)
+        self._conflict_timer.setInterval(100)
+        self._conflict_timer.timeout.connect(self.update_conflicts)
+        self.scanner = MetadataScanner(self)
+        self.scanner.loaded.connect(self.metadata_loaded)
+        self.scanner.failed.connect(self.metadata_failed)
+        self.discoveries: List[FolderDiscovery] = []
         self.init_ui()
 
     def init_ui(self):
@@ -134,7 +376,8 @@ class MainWindow(QMainWindow):
         list_label = QLabel("CBZ Files (drag to reorder):")
         top_layout.addWidget(list_label)
 
-        self.file_list = CBZListWidget(self)
+        self.file_list = CBZListWidget(self, thumbnail_cache=thumbnail_cache_dir())
+        self.file_list.model().rowsMoved.connect(self.files_reordered)
         top_layout.addWidget(self.file_list, 1)
 
         # Buttons for file management
@@ -157,6 +400,19 @@ class MainWindow(QMainWindow):
 
         splitter.addWidget(top_widget)
 
+        # Middle section: live conflict report
+        conflict_widget = QWidget()
+        conflict_layout = QVBoxLayout(conflict_widget)
+
+        self.conflict_label = QLabel("Conflicts:")
+        conflict_layout.addWidget(self.conflict_label)
+
+        self.conflict_text = QTextEdit()
+        self.conflict_text.setReadOnly(True)
+        conflict_layout.addWidget(self.conflict_text)
+
+        splitter.addWidget(conflict_widget)
+
         # Bottom section: log
         bottom_widget = QWidget()
         bottom_layout = QVBoxLayout(bottom_widget)
@@ -252,33 +508,137 @@ class MainWindow(QMainWindow):
             cbz_paths = [Path(f) for f in files]
             self.add_cbz_files(cbz_paths)
 
+    def add_folders(self, folders: List[Path]):
+        """Add the archives found under folders, as the background walk finds them."""
+        for folder in folders:
+            self.log(f"Scanning folder: {folder}")
+        discovery = FolderDiscovery(folders, self)
+        discovery.found.connect(self.add_cbz_files)
+        discovery.finished.connect(lambda: self._folders_scanned(discovery))
+        self.discoveries.append(discovery)
+        discovery.start()
+
+    def _folders_scanned(self, discovery: FolderDiscovery):
+        self.discoveries.remove(discovery)
+        self.log(f"Finished scanning {', '.join(folder.name for folder in discovery.folders)}")
+
+    def closeEvent(self, event):
+        """Stop folder walks before the window goes away."""
+        for discovery in list(self.discoveries):
+            discovery.requestInterruption()
+            discovery.wait()
+        super().closeEvent(event)
+
     def _display_name(self, path: Path) -> str:
         """Return a display name, adding parent dir if names conflict."""
-        names = [p.name for p in self.cbz_paths]
-        if names.count(path.name) > 1:
+        if self._name_counts[path.name] > 1:
             return f"{path.parent.name}/{path.name}"
         return path.name
 
+    def _item_text(self, path: Path) -> str:
+        """Return the item label: display name followed by scan status."""
+        name = self._display_name(path)
+        if path in self.scan_errors:
+            return f"{name}  [invalid]"
+        cbz = self.metadata.get(path)
+        if cbz is None:
+            return f"{name}  [scanning...]"
+        return f"{name}  [{cbz.page_count} pages, {_format_size(cbz.size)}]"
+
+    def _update_item(self, item: QListWidgetItem):
+        """Refresh the label, tooltip and color of a list item."""
+        path = Path(item.data(Qt.ItemDataRole.UserRole))
+        item.setText(self._item_text(path))
+        if path in self.scan_errors:
+            item.setToolTip(self.scan_errors[path])
+            item.setForeground(QBrush(QColor("#c62828")))
+        else:
+            item.setToolTip(str(path))
+            item.setForeground(QBrush())
+
     def _refresh_display_names(self):
         """Refresh all item labels to reflect current duplicate state."""
+        self._name_counts = Counter(p.name for p in self.cbz_paths)
         for i in range(self.file_list.count()):
-            item = self.file_list.item(i)
-            path = Path(item.data(Qt.ItemDataRole.UserRole))
-            item.setText(self._display_name(path))
+            self._update_item(self.file_list.item(i))
 
     def add_cbz_files(self, paths: List[Path]):
         """Add CBZ files to the list."""
         for path in paths:
-            if path not in self.cbz_paths:
+            if path not in self._items:
                 self.cbz_paths.append(path)
                 item = QListWidgetItem(path.name)
                 item.setData(Qt.ItemDataRole.UserRole, str(path))
                 self.file_list.addItem(item)
+                self._items[path] = item
                 self.log(f"Added: {path.name}")
+
+                # A file changed or repaired since it was last listed is scanned again
+                self.scan_errors.pop(path, None)
+                self.file_list.thumbnails.forget(path)
+                cbz = self.metadata.get(path)
+                if cbz is not None and cbz.is_current():
+                    self.conflict_index.add(path, cbz.entries)
+                else:
+                    self.metadata.pop(path, None)
+                    self.scanner.scan(path)
         self._refresh_display_names()
+        self.schedule_conflict_update()
 
         self.update_merge_button()
 
+    def metadata_loaded(self, path: Path, cbz: CBZFile):
+        """Store scanned metadata and update the row and conflict report."""
+        self.metadata[path] = cbz
+        self.scan_errors.pop(path, None)
+        if path not in self._items:
+            return
+
+        self.conflict_index.add(path, cbz.entries)
+        self._update_item(self._items[path])
+        self.schedule_conflict_update()
+
+    def metadata_failed(self, path: Path, error: str):
+        """Flag an archive that could not be read."""
+        self.scan_errors[path] = error
+        if path not in self._items:
+            return
+
+        self.log(f"Invalid: {path.name} ({error})")
+        self._update_item(self._items[path])
+        self.schedule_conflict_update()
+        self.update_merge_button()
+
+    def files_reordered(self, *args):
+        """Keep cbz_paths in sync with the list after a drag & drop reorder."""
+        self.cbz_paths = [
+            Path(self.file_list.item(i).data(Qt.ItemDataRole.UserRole))
+            for i in range(self.file_list.count())
+        ]
+        self.schedule_conflict_update()
+
+    def schedule_conflict_update(self):
+        """Refresh the conflict report shortly, coalescing bursts of changes."""
+        self._conflict_timer.start()
+
+    def update_conflicts(self):
+        """Refresh the conflict report from the cached metadata."""
+        conflicts = self.conflict_index.conflicts(self.cbz_paths)
+        pending = sum(1 for path in self.cbz_paths if self.scanner.is_pending(path))
+
+        label = f"Conflicts: {len(conflicts)}"
+        if pending:
+            label += f" (scanning {pending} file{'s' if pending > 1 else ''}...)"
+        self.conflict_label.setText(label)
+
+        lines = []
+        for path, indices in list(conflicts.items())[:200]:
+            names = ", ".join(self.cbz_paths[i].name for i in indices)
+            lines.append(f"{path}  <-  {names}")
+        if len(conflicts) > 200:
+            lines.append(f"... and {len(conflicts) - 200} more conflicts")
+        self.conflict_text.setPlainText("\n".join(lines))
+
     def remove_selected(self):
         """Remove selected files from the list."""
         selected_items = self.file_list.selectedItems()
@@ -289,9 +649,12 @@ class MainWindow(QMainWindow):
             row = self.file_list.row(item)
             self.file_list.takeItem(row)
             removed_path = self.cbz_paths.pop(row)
+            self._items.pop(removed_path, None)
+            self.conflict_index.remove(removed_path)
             self.log(f"Removed: {removed_path.name}")
 
         self._refresh_display_names()
+        self.schedule_conflict_update()
         self.update_merge_button()
 
     def clear_all(self):
@@ -309,7 +672,10 @@ class MainWindow(QMainWindow):
         if reply == QMessageBox.StandardButton.Yes:
             self.file_list.clear()
             self.cbz_paths.clear()
+            self._items.clear()
+            self.conflict_index.clear()
             self.log("Cleared all files.")
+            self.schedule_conflict_update()
             self.update_merge_button()
 
     def browse_output(self):
@@ -329,7 +695,11 @@ class MainWindow(QMainWindow):
 
     def update_merge_button(self):
         """Enable/disable merge button based on state."""
-        can_merge = len(self.cbz_paths) >= 2 and self.output_path is not None
+        can_merge = (
+            len(self.cbz_paths) >= 2
+            and self.output_path is not None
+            and not any(path in self.scan_errors for path in self.cbz_paths)
+        )
         self.merge_btn.setEnabled(can_merge)
 
     def merge_files(self):
@@ -342,6 +712,11 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Error", "Please select an output file.")
             return
 
+        invalid = [path.name for path in self.cbz_paths if path in self.scan_errors]
+        if invalid:
+            QMessageBox.warning(self, "Error", "Invalid CBZ files:\n" + "\n".join(invalid))
+            return
+
         # Disable UI during merge
         self.merge_btn.setEnabled(False)
         self.add_files_btn.setEnabled(False)
@@ -359,11 +734,17 @@ class MainWindow(QMainWindow):
 
         # Start worker thread
         use_prefixes = self.prefix_radio.isChecked()
-        self.worker = MergeWorker(current_paths, self.output_path, use_prefixes)
+        self.worker = MergeWorker(current_paths, self.output_path, use_prefixes, self.metadata)
         self.worker.progress.connect(self.log)
+        self.worker.step.connect(self.merge_step)
         self.worker.finished.connect(self.merge_finished)
         self.worker.start()
 
+    def merge_step(self, done: int, total: int):
+        """Switch the progress bar to determinate mode and update it."""
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(done)
+
     def merge_finished(self, success: bool, message: str):
         """Handle merge completion."""
         self.progress_bar.setVisible(False)
@@ -0,0 +1,174 @@
+"""Checkpoint journal making long merges resumable after a crash."""
+
+import json
+import os
+import struct
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple
+
+
+JOURNAL_VERSION = 1
+
+# Local file header: signature, versions, flags, method, time, date, crc, sizes, name/extra lengths
+_LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+_LOCAL_SIGNATURE = b'PK\x03\x04'
+_DATA_DESCRIPTOR_FLAG = 0x08
+
+
+def journal_path(temp_path: Path) -> Path:
+    """Path of the journal kept next to a partial output."""
+    return temp_path.with_name(temp_path.name + '.journal')
+
+
+class MergeJournal:
+    """
+    Records which output members are fully written, and where.
+
+    The journal is a JSON-lines file: a header identifying the merge plan,
+    then one record per member, appended only after the member's bytes were
+    flushed to the partial output. After a crash, ``recover`` checks the
+    records against the partial file and returns the members that can be
+    kept.
+    """
+
+    def __init__(self, path: Path, plan_id: str):
+        self.path = path
+        self.plan_id = plan_id
+        self._file: Optional[BinaryIO] = None
+
+    def start(self, records: List[dict] = ()) -> None:
+        """(Re)write the journal with its header and the given records, then open it for appending."""
+        self.close()
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"version": JOURNAL_VERSION, "plan": self.plan_id}) + "\n")
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def record(self, zinfo: zipfile.ZipInfo, end_offset: int) -> None:
+        """Append a member whose bytes end at ``end_offset`` in the output."""
+        self._file.write(json.dumps(_zinfo_to_record(zinfo, end_offset)) + "\n")
+        self._file.flush()
+
+    def close(self, remove: bool = False) -> None:
+        """Close the journal, deleting it once the merge is complete."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if remove:
+            self.path.unlink(missing_ok=True)
+
+    def recover(self, temp_path: Path) -> Tuple[List[zipfile.ZipInfo], int]:
+        """
+        Validate the journal against a partial output.
+
+        Records are kept while they are contiguous, lie within the file and
+        match the local header found at their offset. The partial file is
+        truncated right after the last valid member and the journal is
+        rewritten with the valid records only, ready for appending.
+
+        Returns:
+            (members already written, offset where writing resumes). Nothing
+            is kept if the journal is missing, unreadable, or belongs to a
+            different merge plan.
+        """
+        records = self._read_records()
+        if records is None or not temp_path.exists():
+            self.start()
+            return [], 0
+
+        valid: List[dict] = []
+        end = 0
+        with open(temp_path, 'r+b') as fp:
+            size = fp.seek(0, os.SEEK_END)
+            for record in records:
+                if record["offset"] != end or record["end"] > size:
+                    break
+                if not _matches_local_header(fp, record):
+                    break
+                valid.append(record)
+                end = record["end"]
+            fp.truncate(end)
+
+        self.start(valid)
+        return [_record_to_zinfo(record) for record in valid], end
+
+    def _read_records(self) -> Optional[List[dict]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.read().split("\n")
+            header = json.loads(lines[0])
+        except (OSError, ValueError):
+            return None
+
+        if header.get("version") != JOURNAL_VERSION or header.get("plan") != self.plan_id:
+            return None
+
+        records = []
+        for line in lines[1:]:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break  # Last line cut short by the crash
+        return records
+
+
+def _zinfo_to_record(zinfo: zipfile.ZipInfo, end_offset: int) -> dict:
+    return {
+        "name": zinfo.filename,
+        "offset": zinfo.header_offset,
+        "end": end_offset,
+        "crc": zinfo.CRC,
+        "csize": zinfo.compress_size,
+        "size": zinfo.file_size,
+        "method": zinfo.compress_type,
+        "date_time": list(zinfo.date_time),
+        "flags": zinfo.flag_bits,
+        "version": zinfo.extract_version,
+        "attr": zinfo.external_attr,
+    }
+
+
+def _record_to_zinfo(record: dict) -> zipfile.ZipInfo:
+    """Rebuild the ZipInfo the writer needs to list a member in the central directory."""
+    zinfo = zipfile.ZipInfo(record["name"], tuple(record["date_time"]))
+    zinfo.create_system = 3  # As compress_member sets it
+    zinfo.header_offset = record["offset"]
+    zinfo.CRC = record["crc"]
+    zinfo.compress_size = record["csize"]
+    zinfo.file_size = record["size"]
+    zinfo.compress_type = record["method"]
+    zinfo.flag_bits = record["flags"]
+    zinfo.extract_version = zinfo.create_version = record["version"]
+    zinfo.external_attr = record["attr"]
+    return zinfo
+
+
+def _matches_local_header(fp: BinaryIO, record: dict) -> bool:
+    """Check that the local header at the record offset describes the same member."""
+    fp.seek(record["offset"])
+    header = fp.read(_LOCAL_HEADER.size)
+    if len(header) != _LOCAL_HEADER.size:
+        return False
+
+    (signature, _version, flags, method, _time, _date, crc,
+     _csize, _size, name_len, extra_len) = _LOCAL_HEADER.unpack(header)
+    if signature != _LOCAL_SIGNATURE or method != record["method"]:
+        return False
+    if not flags & _DATA_DESCRIPTOR_FLAG and crc != record["crc"]:
+        return False
+
+    encoding = 'utf-8' if flags & 0x800 else 'cp437'
+    if fp.read(name_len).decode(encoding, 'replace') != record["name"]:
+        return False
+
+    data_end = record["offset"] + _LOCAL_HEADER.size + name_len + extra_len + record["csize"]
+    # A data descriptor (12 or 20 bytes, optionally signed) may follow the data
+    return record["end"] == data_end or (
+        flags & _DATA_DESCRIPTOR_FLAG and 0 < record["end"] - data_end <= 24
+    )
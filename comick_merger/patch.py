@@ -0,0 +1,325 @@
+"""
+Differential edits of a merged archive: replace, add or remove one chapter.
+
+Members of the other chapters are copied as they are stored, local header
+and compressed data together, and only the central directory is rebuilt:
+fixing one chapter of a large omnibus costs about one sequential copy of
+the file, without decompressing or recompressing anything. When the new
+chapter fits where the old one was, the archive can be edited in place.
+"""
+
+import os
+import re
+import struct
+import time
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+from comick_merger import zipio
+from comick_merger.cbz_merger import (
+    FINGERPRINT_COMMENT, CBZFile, CBZMerger, CBZSource, output_entry_name, temp_output_path
+)
+from comick_merger.codecs_policy import CompressionPolicy, compress_member, parse_policy, write_member
+from comick_merger.shards import append_fragment, copy_range
+
+
+# Chapter prefix of a merged member: 03_page.jpg or 03/page.jpg
+_CHAPTER_PREFIX = re.compile(r'(\d+)([_/])')
+
+# Extra field id used to pad local headers, as Android's zipalign does
+PADDING_EXTRA_ID = 0xD935
+
+# Smallest padding field (id and length only), and the largest one a local
+# header can hold next to a ZIP64 field
+MIN_PADDING = 4
+MAX_PADDING = 0xFFFF - 20
+
+
+@dataclass
+class PatchStats:
+    """Outcome of a chapter edit."""
+    members_kept: int = 0  # Members of other chapters, kept compressed as they were
+    members_removed: int = 0  # Members of the old chapter
+    members_written: int = 0  # Members of the new chapter
+    bytes_copied: int = 0  # Bytes of kept members copied; 0 when edited in place
+    in_place: bool = False  # True if the archive was edited without a copy
+    seconds: float = 0.0
+
+
+def chapter_prefix(name: str) -> Optional[Tuple[str, str]]:
+    """(zero-padded chapter number, separator) of a merged member, or None."""
+    match = _CHAPTER_PREFIX.match(name)
+    return match.groups() if match else None
+
+
+def _without_zip64(extra: bytes) -> bytes:
+    """Drop the ZIP64 field from a central extra field; zipfile adds it back if still needed."""
+    kept = b""
+    pos = 0
+    while pos + 4 <= len(extra):
+        block_id, block_len = struct.unpack_from('<HH', extra, pos)
+        if block_id != zipio.ZIP64_EXTRA_ID:
+            kept += extra[pos:pos + 4 + block_len]
+        pos += 4 + block_len
+    return kept
+
+
+def _padding_sizes(gap: int, count: int) -> Optional[List[int]]:
+    """
+    Split ``gap`` bytes into padding fields for ``count`` local headers.
+
+    Returns:
+        Padding of each header (0 or between MIN_PADDING and MAX_PADDING),
+        or None if the gap cannot be filled exactly
+    """
+    sizes = []
+    for _ in range(count):
+        size = min(gap, MAX_PADDING)
+        if 0 < gap - size < MIN_PADDING:
+            size -= MIN_PADDING  # Leave enough for one more field
+        if 0 < size < MIN_PADDING:
+            return None
+        sizes.append(size)
+        gap -= size
+    return sizes if gap == 0 else None
+
+
+def _write_chapter(output_zip: zipfile.ZipFile, chapter: CBZFile, prefix: str, use_prefixes: bool,
+                   policy: CompressionPolicy) -> None:
+    """Compress the members of a chapter and append them one at a time, as a merge does."""
+    with chapter.open() as reader:
+        for entry in chapter.entries:
+            name = output_entry_name(prefix, entry, use_prefixes)
+            write_member(output_zip, name, reader.read(entry), policy.codec_for(name))
+
+
+def _stage_chapter(path: Path, chapter: CBZFile, prefix: str, use_prefixes: bool,
+                   policy: CompressionPolicy) -> List[zipfile.ZipInfo]:
+    """
+    Write the local headers and data of a chapter's members to a fragment file.
+
+    Members are compressed one at a time, so only one page is held in
+    memory while the size of the new chapter is measured.
+
+    Returns:
+        Members, with offsets relative to the fragment
+    """
+    members = []
+    with chapter.open() as reader, open(path, 'wb') as fp:
+        for entry in chapter.entries:
+            name = output_entry_name(prefix, entry, use_prefixes)
+            zinfo, compressed = compress_member(name, reader.read(entry), policy.codec_for(name))
+            zinfo.header_offset = fp.tell()
+            fp.write(zinfo.FileHeader())
+            fp.write(compressed)
+            members.append(zinfo)
+    return members
+
+
+def _write_staged(output_zip: zipfile.ZipFile, zinfo: zipfile.ZipInfo, fragment_fp,
+                  padding: int = 0) -> None:
+    """Append a member of a staged fragment, padding its local header."""
+    data_offset = zinfo.header_offset + len(zinfo.FileHeader())
+    if padding:
+        zinfo.extra = struct.pack('<HH', PADDING_EXTRA_ID, padding - 4) + bytes(padding - 4)
+    fp = output_zip.fp
+    fp.seek(output_zip.start_dir)
+    zinfo.header_offset = output_zip.start_dir
+    fp.write(zinfo.FileHeader())
+    if copy_range(fragment_fp, data_offset, zinfo.compress_size, fp) != zinfo.compress_size:
+        raise ValueError(f"Truncated staged member: {zinfo.filename}")
+    # The padding only lives in the local header
+    zinfo.extra = b""
+    output_zip.start_dir = fp.tell()
+    output_zip.filelist.append(zinfo)
+
+
+def _keep(output_zip: zipfile.ZipFile, zinfo: zipfile.ZipInfo, header_offset: int) -> None:
+    """List a member already present in the output at ``header_offset``."""
+    zinfo.header_offset = header_offset
+    zinfo.extra = _without_zip64(zinfo.extra)
+    output_zip.filelist.append(zinfo)
+    output_zip.NameToInfo[zinfo.filename] = zinfo
+
+
+def _copy_members(source_fp, output_zip: zipfile.ZipFile, members: Sequence[zipfile.ZipInfo],
+                  ends: Sequence[int]) -> int:
+    """
+    Copy members as stored, each run of adjacent members in one copy.
+
+    Args:
+        members: Members in file order
+        ends: End of each member's bytes in the source (data descriptor included)
+
+    Returns:
+        Number of bytes copied
+    """
+    fp = output_zip.fp
+    copied = 0
+    run_start = 0
+    for index, zinfo in enumerate(members):
+        is_last = index + 1 == len(members) or members[index + 1].header_offset != ends[index]
+        if not is_last:
+            continue
+        start = members[run_start].header_offset
+        base = output_zip.start_dir
+        fp.seek(base)
+        length = ends[index] - start
+        if copy_range(source_fp, start, length, fp) != length:
+            raise ValueError(f"Truncated member data at offset {start}")
+        for member in members[run_start:index + 1]:
+            _keep(output_zip, member, member.header_offset - start + base)
+        output_zip.start_dir = fp.tell()
+        copied += length
+        run_start = index + 1
+    return copied
+
+
+def replace_chapter(
+    archive_path: Path,
+    chapter: int,
+    source: Optional[CBZSource] = None,
+    compression: Union[str, CompressionPolicy, None] = None,
+    in_place: bool = False
+) -> PatchStats:
+    """
+    Replace, add or remove the members of one chapter in a merged archive.
+
+    A chapter is identified by its number in the member prefixes (``03_``
+    or ``03/``); the new chapter's members get the same prefix, written at
+    the place of the old ones (or, for a new chapter, before the next
+    chapter). The archive comment loses its merge fingerprint, so a later
+    merge of the sources rewrites the archive.
+
+    Without ``in_place``, the result is written next to the archive and
+    renamed over it, like a merge. With ``in_place``, the archive is
+    edited directly when the old chapter is the last one or the new one
+    fits in its space (leftover bytes go to padding fields in the new
+    local headers); otherwise it falls back to a copy. An interrupted
+    in-place edit leaves a broken archive.
+
+    Args:
+        archive_path: Archive written by CBZMerger.merge
+        chapter: Chapter number
+        source: Archive, image folder or in-memory source of the new
+                chapter; None removes the chapter
+        compression: Codec of the new chapter's members (see
+                     codecs_policy.parse_policy); other members keep theirs
+        in_place: Edit the archive without copying it when possible
+
+    Returns:
+        PatchStats
+
+    Raises:
+        ValueError: If the archive has no chapter prefixes, its chapters
+                    are not stored in order (e.g. merged with covers
+                    first), the chapter to remove does not exist, or the
+                    chapter number is wider than the existing prefixes
+    """
+    started = time.monotonic()
+    policy = parse_policy(compression)
+    new_chapter = CBZMerger([source]).cbz_files[0] if source is not None else None
+
+    with open(archive_path, 'rb') as fp, zipfile.ZipFile(fp) as archive:
+        members = sorted(archive.infolist(), key=lambda zinfo: zinfo.header_offset)
+        directory_offset = archive.start_dir
+        comment = b"" if archive.comment.startswith(FINGERPRINT_COMMENT) else archive.comment
+
+    prefixes = [chapter_prefix(zinfo.filename) for zinfo in members]
+    known = [prefix for prefix in prefixes if prefix is not None]
+    if not known:
+        raise ValueError(f"No chapter prefixes in {archive_path}: not a merged archive")
+    width, separator = len(known[0][0]), known[0][1]
+    prefix = str(chapter).zfill(width)
+    if len(prefix) > width:
+        raise ValueError(f"Chapter {chapter} does not fit in {width}-digit prefixes")
+
+    chapters = [int(prefix[0]) if prefix is not None else None for prefix in prefixes]
+    numbers = [number for number in chapters if number is not None]
+    if numbers != sorted(numbers):
+        # Covers first: a chapter's members are split, there is no one place to edit
+        raise ValueError(f"Chapters are not stored one after the other in {archive_path} "
+                         "(merged with covers first?): cannot patch it")
+    removed = [index for index, number in enumerate(chapters) if number == chapter]
+    if new_chapter is None and not removed:
+        raise ValueError(f"Chapter {chapter} not found in {archive_path}")
+    # The new chapter goes where the old one started, or before the next chapter
+    at = next((index for index, number in enumerate(chapters)
+               if number is not None and number >= chapter), len(members))
+    ends = [zinfo.header_offset for zinfo in members[1:]] + [directory_offset]
+
+    # Removed members all come from ``at`` on
+    removed_set = set(removed)
+    before = members[:at]
+    kept_after = [index for index in range(at, len(members)) if index not in removed_set]
+    after = [members[index] for index in kept_after]
+    stats = PatchStats(members_kept=len(before) + len(after), members_removed=len(removed),
+                       members_written=len(new_chapter.entries) if new_chapter is not None else 0)
+    use_prefixes = separator == '_'
+
+    temp_path = temp_output_path(archive_path)
+    staged_path = temp_path.with_name(temp_path.name + '.chapter')
+    staged = None
+    padding = None
+    try:
+        if in_place and removed == list(range(at, at + len(removed))):
+            span_start = members[at].header_offset if at < len(members) else directory_offset
+            span_end = ends[at + len(removed) - 1] if removed else span_start
+            if span_end == directory_offset:
+                padding = []  # Last chapter: anything fits
+            elif new_chapter is None:
+                padding = _padding_sizes(span_end - span_start, 0)
+            else:
+                # Measure the new chapter before deciding whether it fits
+                staged = _stage_chapter(staged_path, new_chapter, prefix, use_prefixes, policy)
+                needed = staged_path.stat().st_size
+                if needed <= span_end - span_start:
+                    padding = _padding_sizes(span_end - span_start - needed, len(staged))
+
+        if padding is not None:
+            with open(archive_path, 'r+b') as fp:
+                fp.seek(span_start)
+                with zipfile.ZipFile(fp, 'w') as output_zip:
+                    output_zip.comment = comment
+                    for zinfo in before:
+                        _keep(output_zip, zinfo, zinfo.header_offset)
+                    if staged is not None:
+                        with open(staged_path, 'rb') as fragment_fp:
+                            for zinfo, size in zip(staged, padding):
+                                _write_staged(output_zip, zinfo, fragment_fp, size)
+                    elif new_chapter is not None:
+                        _write_chapter(output_zip, new_chapter, prefix, use_prefixes, policy)
+                    for zinfo in after:
+                        _keep(output_zip, zinfo, zinfo.header_offset)
+                    if after:
+                        output_zip.start_dir = directory_offset
+                fp.truncate()
+            stats.in_place = True
+        else:
+            try:
+                with open(archive_path, 'rb') as source_fp, open(temp_path, 'wb') as output_fp:
+                    with zipfile.ZipFile(output_fp, 'w') as output_zip:
+                        output_zip.comment = comment
+                        stats.bytes_copied += _copy_members(source_fp, output_zip, before, ends[:at])
+                        if staged is not None:
+                            append_fragment(output_zip, staged_path, staged)
+                        elif new_chapter is not None:
+                            _write_chapter(output_zip, new_chapter, prefix, use_prefixes, policy)
+                        stats.bytes_copied += _copy_members(source_fp, output_zip, after,
+                                                            [ends[index] for index in kept_after])
+                os.replace(temp_path, archive_path)
+            except BaseException:
+                temp_path.unlink(missing_ok=True)
+                raise
+    finally:
+        staged_path.unlink(missing_ok=True)
+
+    stats.seconds = time.monotonic() - started
+    return stats
+
+
+def remove_chapter(archive_path: Path, chapter: int, in_place: bool = False) -> PatchStats:
+    """Remove the members of one chapter from a merged archive (see replace_chapter)."""
+    return replace_chapter(archive_path, chapter, None, in_place=in_place)
@@ -0,0 +1,79 @@
+"""Bounded pool of open source archives."""
+
+import zipfile
+from typing import Any, Dict, Sequence
+
+from comick_merger.cache import LRUCache
+
+
+# Source archives kept open at once; file descriptors are limited per process
+# (often 1024), so merging thousands of inputs must not keep them all open
+DEFAULT_MAX_OPEN = 64
+
+
+class SourcePool:
+    """
+    Open handles on source archives, at most ``max_open`` at a time.
+
+    Handles are opened on first use and kept for reuse; once the pool is
+    full, the least recently used one is closed. Reading members in any
+    order across thousands of archives therefore needs at most
+    ``max_open`` file descriptors, and reading several members of an
+    archive in a row opens it once.
+
+    Not thread-safe: a handle may be closed by another caller's ``get``.
+    """
+
+    def __init__(self, cbz_files: Sequence[Any], max_open: int = DEFAULT_MAX_OPEN,
+                 raw: bool = False):
+        """
+        Args:
+            cbz_files: CBZFile of each archive id
+            max_open: Maximum number of handles kept open
+            raw: Hand out raw binary streams (CBZFile.open_stream) instead
+                 of ZipFile objects (CBZFile.open)
+        """
+        self._cbz_files = cbz_files
+        self._raw = raw
+        self._handles: LRUCache[int, Any] = LRUCache(max_open, on_evict=self._close)
+
+    def _close(self, archive_id: int, handle: Any) -> None:
+        # Stream sources belong to the caller
+        if handle is not self._cbz_files[archive_id].source:
+            handle.close()
+
+    def get(self, archive_id: int) -> Any:
+        """Return an open handle on an archive, opening it if needed."""
+        handle = self._handles.get(archive_id)
+        if handle is None:
+            cbz = self._cbz_files[archive_id]
+            handle = cbz.open_stream() if self._raw else cbz.open()
+            self._handles.put(archive_id, handle)
+        return handle
+
+    def read(self, archive_id: int, entry: str) -> bytes:
+        """Read and decompress one member (ZipFile pools only)."""
+        handle: zipfile.ZipFile = self.get(archive_id)
+        return handle.read(entry)
+
+    def stats(self) -> Dict[str, int]:
+        """Handles currently open, and how often one was opened, reused or closed to make room."""
+        return {
+            "open": len(self._handles),
+            "opened": self._handles.misses,
+            "reused": self._handles.hits,
+            "evicted": self._handles.evictions,
+        }
+
+    def close(self) -> None:
+        """Close every open handle; the pool can still be used afterwards."""
+        for archive_id in self._handles.keys():
+            handle = self._handles.pop(archive_id)
+            if handle is not None:
+                self._close(archive_id, handle)
+
+    def __enter__(self) -> 'SourcePool':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,183 @@
+"""
+Profiling hooks: named timing spans and a sampling profiler.
+
+Spans time the hot paths of a merge (scanning, conflict detection, each
+merge phase) and are cheap enough to stay on all the time: two clock reads
+and a lock per span. ``Sampler`` snapshots the stacks of every thread at
+a fixed interval and writes them as collapsed stacks (flamegraph.pl,
+inferno) or a speedscope profile; the spans active in a thread show up
+as the outermost frames of its stacks.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+
+# Seconds between two stack samples
+SAMPLE_INTERVAL = 0.005
+
+# Frames kept per sampled stack, innermost first
+MAX_STACK_DEPTH = 128
+
+
+@dataclass
+class SpanTotal:
+    """Time spent in one named span, over all threads."""
+    count: int = 0
+    seconds: float = 0.0
+
+
+_totals: Dict[str, SpanTotal] = {}
+_totals_lock = threading.Lock()
+# Thread id -> names of the spans open in that thread, outermost first
+_active: Dict[int, List[str]] = {}
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a block under ``name``; nested and concurrent spans are all counted."""
+    ident = threading.get_ident()
+    stack = _active.setdefault(ident, [])
+    stack.append(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        if not stack:
+            _active.pop(ident, None)
+        with _totals_lock:
+            total = _totals.get(name)
+            if total is None:
+                total = _totals[name] = SpanTotal()
+            total.count += 1
+            total.seconds += elapsed
+
+
+def span_totals() -> Dict[str, SpanTotal]:
+    """Copy of the totals of every span since the last reset, by name."""
+    with _totals_lock:
+        return {name: SpanTotal(total.count, total.seconds) for name, total in _totals.items()}
+
+
+def reset_spans() -> None:
+    """Forget the recorded totals."""
+    with _totals_lock:
+        _totals.clear()
+
+
+def format_spans(totals: Dict[str, SpanTotal]) -> str:
+    """One line per span, slowest first."""
+    width = max((len(name) for name in totals), default=0)
+    return "\n".join(f"  {name:<{width}}  {total.seconds:9.3f}s  {total.count:8d} calls"
+                     for name, total in sorted(totals.items(), key=lambda item: -item[1].seconds))
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Sampler:
+    """
+    Sampling profiler over every thread of the process.
+
+    A background thread reads ``sys._current_frames()`` every ``interval``
+    seconds and counts identical stacks, so the cost does not depend on
+    how many functions run, unlike cProfile. Use as a context manager, or
+    call start() and stop().
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        if interval <= 0:
+            raise ValueError(f"interval must be positive, got {interval}")
+        self.interval = interval
+        self.stacks: Counter = Counter()  # (frame names, outermost first) -> samples
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start sampling in a background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling; the stacks recorded so far are kept."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'Sampler':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(exclude=own)
+
+    def sample(self, exclude: Optional[int] = None) -> None:
+        """Record the current stack of every thread but ``exclude``."""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == exclude:
+                continue
+            frames = []
+            while frame is not None and len(frames) < MAX_STACK_DEPTH:
+                frames.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            spans = [f"[{name}]" for name in _active.get(ident, ())]
+            thread = f"thread {names.get(ident, ident)}"
+            self.stacks[tuple([thread] + spans + frames[::-1])] += 1
+
+    def write_collapsed(self, path: Path) -> None:
+        """Write ``frame;frame;frame count`` lines, as read by flamegraph tools."""
+        with open(path, 'w', encoding='utf-8') as fp:
+            for stack, count in sorted(self.stacks.items()):
+                fp.write(";".join(frame.replace(";", ":") for frame in stack) + f" {count}\n")
+
+    def write_speedscope(self, path: Path) -> None:
+        """Write a speedscope profile (https://www.speedscope.app)."""
+        frames: Dict[str, int] = {}
+        samples: List[List[int]] = []
+        weights: List[float] = []
+        for stack, count in self.stacks.items():
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(count * self.interval)
+        profile = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [{"name": name} for name in frames]},
+            "profiles": [{
+                "type": "sampled",
+                "name": "comick-merger",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "exporter": "comick-merger",
+        }
+        with open(path, 'w', encoding='utf-8') as fp:
+            json.dump(profile, fp)
+
+    def write(self, path: Path) -> None:
+        """Write a speedscope profile for ``.json`` paths, collapsed stacks otherwise."""
+        if Path(path).suffix.lower() == ".json":
+            self.write_speedscope(path)
+        else:
+            self.write_collapsed(path)
+
@@ -0,0 +1,332 @@
+"""Persistent local merge server and its thin client.
+
+The server keeps scanned archive metadata warm between jobs, so repeated
+small merges skip interpreter start-up, imports and cold scans. Jobs are
+exchanged as one JSON object per line over a Unix socket (or a localhost
+TCP port where Unix sockets are unavailable).
+"""
+
+import ipaddress
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from comick_merger import __version__
+from comick_merger.cache import LRUCache
+from comick_merger.cbz_merger import CBZFile, CBZMerger, archive_fingerprint
+from comick_merger.pool import DEFAULT_MAX_OPEN
+
+
+# Environment variable overriding the server address, e.g. "unix:/tmp/cm.sock" or "tcp:127.0.0.1:48765"
+ADDRESS_ENV = "COMICK_SERVER"
+
+DEFAULT_TCP_PORT = 48765
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_CACHE_SIZE = 50_000
+
+Address = Tuple[str, Any]  # ("unix", path) or ("tcp", (host, port))
+
+
+def default_address() -> Address:
+    """Address used by both the server and the client when none is given."""
+    configured = os.environ.get(ADDRESS_ENV)
+    if configured:
+        return parse_address(configured)
+
+    if not hasattr(socket, 'AF_UNIX'):
+        return ("tcp", ("127.0.0.1", DEFAULT_TCP_PORT))
+
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    name = f"comick-merger-{os.getuid()}.sock" if hasattr(os, 'getuid') else "comick-merger.sock"
+    return ("unix", str(Path(runtime_dir) / name))
+
+
+def is_loopback(host: str) -> bool:
+    """True if every address ``host`` resolves to is a loopback address."""
+    try:
+        infos = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+    except socket.gaierror:
+        return False
+    return bool(infos) and all(ipaddress.ip_address(info[4][0].split('%')[0]).is_loopback for info in infos)
+
+
+def parse_address(spec: str) -> Address:
+    """Parse "unix:PATH" or "tcp:HOST:PORT"."""
+    kind, _, rest = spec.partition(":")
+    if kind == "unix" and rest:
+        return ("unix", rest)
+    if kind == "tcp":
+        host, _, port = rest.rpartition(":")
+        if host and port.isdigit():
+            return ("tcp", (host, int(port)))
+    raise ValueError(f"Invalid server address: {spec!r} (expected unix:PATH or tcp:HOST:PORT)")
+
+
+class MetadataCache:
+    """
+    Scanned CBZ metadata shared by all jobs of a server.
+
+    Entries are keyed by archive fingerprint, so a file that is replaced or
+    modified is rescanned automatically.
+    """
+
+    def __init__(self, max_archives: int = DEFAULT_CACHE_SIZE):
+        self._cache: LRUCache[str, CBZFile] = LRUCache(max_archives)
+
+    def load(self, path: Path) -> CBZFile:
+        """Return the metadata of an archive, scanning it only on a cache miss."""
+        if not path.exists():
+            raise FileNotFoundError(f"CBZ file not found: {path}")
+
+        if path.is_dir():
+            # A folder's own mtime misses rewritten pages; listing it is cheap anyway
+            return CBZFile.from_path(path)
+
+        key = archive_fingerprint(path)
+        cbz = self._cache.get(key)
+        if cbz is None or cbz.path != path:
+            cbz = CBZFile.from_path(path)
+            self._cache.put(key, cbz)
+        return cbz
+
+    def stats(self) -> Dict[str, int]:
+        """Cache size and hit/miss counters."""
+        return {
+            "archives": len(self._cache),
+            "hits": self._cache.hits,
+            "misses": self._cache.misses,
+        }
+
+
+def run_job(job: Dict[str, Any], cache: MetadataCache) -> Dict[str, Any]:
+    """
+    Execute a merge job and return the JSON response.
+
+    Job fields: ``sources`` (absolute paths, in order), ``output``,
+    ``use_prefixes`` (default True), ``check_only``, ``journal``,
+    ``resume``, ``force``, ``covers_first`` and ``reproducible`` (default
+    False), ``compression`` (a policy spec, default None), ``shards``
+    (default 1), ``max_open`` (default DEFAULT_MAX_OPEN), and
+    ``read_limit`` and ``write_limit`` (bytes per second, default None).
+    """
+    sources = [Path(source) for source in job["sources"]]
+    merger = CBZMerger.from_cbz_files([cache.load(path) for path in sources])
+    conflicts = merger.detect_conflicts()
+
+    response = {"ok": True, "conflicts": conflicts, "skipped": False}
+    if not job.get("check_only"):
+        stats = merger.merge(Path(job["output"]), use_prefixes=job.get("use_prefixes", True),
+                             journal=job.get("journal", False), resume=job.get("resume", False),
+                             force=job.get("force", False),
+                             order=merger.covers_first_order() if job.get("covers_first") else None,
+                             compression=job.get("compression"), shards=job.get("shards", 1),
+                             reproducible=job.get("reproducible", False),
+                             max_open=job.get("max_open", DEFAULT_MAX_OPEN),
+                             read_limit=job.get("read_limit"), write_limit=job.get("write_limit"))
+        response.update(skipped=stats.skipped, seconds=round(stats.seconds, 3),
+                        bytes_read=stats.bytes_read, bytes_written=stats.bytes_written,
+                        throttled_seconds=round(stats.throttled_seconds, 3))
+
+    return response
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Reads one JSON request line and writes one JSON response line."""
+
+    server: 'MergeServer'
+
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+            response = self.server.dispatch(request)
+        except Exception as e:
+            response = {"ok": False, "error": str(e)}
+        self.wfile.write(json.dumps(response).encode('utf-8') + b"\n")
+
+
+class MergeServer:
+    """
+    Accepts merge jobs on a local socket and runs them on a bounded pool.
+
+    At most ``workers`` jobs run at once and ``queue_size`` more may wait;
+    further jobs are refused with a "busy" error so clients fall back to
+    merging locally instead of piling up.
+
+    Jobs read and write any path the server user can, and the protocol
+    has no authentication: the Unix socket is only accessible to its
+    owner, and TCP servers listen on loopback addresses unless
+    ``allow_remote`` is set (any local user can reach a TCP server).
+    """
+
+    def __init__(
+        self,
+        address: Optional[Address] = None,
+        workers: int = DEFAULT_WORKERS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        allow_remote: bool = False
+    ):
+        """
+        Raises:
+            ValueError: For a TCP address that is not loopback, without
+                        ``allow_remote``
+            RuntimeError: If another server is running on the socket
+        """
+        self.address = address or default_address()
+        if self.address[0] == "tcp" and not allow_remote and not is_loopback(self.address[1][0]):
+            raise ValueError(f"Refusing to listen on {self.address[1][0]}: jobs read and write any path "
+                             "as this user, without authentication (allow_remote / --allow-remote)")
+        self.cache = MetadataCache(cache_size)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="comick-job")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._server = self._bind()
+        self._server.dispatch = self.dispatch
+
+    def _bind(self) -> socketserver.BaseServer:
+        kind, target = self.address
+        if kind == "unix":
+            path = Path(target)
+            if path.exists():
+                if ping(self.address) is not None:
+                    raise RuntimeError(f"A merge server is already running on {path}")
+                path.unlink()  # Stale socket left by a server that died
+            # Create the socket owner-only: a chmod after bind leaves a window
+            # where other users could connect
+            umask = os.umask(0o077)
+            try:
+                server = socketserver.ThreadingUnixStreamServer(str(path), _RequestHandler)
+            finally:
+                os.umask(umask)
+            os.chmod(path, 0o600)
+        else:
+            server = socketserver.ThreadingTCPServer(target, _RequestHandler)
+        server.daemon_threads = True
+        return server
+
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle a decoded request; runs on the connection thread."""
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True, "version": __version__}
+        if op == "stats":
+            return {"ok": True, "cache": self.cache.stats()}
+        if op != "merge":
+            return {"ok": False, "error": f"Unknown operation: {op!r}"}
+        client_version = request.get("version")
+        if client_version is not None and client_version != __version__:
+            return {"ok": False, "version_mismatch": True, "version": __version__,
+                    "error": f"Merge server runs version {__version__}, client {client_version}"}
+
+        if not self._slots.acquire(blocking=False):
+            return {"ok": False, "busy": True, "error": "Server busy"}
+        try:
+            return self._pool.submit(run_job, request, self.cache).result()
+        finally:
+            self._slots.release()
+
+    def serve_forever(self):
+        """Serve until shutdown() is called."""
+        self._server.serve_forever()
+
+    def shutdown(self):
+        """Stop serving, wait for running jobs and remove the socket file."""
+        self._server.shutdown()
+        self._server.server_close()
+        self._pool.shutdown(wait=True)
+        if self.address[0] == "unix":
+            Path(self.address[1]).unlink(missing_ok=True)
+
+
+def request(payload: Dict[str, Any], address: Optional[Address] = None,
+            timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Send a request to the server and return its response.
+
+    Returns None when no server is listening, so callers can fall back to
+    doing the work locally.
+    """
+    kind, target = address or default_address()
+    family = socket.AF_UNIX if kind == "unix" else socket.AF_INET
+    try:
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.settimeout(1.0)
+            sock.connect(target)
+            sock.settimeout(timeout)
+            sock.sendall(json.dumps(payload).encode('utf-8') + b"\n")
+            with sock.makefile('rb') as reader:
+                line = reader.readline()
+    except OSError:
+        # No socket file, nobody listening, or the server went away
+        return None
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def ping(address: Optional[Address] = None) -> Optional[Dict[str, Any]]:
+    """Return the server's ping response, or None if it is not running."""
+    return request({"op": "ping"}, address, timeout=1.0)
+
+
+def submit_merge(sources: List[Path], output: Path, use_prefixes: bool = True,
+                 check_only: bool = False, journal: bool = False, resume: bool = False,
+                 force: bool = False, covers_first: bool = False,
+                 compression: Optional[str] = None, shards: int = 1,
+                 reproducible: bool = False, max_open: int = DEFAULT_MAX_OPEN,
+                 read_limit: Optional[int] = None, write_limit: Optional[int] = None,
+                 address: Optional[Address] = None) -> Optional[Dict[str, Any]]:
+    """
+    Run a merge on the server, if one is running.
+
+    Paths are made absolute since the server has its own working directory.
+    Returns None when no server is available, it is busy, or it runs
+    another version of comick-merger.
+    """
+    response = request({
+        "op": "merge",
+        "version": __version__,
+        "sources": [str(Path(source).absolute()) for source in sources],
+        "output": str(Path(output).absolute()),
+        "use_prefixes": use_prefixes,
+        "check_only": check_only,
+        "journal": journal,
+        "resume": resume,
+        "force": force,
+        "covers_first": covers_first,
+        "compression": compression,
+        "shards": shards,
+        "reproducible": reproducible,
+        "max_open": max_open,
+        "read_limit": read_limit,
+        "write_limit": write_limit,
+    }, address)
+    if response is None or response.get("busy") or response.get("version_mismatch"):
+        return None
+    return response
+
+
+def serve(address: Optional[Address] = None, workers: int = DEFAULT_WORKERS,
+          queue_size: int = DEFAULT_QUEUE_SIZE, cache_size: int = DEFAULT_CACHE_SIZE,
+          allow_remote: bool = False) -> int:
+    """Run a server in the foreground until interrupted (see MergeServer)."""
+    server = MergeServer(address, workers=workers, queue_size=queue_size, cache_size=cache_size,
+                         allow_remote=allow_remote)
+    kind, target = server.address
+    where = target if kind == "unix" else f"{target[0]}:{target[1]}"
+    print(f"Merge server listening on {kind}:{where} ({workers} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...", file=sys.stderr)
+    finally:
+        server.shutdown()
+    return 0
@@ -0,0 +1,105 @@
+"""Fragments of a merged archive written in parallel, then stitched into one ZIP."""
+
+import io
+import os
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, List, Sequence
+
+
+# Bytes copied per system call when stitching fragments
+COPY_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+def fragment_path(temp_path: Path, shard: int) -> Path:
+    """Path of the fragment written by one shard, next to the partial output."""
+    return temp_path.with_name(f"{temp_path.name}.shard{shard}")
+
+
+def shard_bounds(weights: Sequence[int], shards: int) -> List[int]:
+    """
+    Split a sequence into at most ``shards`` contiguous slices of similar weight.
+
+    Members weighing nothing (unknown sizes) count as one byte, so slices
+    still get similar member counts.
+
+    Returns:
+        Boundaries: slice i is ``[bounds[i], bounds[i + 1])``; empty slices
+        are dropped
+    """
+    total = sum(max(weight, 1) for weight in weights)
+    bounds = [0]
+    running = 0
+    for index, weight in enumerate(weights):
+        running += max(weight, 1)
+        # Close the slice once it reaches its share of the total
+        if running * shards >= total * len(bounds) and len(bounds) < shards:
+            bounds.append(index + 1)
+    if bounds[-1] != len(weights):
+        bounds.append(len(weights))
+    return bounds
+
+
+def copy_range(source: BinaryIO, offset: int, length: int, output_fp: BinaryIO) -> int:
+    """
+    Append ``length`` bytes of ``source`` from ``offset`` to ``output_fp`` at its current position.
+
+    Uses ``os.copy_file_range`` where available, so the bytes stay in the
+    kernel (and may be shared on copy-on-write filesystems).
+
+    Returns:
+        Number of bytes copied (less than ``length`` if the source ends first)
+    """
+    output_fp.flush()
+    copied = 0
+    start = output_fp.tell()
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copied < length:
+                count = os.copy_file_range(source.fileno(), output_fp.fileno(),
+                                           min(COPY_CHUNK_SIZE, length - copied),
+                                           offset + copied, start + copied)
+                if count == 0:
+                    break
+                copied += count
+        except (OSError, io.UnsupportedOperation):
+            pass  # Unsupported between these files: copy what is left by hand
+        output_fp.seek(start + copied)
+    source.seek(offset + copied)
+    while copied < length:
+        chunk = source.read(min(COPY_CHUNK_SIZE, length - copied))
+        if not chunk:
+            break
+        output_fp.write(chunk)
+        copied += len(chunk)
+    return copied
+
+
+def copy_into(source: Path, output_fp: BinaryIO) -> int:
+    """
+    Append a whole file to ``output_fp`` at its current position (see copy_range).
+
+    Returns:
+        Number of bytes copied
+    """
+    with open(source, 'rb') as fragment:
+        return copy_range(fragment, 0, os.fstat(fragment.fileno()).st_size, output_fp)
+
+
+def append_fragment(output_zip: zipfile.ZipFile, path: Path, members: Sequence[zipfile.ZipInfo]) -> None:
+    """
+    Append a fragment to an archive open for writing.
+
+    A fragment holds local headers and data only; ``members`` describe
+    them with offsets relative to the fragment start (a list or an
+    entries.MemberList). Local headers hold no offsets, so only the
+    central directory entries are rebased.
+    """
+    fp = output_zip.fp
+    fp.seek(output_zip.start_dir)
+    base = output_zip.start_dir
+    copy_into(path, fp)
+    for zinfo in members:
+        zinfo.header_offset += base
+        output_zip.filelist.append(zinfo)
+    output_zip.start_dir = fp.tell()
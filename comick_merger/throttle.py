@@ -0,0 +1,108 @@
+"""Token buckets limiting the bytes per second a merge reads and writes."""
+
+import re
+import threading
+import time
+from typing import Callable, Optional, Union
+
+
+# Tokens a full bucket holds, in seconds of its rate: short bursts go through
+# at full speed, longer transfers settle at the rate
+BURST_SECONDS = 0.25
+
+_RATE = re.compile(r'^\s*(\d+(?:\.\d*)?)\s*([kmgt]?)(?:i?b)?(?:/s)?\s*$', re.IGNORECASE)
+_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+
+
+def parse_rate(spec: Union[str, int, None]) -> Optional[int]:
+    """
+    Parse a byte rate like ``50M``, ``1.5GiB/s`` or ``800000`` (binary units).
+
+    None and empty strings mean no limit.
+
+    Raises:
+        ValueError: For malformed or non-positive rates
+    """
+    if spec is None or spec == "":
+        return None
+    if isinstance(spec, int):
+        rate = spec
+    else:
+        match = _RATE.match(spec)
+        if match is None:
+            raise ValueError(f"Invalid rate {spec!r} (expected e.g. 500K, 20M or 1.5G)")
+        rate = int(float(match.group(1)) * _UNITS[match.group(2).lower()])
+    if rate <= 0:
+        raise ValueError(f"Rate must be positive, got {spec!r}")
+    return rate
+
+
+def format_throughput(bytes_read: int, bytes_written: int, seconds: float,
+                      throttled_seconds: float = 0.0) -> str:
+    """One line of merge throughput, e.g. ``Read 12.0 MB (40.0 MB/s), wrote ...``."""
+    mib = 1024 * 1024
+    read_rate = bytes_read / seconds / mib if seconds > 0 else 0.0
+    write_rate = bytes_written / seconds / mib if seconds > 0 else 0.0
+    line = (f"Read {bytes_read / mib:.1f} MB ({read_rate:.1f} MB/s), "
+            f"wrote {bytes_written / mib:.1f} MB ({write_rate:.1f} MB/s)")
+    if throttled_seconds:
+        line += f", throttled {throttled_seconds:.2f}s"
+    return line
+
+
+class TokenBucket:
+    """
+    Limits a flow of bytes to ``rate`` per second, shared by any number of threads.
+
+    ``consume(n)`` takes n tokens at once and, when that leaves the bucket
+    in debt, sleeps until the rate has paid the debt back. A request larger
+    than the bucket therefore still goes through, and callers after it wait
+    their turn in order.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], object] = time.sleep
+    ):
+        """
+        Args:
+            rate: Tokens (bytes) added per second
+            burst: Capacity of the bucket (default: BURST_SECONDS of rate)
+            clock: Monotonic time source, in seconds
+            sleep: Waits for a number of seconds; ``Event.wait`` makes
+                   waiting interruptible
+        """
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate * BURST_SECONDS, 1.0)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._last = clock()
+        self._lock = threading.Lock()
+
+        self.consumed = 0  # Tokens taken so far
+        self.waited = 0.0  # Seconds callers were made to wait
+
+    def consume(self, amount: int) -> float:
+        """
+        Take ``amount`` tokens, waiting if the bucket runs out.
+
+        Returns:
+            Seconds waited
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= amount
+            self.consumed += amount
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += delay
+        if delay > 0:
+            self._sleep(delay)
+        return delay
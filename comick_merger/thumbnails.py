@@ -0,0 +1,251 @@
+"""Lazy cover thumbnails for the GUI file list."""
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice, QObject, QRunnable, QSize, QThreadPool, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader
+
+from comick_merger.cache import LRUCache
+from comick_merger.cbz_merger import CBZFile, archive_fingerprint
+
+
+# Default bound for decoded thumbnails kept in memory
+DEFAULT_MEMORY_BUDGET = 32 * 1024 * 1024
+
+# Default bound for thumbnails stored in the disk cache
+DEFAULT_DISK_BUDGET = 64 * 1024 * 1024
+
+# Pruning the disk cache goes down to this fraction of its budget, so it is
+# not scanned again on every new thumbnail once full
+_DISK_PRUNE_TARGET = 0.75
+
+
+def decode_thumbnail(data: bytes, size: QSize) -> QImage:
+    """
+    Decode image bytes into a thumbnail fitting in ``size``.
+
+    The scaled size is set on the reader so JPEG pages are downscaled while
+    decoding instead of being fully decoded first.
+    """
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+
+    reader = QImageReader(buffer)
+    reader.setAutoTransform(True)
+    original = reader.size()
+    if original.isValid():
+        reader.setScaledSize(original.scaled(size, Qt.AspectRatioMode.KeepAspectRatio))
+
+    image = reader.read()
+    if image.isNull():
+        return image
+    if image.width() > size.width() or image.height() > size.height():
+        image = image.scaled(size, Qt.AspectRatioMode.KeepAspectRatio,
+                             Qt.TransformationMode.SmoothTransformation)
+    return image
+
+
+def prune_disk_cache(directory: Path, max_bytes: int) -> int:
+    """
+    Delete the least recently used thumbnails until ``directory`` holds at most ``max_bytes``.
+
+    Thumbnails are ordered by modification time, which the loader refreshes
+    on every disk cache hit.
+
+    Returns:
+        Bytes of thumbnails left in the directory
+    """
+    thumbnails = []
+    for path in directory.glob("*.png"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue  # Removed by another process
+        thumbnails.append((stat.st_mtime_ns, stat.st_size, path))
+
+    total = sum(size for _, size, _ in thumbnails)
+    for _, size, path in sorted(thumbnails):
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError:
+            continue
+        total -= size
+    return total
+
+
+class _ThumbnailSignals(QObject):
+    """Signals emitted by thumbnail tasks (QRunnable cannot emit itself)."""
+
+    done = pyqtSignal(str, str, QImage, bool)  # Path, fingerprint, thumbnail (null on failure), skipped
+
+
+class _ThumbnailTask(QRunnable):
+    """Loads one thumbnail from the disk cache or decodes it from the archive."""
+
+    def __init__(self, loader: 'ThumbnailLoader', path: Path):
+        super().__init__()
+        self.loader = loader
+        self.path = path
+
+    def run(self):
+        # Skip rows scrolled out of view while the task was queued
+        if not self.loader.is_wanted(self.path):
+            self.loader._signals.done.emit(str(self.path), "", QImage(), True)
+            return
+
+        try:
+            fingerprint = archive_fingerprint(self.path)
+            image = self.loader._load(self.path, fingerprint)
+        except Exception:
+            fingerprint, image = "", QImage()
+        self.loader._signals.done.emit(str(self.path), fingerprint, image, False)
+
+
+class ThumbnailLoader(QObject):
+    """
+    Decodes archive covers off the GUI thread.
+
+    Decoded images are kept in an LRU cache bounded by ``memory_budget``
+    bytes. When ``disk_cache_dir`` is set, thumbnails are also stored there
+    as PNG files named after the archive fingerprint, so they survive
+    restarts; least recently used files are pruned beyond ``disk_budget``
+    bytes. Both caches are keyed by fingerprint, so a modified archive gets
+    a new thumbnail. Fingerprints are computed by the loading tasks only:
+    lookups from the GUI thread use the one last computed for the path,
+    without touching the disk, and ``forget`` drops it.
+    """
+
+    ready = pyqtSignal(object, QImage)  # Path, thumbnail
+
+    def __init__(
+        self,
+        size: QSize,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+        disk_cache_dir: Optional[Path] = None,
+        parent=None,
+        max_threads: int = 2,
+        disk_budget: int = DEFAULT_DISK_BUDGET
+    ):
+        super().__init__(parent)
+        self.size = size
+        self.disk_cache_dir = disk_cache_dir
+        self.disk_budget = disk_budget
+        # Keyed by (path, fingerprint): a rewritten archive misses the cache
+        self.cache: LRUCache[Tuple[Path, str], QImage] = LRUCache(
+            memory_budget, weigher=lambda image: max(1, image.sizeInBytes())
+        )
+        # Bytes in the disk cache, None until the first prune measures it
+        self._disk_usage: Optional[int] = None
+        self._disk_lock = threading.Lock()
+        # Fingerprint last computed by a task for each path; GUI thread only
+        self._fingerprints: Dict[Path, str] = {}
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._in_flight: Set[Path] = set()
+        self._failed: Set[Path] = set()
+        self._wanted: Set[Path] = set()
+        self._signals = _ThumbnailSignals(self)
+        self._signals.done.connect(self._on_done)
+
+    def cached(self, path: Path) -> Optional[QImage]:
+        """Return the thumbnail if it is already decoded for the archive as last loaded."""
+        fingerprint = self._fingerprints.get(path)
+        return None if fingerprint is None else self.cache.get((path, fingerprint))
+
+    def forget(self, path: Path):
+        """Drop what is known about an archive, so it is loaded again when next wanted."""
+        self._failed.discard(path)
+        fingerprint = self._fingerprints.pop(path, None)
+        if fingerprint is not None:
+            self.cache.pop((path, fingerprint))
+
+    def is_wanted(self, path: Path) -> bool:
+        """Return True if the path is still among the requested rows."""
+        return path in self._wanted
+
+    def set_wanted(self, paths: Iterable[Path]):
+        """
+        Request thumbnails for the given paths (typically the visible rows).
+
+        Paths no longer wanted are skipped when their queued task starts.
+        """
+        self._wanted = set(paths)
+        for path in self._wanted:
+            self._request(path)
+
+    def _request(self, path: Path):
+        key = (path, self._fingerprints.get(path))
+        if path in self._in_flight or path in self._failed or key in self.cache:
+            return
+        self._in_flight.add(path)
+        self._pool.start(_ThumbnailTask(self, path))
+
+    def _disk_path(self, fingerprint: str) -> Optional[Path]:
+        if self.disk_cache_dir is None:
+            return None
+        return self.disk_cache_dir / f"{fingerprint}_{self.size.width()}x{self.size.height()}.png"
+
+    def _load(self, path: Path, fingerprint: str) -> QImage:
+        """Load a thumbnail, runs on a pool thread."""
+        disk_path = self._disk_path(fingerprint)
+        if disk_path is not None and disk_path.exists():
+            image = QImage(str(disk_path))
+            if not image.isNull():
+                try:
+                    os.utime(disk_path)  # Recently used: pruned last
+                except OSError:
+                    pass
+                return image
+
+        data = CBZFile.from_path(path).read_cover()
+        if data is None:
+            return QImage()
+
+        image = decode_thumbnail(data, self.size)
+        if disk_path is not None and not image.isNull():
+            disk_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = disk_path.with_suffix(f".{os.getpid()}.tmp")
+            if image.save(str(tmp_path), "PNG"):
+                size = tmp_path.stat().st_size
+                os.replace(tmp_path, disk_path)
+                self._disk_added(size)
+        return image
+
+    def _disk_added(self, size: int):
+        """Account for a new thumbnail file, pruning the disk cache once over budget."""
+        with self._disk_lock:
+            if self._disk_usage is not None:
+                self._disk_usage += size
+                if self._disk_usage <= self.disk_budget:
+                    return
+                target = int(self.disk_budget * _DISK_PRUNE_TARGET)
+            else:
+                target = self.disk_budget
+            self._disk_usage = prune_disk_cache(self.disk_cache_dir, target)
+
+    def _on_done(self, path: str, fingerprint: str, image: QImage, skipped: bool):
+        path = Path(path)
+        self._in_flight.discard(path)
+        if skipped:
+            # Scrolled back into view after the task gave up
+            if path in self._wanted:
+                self._request(path)
+            return
+        if image.isNull():
+            self._failed.add(path)
+            return
+
+        previous = self._fingerprints.get(path)
+        if previous is not None and previous != fingerprint:
+            self.cache.pop((path, previous))  # Thumbnail of the archive before it changed
+        self._fingerprints[path] = fingerprint
+        self.cache.put((path, fingerprint), image)
+        self.ready.emit(path, image)
@@ -0,0 +1,289 @@
+"""Merged CBZ exposed as a seekable stream, without writing it to disk."""
+
+import io
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from comick_merger import zipio
+from comick_merger.cbz_merger import CBZMerger, output_entry_name
+from comick_merger.pool import DEFAULT_MAX_OPEN, SourcePool
+
+
+# Bytes sent per write when streaming over HTTP
+HTTP_CHUNK_SIZE = 1024 * 1024
+
+_RANGE = re.compile(r'bytes=(\d*)-(\d*)$')
+
+
+class VirtualMergedCBZ(io.RawIOBase):
+    """
+    Read-only, seekable view of the archive merging some CBZ files.
+
+    Local headers and the central directory are generated when the bytes
+    are read, and member data is copied, still compressed, from the source
+    archives. Nothing is written to disk and only a few integers per member
+    are kept, yet the total size is known as soon as the object is built,
+    so it can be served with range requests.
+
+    Members are the same as in CBZMerger.merge's output, with the same
+    names and contents, but are not recompressed, so the bytes differ.
+    ``read_at`` is thread-safe and does not move the stream position.
+    """
+
+    def __init__(
+        self,
+        merger: CBZMerger,
+        use_prefixes: bool = True,
+        date_time: Optional[Tuple[int, int, int, int, int, int]] = None,
+        max_open: int = DEFAULT_MAX_OPEN
+    ):
+        """
+        Plan the archive layout.
+
+        Args:
+            merger: Scanned CBZ files, in merge order
+            use_prefixes: Same as CBZMerger.merge
+            date_time: Timestamp of every member (default: the newest
+                       modification time among the sources)
+            max_open: Source archives kept open at once
+
+        Raises:
+            ValueError: If a source is an image folder: its CRCs are only
+                        known once every page is read
+        """
+        super().__init__()
+        folders = [str(cbz.path) for cbz in merger.cbz_files if cbz.directory]
+        if folders:
+            raise ValueError(f"Image folders cannot be streamed, merge them instead: {', '.join(folders)}")
+        self._cbz_files = merger.cbz_files
+        self._table = merger.table
+        if date_time is None:
+            newest = max((cbz.mtime_ns for cbz in merger.cbz_files), default=0)
+            date_time = time.localtime(newest / 1e9)[:6] if newest else zipio.DOS_EPOCH
+        self._date_time = max(tuple(date_time), zipio.DOS_EPOCH)
+
+        # Output names are the prefix plus the entry name, stored once in the table
+        self._prefixes = [output_entry_name(prefix, "", use_prefixes).encode()
+                          for prefix in merger.prefixes()]
+
+        table = self._table
+        self._rows = array('Q')
+        self._local_offsets = array('Q', [0])
+        self._central_offsets = array('Q', [0])
+        for idx, cbz in enumerate(self._cbz_files):
+            start = cbz.entries.start
+            self._rows.extend(range(start, start + len(cbz.entries)))
+            prefix_len = len(self._prefixes[idx])
+            for row in range(start, start + len(cbz.entries)):
+                name_len = prefix_len + table.name_offsets[row + 1] - table.name_offsets[row]
+                csize = table.compressed_sizes[row]
+                offset = self._local_offsets[-1]
+                self._local_offsets.append(
+                    offset + zipio.local_header_size(name_len, csize, table.sizes[row]) + csize
+                )
+                self._central_offsets.append(
+                    self._central_offsets[-1]
+                    + zipio.central_header_size(name_len, csize, table.sizes[row], offset)
+                )
+
+        self.directory_offset = self._local_offsets[-1]
+        directory_size = self._central_offsets[-1]
+        self._end_records = zipio.end_records(len(self._rows), self.directory_offset, directory_size)
+        self._end_offset = self.directory_offset + directory_size
+        self.size = self._end_offset + len(self._end_records)
+
+        self._data_offsets: Dict[int, int] = {}  # Member -> position of its data in the source
+        self._sources = SourcePool(self._cbz_files, max_open, raw=True)
+        self._lock = threading.Lock()
+        self._pos = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def member_count(self) -> int:
+        return len(self._rows)
+
+    def _name(self, member: int) -> bytes:
+        row = self._rows[member]
+        return self._prefixes[self._table.archive_ids[row]] + self._table.name_bytes(row)
+
+    def _local_header(self, member: int) -> bytes:
+        row, table = self._rows[member], self._table
+        return zipio.local_header(self._name(member), table.methods[row], table.crcs[row],
+                                  table.compressed_sizes[row], table.sizes[row], self._date_time)
+
+    def _central_header(self, member: int) -> bytes:
+        row, table = self._rows[member], self._table
+        return zipio.central_header(self._name(member), table.methods[row], table.crcs[row],
+                                    table.compressed_sizes[row], table.sizes[row],
+                                    self._local_offsets[member], self._date_time)
+
+    def _read_data(self, member: int, offset: int, size: int) -> bytes:
+        """Read compressed bytes of a member from its source; caller holds the lock."""
+        row = self._rows[member]
+        archive = self._table.archive_ids[row]
+        stream = self._sources.get(archive)
+
+        data_offset = self._data_offsets.get(member)
+        if data_offset is None:
+            data_offset = zipio.local_data_offset(stream, self._table.header_offsets[row])
+            self._data_offsets[member] = data_offset
+
+        stream.seek(data_offset + offset)
+        data = stream.read(size)
+        if len(data) != size:
+            raise OSError(f"Source archive truncated: {self._cbz_files[archive].path}")
+        return data
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        """Return up to ``size`` bytes starting at ``offset`` (fewer at the end)."""
+        end = min(offset + size, self.size)
+        chunks = []
+        pos = offset
+        with self._lock:
+            while pos < end:
+                if pos < self.directory_offset:
+                    member = bisect_right(self._local_offsets, pos) - 1
+                    start = self._local_offsets[member]
+                    header = self._local_header(member)
+                    if pos < start + len(header):
+                        chunk = header[pos - start:end - start]
+                    else:
+                        data_pos = pos - start - len(header)
+                        stop = min(end, self._local_offsets[member + 1])
+                        chunk = self._read_data(member, data_pos, stop - pos)
+                elif pos < self._end_offset:
+                    relative = pos - self.directory_offset
+                    member = bisect_right(self._central_offsets, relative) - 1
+                    start = self._central_offsets[member]
+                    header = self._central_header(member)
+                    chunk = header[relative - start:end - self.directory_offset - start]
+                else:
+                    chunk = self._end_records[pos - self._end_offset:end - self._end_offset]
+                chunks.append(chunk)
+                pos += len(chunk)
+        return b''.join(chunks)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise OSError(f"Negative seek position: {pos}")
+        self._pos = pos
+        return pos
+
+    def readinto(self, buffer) -> int:
+        data = self.read_at(self._pos, len(buffer))
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def close(self):
+        with self._lock:
+            self._sources.close()
+        super().close()
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range ``Range`` header into (start, end exclusive).
+
+    Returns None for a missing or unsupported header (serve everything).
+
+    Raises:
+        ValueError: If the range cannot be satisfied
+    """
+    match = _RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        start, end = max(0, size - int(last)), size
+    else:
+        start = int(first)
+        end = min(int(last) + 1, size) if last else size
+    if start >= size or start >= end:
+        raise ValueError(f"Unsatisfiable range: {header}")
+    return start, end
+
+
+class _VolumeHandler(BaseHTTPRequestHandler):
+    """Serves virtual volumes by name, with single-range requests."""
+
+    server: 'ThreadingHTTPServer'
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body: bool):
+        volume = self.server.volumes.get(self.path.lstrip("/"))
+        if volume is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        try:
+            requested = parse_range(self.headers.get("Range"), volume.size)
+        except ValueError:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{volume.size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = requested or (0, volume.size)
+        self.send_response(HTTPStatus.PARTIAL_CONTENT if requested else HTTPStatus.OK)
+        self.send_header("Content-Type", "application/vnd.comicbook+zip")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start))
+        if requested:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{volume.size}")
+        self.end_headers()
+
+        if send_body:
+            for offset in range(start, end, HTTP_CHUNK_SIZE):
+                self.wfile.write(volume.read_at(offset, min(HTTP_CHUNK_SIZE, end - offset)))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def http_server(volumes: Dict[str, VirtualMergedCBZ], host: str = "127.0.0.1",
+                port: int = 0) -> ThreadingHTTPServer:
+    """
+    Create an HTTP server streaming virtual volumes, e.g. ``/omnibus.cbz``.
+
+    Call ``serve_forever()`` on the result (port 0 picks a free port, see
+    ``server_address``).
+    """
+    server = ThreadingHTTPServer((host, port), _VolumeHandler)
+    server.daemon_threads = True
+    server.volumes = dict(volumes)
+    return server
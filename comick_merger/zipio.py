@@ -0,0 +1,383 @@
+"""
+Low-level ZIP structures.
+
+``read_entries`` lists an archive straight from its central directory: one
+read for the directory, then ``struct`` decoding of the few fields the
+merger needs into an EntryTable, without building a ``zipfile.ZipInfo``
+per member. Anything unusual raises UnsupportedZip so callers can fall
+back to ``zipfile``.
+
+The ``*_header`` and ``end_records`` functions build the records of an
+archive whose members are copied already compressed, switching to ZIP64
+fields only where values overflow.
+"""
+
+import os
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO, Optional, Tuple
+
+from comick_merger.entries import EntryTable, EntryView
+
+
+# End of central directory: signature, disk, directory disk, entries on disk,
+# total entries, directory size, directory offset, comment length
+END_RECORD = struct.Struct('<4sHHHHIIH')
+END_SIGNATURE = b'PK\x05\x06'
+
+# ZIP64 end of central directory locator: signature, disk, record offset, disks
+ZIP64_LOCATOR = struct.Struct('<4sIQI')
+ZIP64_LOCATOR_SIGNATURE = b'PK\x06\x07'
+
+# ZIP64 end of central directory: signature, record size, versions, disk,
+# directory disk, entries on disk, total entries, directory size, directory offset
+ZIP64_END_RECORD = struct.Struct('<4sQHHIIQQQQ')
+ZIP64_END_SIGNATURE = b'PK\x06\x06'
+
+# Local file header: signature, version, flags, method, time, date, crc,
+# sizes, name/extra lengths
+LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+LOCAL_SIGNATURE = b'PK\x03\x04'
+
+# Central directory header: signature, versions (4 bytes), flags, method,
+# time, date, crc, sizes, name/extra/comment lengths, disk, attributes, offset
+CENTRAL_HEADER = struct.Struct('<4sBBBBHHHHIIIHHHHHII')
+CENTRAL_SIGNATURE = b'PK\x01\x02'
+
+ZIP64_EXTRA_ID = 0x0001
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+
+UTF8_FLAG = 0x800
+
+# Highest "version needed to extract" zipfile accepts
+_MAX_EXTRACT_VERSION = 63
+
+# "Version needed to extract" per feature, as written by zipfile
+_DEFAULT_VERSION = 20
+_ZIP64_VERSION = 45
+_METHOD_VERSIONS = {12: 46, 14: 63, 93: 63}  # BZIP2, LZMA, Zstandard
+
+# Regular file, rw-------, like zipfile.ZipFile.writestr
+DEFAULT_EXTERNAL_ATTR = 0o600 << 16
+
+# Date used when no timestamp is given (the earliest a ZIP can store)
+DOS_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+# The end record sits in the last 22 bytes plus an optional comment of up to 64 KiB
+_MAX_TAIL = END_RECORD.size + 0xFFFF
+
+
+class UnsupportedZip(Exception):
+    """The archive needs the full ``zipfile`` parser (malformed, multi-disk, ...)."""
+
+
+@dataclass(frozen=True)
+class EndRecord:
+    """Where the central directory is, as found at the end of an archive."""
+    directory_offset: int  # Absolute position in the file
+    directory_size: int
+    entry_count: int
+    prefix_size: int  # Bytes before the archive itself (e.g. a self-extractor stub)
+    zip64: bool
+    comment: bytes = b""
+
+
+def find_end_record(fp: BinaryIO) -> EndRecord:
+    """
+    Locate the end of central directory record, following ZIP64 records.
+
+    Raises:
+        UnsupportedZip: If no usable record is found
+    """
+    file_size = fp.seek(0, os.SEEK_END)
+    tail_start = max(0, file_size - _MAX_TAIL)
+    fp.seek(tail_start)
+    tail = fp.read()
+
+    pos = _find_end_signature(tail)
+    (_, disk, directory_disk, _, count, size,
+     offset, comment_len) = END_RECORD.unpack_from(tail, pos)
+    comment = tail[pos + END_RECORD.size:pos + END_RECORD.size + comment_len]
+    end_offset = tail_start + pos
+    if disk != 0 or directory_disk != 0:
+        raise UnsupportedZip("Multi-disk archive")
+
+    zip64 = False
+    locator_offset = end_offset - ZIP64_LOCATOR.size
+    if locator_offset >= 0:
+        fp.seek(locator_offset)
+        locator = fp.read(ZIP64_LOCATOR.size)
+        signature, disk, _, disks = ZIP64_LOCATOR.unpack(locator)
+        if signature == ZIP64_LOCATOR_SIGNATURE:
+            if disk != 0 or disks > 1:
+                raise UnsupportedZip("Multi-disk archive")
+            # Like zipfile, expect the ZIP64 record right before its locator
+            fp.seek(locator_offset - ZIP64_END_RECORD.size)
+            record = fp.read(ZIP64_END_RECORD.size)
+            if len(record) != ZIP64_END_RECORD.size:
+                raise UnsupportedZip("Truncated ZIP64 end of central directory")
+            (signature, _, _, _, disk, directory_disk, _, count,
+             size, offset) = ZIP64_END_RECORD.unpack(record)
+            if signature != ZIP64_END_SIGNATURE or disk != 0 or directory_disk != 0:
+                raise UnsupportedZip("Bad ZIP64 end of central directory")
+            end_offset = locator_offset - ZIP64_END_RECORD.size
+            zip64 = True
+
+    # Data prepended to the archive shifts every stored offset
+    prefix_size = end_offset - size - offset
+    if prefix_size < 0:
+        raise UnsupportedZip("Bad central directory offset")
+    return EndRecord(offset + prefix_size, size, count, prefix_size, zip64, comment)
+
+
+def _find_end_signature(tail: bytes) -> int:
+    """
+    Position of the end record in the last bytes of a file.
+
+    The signature may also occur inside the comment: prefer the record
+    whose comment ends exactly at the end of the file, else take the last
+    signature like zipfile does.
+    """
+    last = pos = tail.rfind(END_SIGNATURE)
+    while pos >= 0:
+        if pos + END_RECORD.size <= len(tail):
+            comment_len = END_RECORD.unpack_from(tail, pos)[-1]
+            if pos + END_RECORD.size + comment_len == len(tail):
+                return pos
+        pos = tail.rfind(END_SIGNATURE, 0, pos)
+    if last < 0 or last + END_RECORD.size > len(tail):
+        raise UnsupportedZip("End of central directory not found")
+    return last
+
+
+def read_entries(
+    fp: BinaryIO,
+    table: Optional[EntryTable] = None,
+    archive_id: int = 0
+) -> EntryView:
+    """
+    Append the file entries (directories excluded) of an archive to a table.
+
+    The result matches what ``zipfile.ZipFile(fp).infolist()`` reports for
+    names, sizes, CRCs, methods and local header offsets. On failure the
+    table is left unchanged.
+
+    Args:
+        fp: Seekable binary file positioned anywhere
+        table: Table receiving the entries (default: a new table)
+        archive_id: Id of the archive in that table
+
+    Raises:
+        UnsupportedZip: If the archive is not a ZIP or has a layout only
+                        zipfile handles
+    """
+    end = find_end_record(fp)
+    fp.seek(end.directory_offset)
+    directory = memoryview(fp.read(end.directory_size))
+    if len(directory) != end.directory_size:
+        raise UnsupportedZip("Truncated central directory")
+
+    if table is None:
+        table = EntryTable()
+    start = len(table)
+    try:
+        _decode_directory(directory, end.prefix_size, table, archive_id)
+    except (UnsupportedZip, struct.error, UnicodeDecodeError) as e:
+        table.truncate(start)
+        if isinstance(e, UnsupportedZip):
+            raise
+        raise UnsupportedZip(f"Malformed central directory: {e}") from e
+    return table.view(start)
+
+
+def _decode_directory(directory: memoryview, prefix_size: int,
+                      table: EntryTable, archive_id: int) -> None:
+    unpack_header = CENTRAL_HEADER.unpack_from
+    header_size = CENTRAL_HEADER.size
+    pos = 0
+    while pos < len(directory):
+        (signature, _, _, extract_version, _, flags, method, _, _, crc,
+         compressed_size, size, name_len, extra_len, comment_len,
+         _, _, _, header_offset) = unpack_header(directory, pos)
+        if signature != CENTRAL_SIGNATURE:
+            raise UnsupportedZip("Bad central directory header")
+        if extract_version > _MAX_EXTRACT_VERSION:
+            raise UnsupportedZip(f"ZIP version {extract_version / 10:.1f}")
+
+        name_start = pos + header_size
+        extra_start = name_start + name_len
+        pos = extra_start + extra_len + comment_len
+        if pos > len(directory):
+            raise UnsupportedZip("Truncated central directory")
+
+        name = directory[name_start:extra_start].tobytes()
+        if b'\0' in name or (os.sep != '/' and os.sep.encode() in name):
+            # zipfile rewrites such names
+            raise UnsupportedZip("Unusual member name")
+        if not flags & UTF8_FLAG and not name.isascii():
+            # Legacy encoding: store as UTF-8 like every other name in the table
+            name = name.decode('cp437').encode('utf-8')
+        if name.endswith(b'/'):
+            continue
+
+        if ZIP64_LIMIT in (size, compressed_size, header_offset):
+            size, compressed_size, header_offset = _read_zip64_extra(
+                directory[extra_start:extra_start + extra_len],
+                size, compressed_size, header_offset
+            )
+
+        table.append(name, archive_id, size, compressed_size, crc, method,
+                     header_offset + prefix_size)
+
+
+def _read_zip64_extra(extra: memoryview, size: int, compressed_size: int,
+                      header_offset: int):
+    """Replace saturated 32-bit fields with their ZIP64 extra field values."""
+    pos = 0
+    while pos + 4 <= len(extra):
+        block_id, block_len = struct.unpack_from('<HH', extra, pos)
+        block = extra[pos + 4:pos + 4 + block_len]
+        pos += 4 + block_len
+        if block_id != ZIP64_EXTRA_ID:
+            continue
+
+        values = iter(struct.unpack_from(f'<{len(block) // 8}Q', block))
+        try:
+            # Only saturated fields are present, always in this order
+            if size == ZIP64_LIMIT:
+                size = next(values)
+            if compressed_size == ZIP64_LIMIT:
+                compressed_size = next(values)
+            if header_offset == ZIP64_LIMIT:
+                header_offset = next(values)
+        except StopIteration:
+            raise UnsupportedZip("Truncated ZIP64 extra field") from None
+        return size, compressed_size, header_offset
+
+    raise UnsupportedZip("Missing ZIP64 extra field")
+
+
+def local_data_offset(fp: BinaryIO, header_offset: int) -> int:
+    """
+    Position of a member's data, found from its local header.
+
+    Raises:
+        UnsupportedZip: If there is no local header at ``header_offset``
+    """
+    fp.seek(header_offset)
+    header = fp.read(LOCAL_HEADER.size)
+    if len(header) != LOCAL_HEADER.size or header[:4] != LOCAL_SIGNATURE:
+        raise UnsupportedZip(f"No local header at offset {header_offset}")
+    name_len, extra_len = LOCAL_HEADER.unpack(header)[-2:]
+    return header_offset + LOCAL_HEADER.size + name_len + extra_len
+
+
+def dos_date_time(date_time: Tuple[int, int, int, int, int, int]) -> Tuple[int, int]:
+    """(date, time) fields for a (year, month, day, hour, minute, second) tuple."""
+    year, month, day, hour, minute, second = date_time
+    return ((year - 1980) << 9 | month << 5 | day,
+            hour << 11 | minute << 5 | second // 2)
+
+
+def _extract_version(method: int, zip64: bool) -> int:
+    version = _METHOD_VERSIONS.get(method, _DEFAULT_VERSION)
+    return max(version, _ZIP64_VERSION) if zip64 else version
+
+
+def _flags(name: bytes) -> int:
+    return 0 if name.isascii() else UTF8_FLAG
+
+
+def local_header_size(name_len: int, compressed_size: int, size: int) -> int:
+    """Length of the local header written by ``local_header``."""
+    zip64 = size >= ZIP64_LIMIT or compressed_size >= ZIP64_LIMIT
+    return LOCAL_HEADER.size + name_len + (20 if zip64 else 0)
+
+
+def local_header(name: bytes, method: int, crc: int, compressed_size: int, size: int,
+                 date_time: Tuple[int, ...] = DOS_EPOCH) -> bytes:
+    """Local file header of a member whose sizes and CRC are known up front."""
+    zip64 = size >= ZIP64_LIMIT or compressed_size >= ZIP64_LIMIT
+    extra = b''
+    if zip64:
+        # The local ZIP64 field always carries both sizes
+        extra = struct.pack('<HHQQ', ZIP64_EXTRA_ID, 16, size, compressed_size)
+        size = compressed_size = ZIP64_LIMIT
+    date, time = dos_date_time(date_time)
+    return LOCAL_HEADER.pack(
+        LOCAL_SIGNATURE, _extract_version(method, zip64), _flags(name), method,
+        time, date, crc, compressed_size, size, len(name), len(extra)
+    ) + name + extra
+
+
+def central_header_size(name_len: int, compressed_size: int, size: int, header_offset: int) -> int:
+    """Length of the central directory header written by ``central_header``."""
+    fields = sum(value >= ZIP64_LIMIT for value in (size, compressed_size, header_offset))
+    return CENTRAL_HEADER.size + name_len + (4 + 8 * fields if fields else 0)
+
+
+def central_header(name: bytes, method: int, crc: int, compressed_size: int, size: int,
+                   header_offset: int, date_time: Tuple[int, ...] = DOS_EPOCH,
+                   external_attr: int = DEFAULT_EXTERNAL_ATTR) -> bytes:
+    """Central directory header of a member."""
+    values = []
+    if size >= ZIP64_LIMIT:
+        values.append(size)
+        size = ZIP64_LIMIT
+    if compressed_size >= ZIP64_LIMIT:
+        values.append(compressed_size)
+        compressed_size = ZIP64_LIMIT
+    if header_offset >= ZIP64_LIMIT:
+        values.append(header_offset)
+        header_offset = ZIP64_LIMIT
+    extra = struct.pack(f'<HH{len(values)}Q', ZIP64_EXTRA_ID, 8 * len(values), *values) if values else b''
+
+    version = _extract_version(method, bool(values))
+    date, time = dos_date_time(date_time)
+    return CENTRAL_HEADER.pack(
+        CENTRAL_SIGNATURE, version, 3, version, 0,  # Made by version on UNIX, needed version
+        _flags(name), method, time, date, crc, compressed_size, size,
+        len(name), len(extra), 0, 0, 0, external_attr, header_offset
+    ) + name + extra
+
+
+def _needs_zip64_end(entry_count: int, directory_offset: int, directory_size: int) -> bool:
+    return (entry_count >= ZIP64_COUNT_LIMIT or directory_offset >= ZIP64_LIMIT
+            or directory_size >= ZIP64_LIMIT)
+
+
+def end_records_size(entry_count: int, directory_offset: int, directory_size: int,
+                     comment_len: int = 0) -> int:
+    """Length of the records written by ``end_records``."""
+    size = END_RECORD.size + comment_len
+    if _needs_zip64_end(entry_count, directory_offset, directory_size):
+        size += ZIP64_END_RECORD.size + ZIP64_LOCATOR.size
+    return size
+
+
+def end_records(entry_count: int, directory_offset: int, directory_size: int,
+                comment: bytes = b"") -> bytes:
+    """
+    Records following the central directory, ZIP64 ones included when needed.
+
+    Args:
+        entry_count: Members in the central directory
+        directory_offset: Position of the central directory in the archive
+        directory_size: Length of the central directory
+        comment: Archive comment (at most 65535 bytes)
+    """
+    records = b''
+    if _needs_zip64_end(entry_count, directory_offset, directory_size):
+        zip64_offset = directory_offset + directory_size
+        records = ZIP64_END_RECORD.pack(
+            ZIP64_END_SIGNATURE, ZIP64_END_RECORD.size - 12, _ZIP64_VERSION, _ZIP64_VERSION,
+            0, 0, entry_count, entry_count, directory_size, directory_offset
+        ) + ZIP64_LOCATOR.pack(ZIP64_LOCATOR_SIGNATURE, 0, zip64_offset, 1)
+        entry_count = min(entry_count, ZIP64_COUNT_LIMIT)
+        directory_offset = min(directory_offset, ZIP64_LIMIT)
+        directory_size = min(directory_size, ZIP64_LIMIT)
+    return records + END_RECORD.pack(
+        END_SIGNATURE, 0, 0, entry_count, entry_count, directory_size,
+        directory_offset, len(comment)
+    ) + comment
@@ -0,0 +1,130 @@
+"""Unit tests for the asyncio merge API."""
+
+import asyncio
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from comick_merger import aio
+from comick_merger.aio import iter_merge_async, merge_async
+from comick_merger.cbz_merger import CBZFile, MergeCancelled, temp_output_path
+
+
+class TestMergeAsync:
+    """Tests for merge_async and iter_merge_async."""
+
+    def test_merge_async_with_progress(self, simple_cbz_files, temp_dir):
+        """Test that the async merge writes the output and reports every entry."""
+        output = temp_dir / "merged.cbz"
+        events = []
+
+        async def on_progress(event):
+            events.append(event)
+
+        asyncio.run(merge_async(simple_cbz_files, output, progress=on_progress))
+
+        with zipfile.ZipFile(output, 'r') as zf:
+            assert len(zf.namelist()) == 6
+            assert "1_page_004.jpg" in zf.namelist()
+
+        assert [event.entries_done for event in events] == [1, 2, 3, 4, 5, 6]
+        assert events[-1].fraction == 1.0
+        assert events[-1].cbz_index == 1
+
+    def test_merge_async_returns_stats(self, simple_cbz_files, temp_dir):
+        """Test that merge options are forwarded and the merge stats returned."""
+        output = temp_dir / "merged.cbz"
+
+        stats = asyncio.run(merge_async(simple_cbz_files, output, use_prefixes=False,
+                                        compression="store", reproducible=True))
+
+        assert stats.entries_written == 6
+        assert stats.bytes_written == output.stat().st_size
+        with zipfile.ZipFile(output, 'r') as zf:
+            assert "0/page_001.jpg" in zf.namelist()
+            assert {info.compress_type for info in zf.infolist()} == {zipfile.ZIP_STORED}
+
+    def test_cancellation_removes_partial_output(self, many_cbz_dir, temp_dir):
+        """Test that cancelling the task stops the merge and leaves no file behind."""
+        cbz_files = sorted(many_cbz_dir.glob("chapter*.cbz"))[:200]
+        output = temp_dir / "merged.cbz"
+
+        async def run():
+            started = asyncio.Event()
+
+            async def on_progress(event):
+                started.set()
+                await asyncio.sleep(0.01)
+
+            task = asyncio.create_task(merge_async(cbz_files, output, progress=on_progress))
+            await started.wait()
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+
+        assert not output.exists()
+        assert not temp_output_path(output).exists()
+
+    def test_cancellation_during_scan(self, many_cbz_dir, temp_dir, monkeypatch):
+        """Test that cancelling while sources are scanned stops before the next source."""
+        cbz_files = sorted(many_cbz_dir.glob("chapter*.cbz"))[:200]
+        cancel_event = threading.Event()
+        scanned = []
+        from_source = CBZFile.from_source
+
+        def scan(source, **kwargs):
+            scanned.append(source)
+            if len(scanned) == 5:
+                cancel_event.set()
+            return from_source(source, **kwargs)
+
+        monkeypatch.setattr(CBZFile, "from_source", scan)
+        with pytest.raises(MergeCancelled):
+            aio._merge_in_thread(cbz_files, temp_dir / "merged.cbz", {}, lambda event: None, cancel_event)
+
+        assert len(scanned) == 5
+        assert not (temp_dir / "merged.cbz").exists()
+
+    def test_early_break_cancels_merge(self, many_cbz_dir, temp_dir):
+        """Test that leaving the async for early cancels the merge."""
+        cbz_files = sorted(many_cbz_dir.glob("chapter*.cbz"))[:200]
+        output = temp_dir / "merged.cbz"
+
+        async def run():
+            events = iter_merge_async(cbz_files, output, max_pending=1)
+            async for event in events:
+                break
+            await events.aclose()
+
+        asyncio.run(run())
+
+        assert not output.exists()
+        assert not temp_output_path(output).exists()
+
+    def test_concurrent_merges_on_bounded_executor(self, simple_cbz_files, temp_dir):
+        """Test several merges sharing a single-thread executor."""
+        outputs = [temp_dir / f"merged{i}.cbz" for i in range(4)]
+
+        async def run():
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                await asyncio.gather(*(
+                    merge_async(simple_cbz_files, output, executor=executor)
+                    for output in outputs
+                ))
+
+        asyncio.run(run())
+
+        for output in outputs:
+            with zipfile.ZipFile(output, 'r') as zf:
+                assert len(zf.namelist()) == 6
+
+    def test_errors_propagate(self, simple_cbz_files, invalid_cbz_dir, temp_dir):
+        """Test that errors raised in the merge thread reach the caller."""
+        sources = [simple_cbz_files[0], invalid_cbz_dir / "not_a_zip.cbz"]
+
+        with pytest.raises(ValueError, match="Not a valid ZIP/CBZ file"):
+            asyncio.run(merge_async(sources, temp_dir / "merged.cbz"))
@@ -0,0 +1,133 @@
+"""Unit tests for the shared-directory batch queue."""
+
+import json
+import os
+import subprocess
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+from comick_merger import batch
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+class TestWorkQueue:
+    """Tests for WorkQueue."""
+
+    def test_enqueue_is_idempotent_per_output(self, simple_cbz_files, temp_dir):
+        """Test that enqueuing the same output twice leaves one job."""
+        queue = batch.WorkQueue(temp_dir / "queue")
+
+        first = queue.enqueue(simple_cbz_files, temp_dir / "out.cbz")
+        second = queue.enqueue(simple_cbz_files[::-1], temp_dir / "out.cbz")
+
+        assert first == second
+        assert queue.status()["pending"] == 1
+        job = json.loads((queue.pending / f"{first}.json").read_text())
+        assert job["sources"] == [str(path.absolute()) for path in simple_cbz_files[::-1]]
+
+    def test_only_one_worker_claims_a_job(self, simple_cbz_files, temp_dir):
+        """Test that a claimed job is not handed out again."""
+        queue = batch.WorkQueue(temp_dir / "queue")
+        queue.enqueue(simple_cbz_files, temp_dir / "out.cbz")
+
+        job, claim_path = queue.claim("a")
+
+        assert queue.claim("b") is None
+        assert claim_path.name == f"{job.job_id}@a.json"
+
+    def test_expired_claims_are_requeued(self, simple_cbz_files, temp_dir):
+        """Test that a claim not refreshed within the lease goes back to pending."""
+        queue = batch.WorkQueue(temp_dir / "queue")
+        queue.enqueue(simple_cbz_files, temp_dir / "out.cbz")
+        job, claim_path = queue.claim("dead")
+
+        assert queue.reap_expired(lease=60) == []
+        old = time.time() - 120
+        os.utime(claim_path, (old, old))
+
+        assert queue.reap_expired(lease=60) == [job.job_id]
+        assert not queue.renew(claim_path)  # The dead worker lost its lease
+        assert queue.claim("alive")[0].job_id == job.job_id
+
+
+class TestRunWorker:
+    """Tests for batch workers."""
+
+    def test_worker_drains_queue(self, simple_cbz_files, conflicting_cbz_files, temp_dir):
+        """Test that a worker merges every job and records results and failures."""
+        queue = batch.WorkQueue(temp_dir / "queue")
+        queue.enqueue(simple_cbz_files, temp_dir / "out" / "simple.cbz")
+        queue.enqueue(conflicting_cbz_files, temp_dir / "out" / "conflict.cbz")
+        broken = queue.enqueue([temp_dir / "missing.cbz"], temp_dir / "out" / "broken.cbz")
+
+        stats = batch.run_worker(queue.root, worker_id="w1", log=None)
+
+        assert stats == {"done": 2, "skipped": 0, "failed": 1, "dropped": 0}
+        assert queue.status() == {"pending": 0, "claimed": 0, "done": 2, "failed": 1}
+        with zipfile.ZipFile(temp_dir / "out" / "conflict.cbz") as zf:
+            assert zf.testzip() is None
+        assert "not found" in json.loads((queue.failed / f"{broken}.json").read_text())["error"]
+        assert not list((temp_dir / "out").glob(".*.tmp*"))
+
+    def test_unchanged_job_is_skipped(self, simple_cbz_files, temp_dir):
+        """Test that re-running a job whose output is up to date skips the merge."""
+        queue = batch.WorkQueue(temp_dir / "queue")
+        queue.enqueue(simple_cbz_files, temp_dir / "out.cbz")
+        batch.run_worker(queue.root, log=None)
+
+        queue.enqueue(simple_cbz_files, temp_dir / "out.cbz")
+        assert batch.run_worker(queue.root, log=None)["skipped"] == 1
+
+        queue.enqueue(simple_cbz_files, temp_dir / "out.cbz", force=True)
+        assert batch.run_worker(queue.root, log=None)["skipped"] == 0
+
+    def test_dead_worker_job_is_taken_over(self, simple_cbz_files, temp_dir):
+        """Test that a job claimed by a dead worker is merged once its lease expires."""
+        queue = batch.WorkQueue(temp_dir / "queue")
+        job_id = queue.enqueue(simple_cbz_files, temp_dir / "out.cbz")
+        _, claim_path = queue.claim("dead")
+        old = time.time() - 10
+        os.utime(claim_path, (old, old))
+
+        stats = batch.run_worker(queue.root, worker_id="alive", lease=5, log=None)
+
+        assert stats["done"] == 1
+        result = json.loads((queue.done / f"{job_id}.json").read_text())
+        assert result["worker"] == "alive"
+        assert (temp_dir / "out.cbz").exists()
+
+    def test_several_worker_processes(self, many_cbz_dir, temp_dir):
+        """Test that concurrent worker processes split the jobs, each merged exactly once."""
+        sources = sorted(many_cbz_dir.glob("*.cbz"))[:40]
+        queue = batch.WorkQueue(temp_dir / "queue")
+        outputs = []
+        for idx in range(8):
+            outputs.append(temp_dir / "out" / f"volume_{idx}.cbz")
+            queue.enqueue(sources[idx * 5:(idx + 1) * 5], outputs[-1])
+
+        env = dict(os.environ, PYTHONPATH=str(REPO_ROOT))
+        workers = [
+            subprocess.Popen(
+                [sys.executable, "-m", "comick_merger.cli", "batch", "work", str(queue.root),
+                 "--worker-id", f"proc{idx}", "--poll", "0.05"],
+                env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+            )
+            for idx in range(3)
+        ]
+        for worker in workers:
+            output, _ = worker.communicate(timeout=120)
+            assert worker.returncode == 0, output.decode()
+
+        assert queue.status() == {"pending": 0, "claimed": 0, "done": 8, "failed": 0}
+        for idx, output in enumerate(outputs):
+            expected = 0
+            for path in sources[idx * 5:(idx + 1) * 5]:
+                with zipfile.ZipFile(path) as zf:
+                    expected += len(zf.namelist())
+            with zipfile.ZipFile(output) as zf:
+                assert zf.testzip() is None
+                assert len(zf.namelist()) == expected
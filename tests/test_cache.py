@@ -0,0 +1,64 @@
+"""Unit tests for the LRU cache."""
+
+import pytest
+
+from comick_merger.cache import LRUCache
+
+
+class TestLRUCache:
+    """Tests for LRUCache."""
+
+    def test_evicts_least_recently_used(self):
+        """Test that the oldest untouched value is evicted first."""
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1  # "b" is now the least recently used
+
+        cache.put("c", 3)
+
+        assert "b" not in cache
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.evictions == 1
+
+    def test_weight_bound(self):
+        """Test that the cache is bounded by total weight, not item count."""
+        cache = LRUCache(10, weigher=len)
+        cache.put("a", b"x" * 4)
+        cache.put("b", b"x" * 4)
+        cache.put("c", b"x" * 4)
+
+        assert cache.weight == 8
+        assert list(cache._data) == ["b", "c"]
+
+        # Values heavier than the whole budget are not cached
+        cache.put("big", b"x" * 11)
+        assert "big" not in cache
+        assert cache.weight == 8
+
+    def test_on_evict_callback(self):
+        """Test that evicted values are handed to the callback, popped ones are not."""
+        evicted = []
+        cache = LRUCache(1, on_evict=lambda key, value: evicted.append((key, value)))
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.pop("b")
+
+        assert evicted == [("a", 1)]
+        assert len(cache) == 0
+
+    def test_hit_miss_stats(self):
+        """Test hit and miss counters."""
+        cache = LRUCache(4)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("missing")
+
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_invalid_budget(self):
+        """Test that a non-positive budget is rejected."""
+        with pytest.raises(ValueError):
+            LRUCache(0)
@@ -1,10 +1,19 @@
 """Unit tests for CBZ merger functionality."""
 
+import hashlib
+import io
+import os
+import sys
 import zipfile
 from pathlib import Path
 import pytest
 
-from comick_merger.cbz_merger import CBZFile, CBZMerger
+from comick_merger import cli, zipio
+from comick_merger.cbz_merger import (
+    FINGERPRINT_COMMENT, BufferReader, CBZFile, CBZMerger, ConflictIndex, archive_fingerprint,
+    natural_sort_key
+)
+from comick_merger.virtual import VirtualMergedCBZ
 
 
 class TestCBZFile:
@@ -39,6 +48,162 @@ class TestCBZFile:
         assert "folder/" not in cbz.entries
         assert "folder/file.jpg" in cbz.entries
 
+    def test_cbz_metadata(self, simple_cbz_files):
+        """Test that size and page count are reported."""
+        cbz = CBZFile.from_path(simple_cbz_files[0])
+
+        assert cbz.size == simple_cbz_files[0].stat().st_size
+        assert cbz.page_count == 3
+
+    def test_is_current(self, simple_cbz_files, temp_dir):
+        """Test that scanned metadata goes stale once the file is rewritten."""
+        path = temp_dir / "chapter.cbz"
+        path.write_bytes(simple_cbz_files[0].read_bytes())
+        cbz = CBZFile.from_path(path)
+        assert cbz.is_current()
+
+        with zipfile.ZipFile(path, 'a') as zf:
+            zf.writestr("page_004.jpg", b"new page")
+        assert not cbz.is_current()
+        assert CBZFile.from_path(path).is_current()
+
+        path.unlink()
+        assert not cbz.is_current()
+
+    def test_cover_entry(self, conflicting_cbz_files, simple_cbz_files):
+        """Test that an image named cover wins, else the first page."""
+        cbz = CBZFile.from_path(conflicting_cbz_files[0])
+        assert cbz.cover_entry == "cover.jpg"
+        assert b"CBZ1" in cbz.read_cover()
+
+        cbz = CBZFile.from_path(simple_cbz_files[0])
+        assert cbz.cover_entry == "page_001.jpg"
+
+    def test_cover_entry_natural_order(self):
+        """Test that page_2 comes before page_10."""
+        cbz = CBZFile(path=Path("x.cbz"), entries=["page_10.jpg", "page_2.jpg", "info.txt"])
+        assert cbz.cover_entry == "page_2.jpg"
+
+        cbz = CBZFile(path=Path("x.cbz"), entries=["ComicInfo.xml"])
+        assert cbz.cover_entry is None
+
+
+class TestInMemorySources:
+    """Tests for buffers and streams used as CBZ sources."""
+
+    @pytest.mark.parametrize("wrap", [bytes, bytearray, memoryview, io.BytesIO])
+    def test_from_source_buffer_types(self, simple_cbz_files, wrap):
+        """Test loading a CBZ from each supported in-memory type."""
+        cbz = CBZFile.from_source(wrap(simple_cbz_files[0].read_bytes()))
+
+        assert cbz.path == Path("<memory>")
+        assert sorted(cbz.entries) == ["page_001.jpg", "page_002.jpg", "page_003.jpg"]
+        assert cbz.size == simple_cbz_files[0].stat().st_size
+
+    def test_from_source_file_object(self, simple_cbz_files):
+        """Test that an open file keeps its name."""
+        with open(simple_cbz_files[0], 'rb') as fp:
+            cbz = CBZFile.from_source(fp)
+            assert cbz.path == simple_cbz_files[0]
+            assert cbz.read_cover() == b"CBZ1 of page_001.jpg"
+
+    def test_from_source_rejects_invalid(self, temp_dir):
+        """Test invalid buffers and unsupported types."""
+        with pytest.raises(ValueError, match="Not a valid ZIP/CBZ file"):
+            CBZFile.from_source(b"not a zip")
+        with pytest.raises(TypeError):
+            CBZFile.from_source(42)
+
+    def test_from_source_rejects_unseekable_stream(self, simple_cbz_files):
+        """Test that non-seekable streams are refused."""
+        class Unseekable(io.BytesIO):
+            def seekable(self):
+                return False
+
+        with pytest.raises(ValueError, match="seekable"):
+            CBZFile.from_source(Unseekable(simple_cbz_files[0].read_bytes()))
+
+    def test_merge_mixed_sources(self, simple_cbz_files, conflicting_cbz_files, temp_dir):
+        """Test merging paths, bytes and streams together."""
+        sources = [
+            simple_cbz_files[0],
+            memoryview(simple_cbz_files[1].read_bytes()),
+            io.BytesIO(conflicting_cbz_files[0].read_bytes()),
+        ]
+        output = temp_dir / "merged.cbz"
+
+        CBZMerger(sources).merge(output, use_prefixes=True)
+
+        with zipfile.ZipFile(output, 'r') as zf:
+            assert len(zf.namelist()) == 9
+            assert zf.read("0_page_001.jpg") == b"CBZ1 of page_001.jpg"
+            assert zf.read("1_page_004.jpg") == b"CBZ2 of page_004.jpg"
+            assert zf.read("2_cover.jpg") == b"CBZ1 of cover.jpg"
+
+    def test_sharded_merge_of_streams(self, temp_dir):
+        """Test that open files merged with shards give the single-writer output."""
+        chapters = []
+        for chapter in range(4):
+            path = temp_dir / f"chapter{chapter}.cbz"
+            with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+                for page in range(50):
+                    zf.writestr(f"page_{page:03d}.jpg", os.urandom(2000) * 4)
+            chapters.append(path)
+        single, sharded = temp_dir / "single.cbz", temp_dir / "sharded.cbz"
+        CBZMerger(chapters).merge(single, reproducible=True)
+
+        # Switch threads as often as possible to expose concurrent reads
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for _ in range(5):
+                files = [open(path, 'rb') for path in chapters]
+                try:
+                    CBZMerger(files).merge(sharded, reproducible=True, shards=8, force=True)
+                finally:
+                    for fp in files:
+                        fp.close()
+                assert sha256(sharded) == sha256(single)
+        finally:
+            sys.setswitchinterval(interval)
+
+    def test_buffer_reader(self):
+        """Test BufferReader read, readinto and seek semantics."""
+        reader = BufferReader(bytearray(b"0123456789"))
+
+        assert reader.read(3) == b"012"
+        assert reader.seek(-2, io.SEEK_END) == 8
+        assert reader.read() == b"89"
+        assert reader.read(5) == b""
+
+        reader.seek(4)
+        buffer = bytearray(4)
+        assert reader.readinto(buffer) == 4
+        assert buffer == b"4567"
+        assert reader.tell() == 8
+
+
+class TestHelpers:
+    """Tests for module-level helpers."""
+
+    def test_natural_sort_key(self):
+        """Test that embedded numbers sort numerically."""
+        names = ["chap10.cbz", "chap2.cbz", "Chap1.cbz", "chap1000.cbz"]
+        assert sorted(names, key=natural_sort_key) == [
+            "Chap1.cbz", "chap2.cbz", "chap10.cbz", "chap1000.cbz"
+        ]
+
+    def test_archive_fingerprint_changes_with_file(self, simple_cbz_files, temp_dir):
+        """Test that the fingerprint is stable and follows file changes."""
+        path = temp_dir / "copy.cbz"
+        path.write_bytes(simple_cbz_files[0].read_bytes())
+
+        first = archive_fingerprint(path)
+        assert archive_fingerprint(path) == first
+
+        path.write_bytes(simple_cbz_files[1].read_bytes() + b"\0")
+        assert archive_fingerprint(path) != first
+
 
 class TestCBZMergerConflictDetection:
     """Tests for conflict detection in CBZMerger."""
@@ -79,6 +244,43 @@ class TestCBZMergerConflictDetection:
         assert len(conflicts) == 0
 
 
+class TestConflictIndex:
+    """Tests for incremental conflict tracking."""
+
+    def test_matches_detect_conflicts(self, conflicting_cbz_files):
+        """Test that the index reports the same conflicts as CBZMerger."""
+        merger = CBZMerger(conflicting_cbz_files)
+        index = ConflictIndex()
+        for cbz in merger.cbz_files:
+            index.add(cbz.path, cbz.entries)
+
+        assert index.conflicts(conflicting_cbz_files) == merger.detect_conflicts()
+
+    def test_remove_and_reorder(self, conflicting_cbz_files):
+        """Test that removing or reordering archives updates the report."""
+        index = ConflictIndex()
+        for path in conflicting_cbz_files:
+            index.add(path, CBZFile.from_path(path).entries)
+
+        index.remove(conflicting_cbz_files[0])
+        remaining = conflicting_cbz_files[1:]
+        assert index.conflicts(remaining) == {"cover.jpg": [0, 1]}
+        assert index.conflicts(list(reversed(remaining))) == {"cover.jpg": [0, 1]}
+
+        # Keys missing from the order are ignored
+        assert index.conflicts(remaining[:1]) == {}
+
+    def test_readd_replaces_entries(self):
+        """Test that adding a known key replaces its entries."""
+        index = ConflictIndex()
+        index.add("a", ["cover.jpg"])
+        index.add("b", ["cover.jpg"])
+        index.add("b", ["page.jpg"])
+
+        assert len(index) == 2
+        assert index.conflicts(["a", "b"]) == {}
+
+
 class TestCBZMergerPadding:
     """Tests for padding calculation in CBZMerger."""
 
@@ -332,3 +534,294 @@ class TestCBZMergerMerging:
             assert "0/chapter1/page_002.jpg" in entries
             assert "1/chapter2/page_001.jpg" in entries
             assert "1/chapter2/page_002.jpg" in entries
+
+
+class TestMergeMemoization:
+    """Tests for skipping merges whose output is up to date."""
+
+    def test_unchanged_merge_is_skipped(self, simple_cbz_files, temp_dir):
+        """Test that merging the same inputs again leaves the output untouched."""
+        output = temp_dir / "merged.cbz"
+        first = CBZMerger(simple_cbz_files).merge(output)
+        mtime = output.stat().st_mtime_ns
+
+        second = CBZMerger(simple_cbz_files).merge(output)
+
+        assert not first.skipped and first.entries_written == 6
+        assert second.skipped and second.fingerprint == first.fingerprint
+        assert output.stat().st_mtime_ns == mtime
+        with zipfile.ZipFile(output) as zf:
+            assert zf.comment == FINGERPRINT_COMMENT + first.fingerprint.encode()
+
+    def test_force_merges_again(self, simple_cbz_files, temp_dir):
+        """Test that force ignores a matching fingerprint."""
+        output = temp_dir / "merged.cbz"
+        CBZMerger(simple_cbz_files).merge(output)
+
+        assert not CBZMerger(simple_cbz_files).merge(output, force=True).skipped
+
+    def test_changes_invalidate_output(self, simple_cbz_files, temp_dir):
+        """Test that options, order, modified inputs and a damaged output cause a merge."""
+        sources = [temp_dir / "a.cbz", temp_dir / "b.cbz"]
+        for source, original in zip(sources, simple_cbz_files):
+            source.write_bytes(original.read_bytes())
+        output = temp_dir / "merged.cbz"
+        CBZMerger(sources).merge(output)
+
+        assert not CBZMerger(sources).merge(output, use_prefixes=False).skipped
+        assert not CBZMerger(sources[::-1]).merge(output).skipped
+
+        os.utime(sources[0], ns=(0, 0))
+        assert not CBZMerger(sources).merge(output).skipped
+        assert CBZMerger(sources).merge(output).skipped
+
+        output.write_bytes(output.read_bytes()[:-30])
+        assert not CBZMerger(sources).merge(output).skipped
+
+    def test_cli_reports_hits(self, simple_cbz_files, temp_dir, capsys):
+        """Test that the CLI reports skipped merges and honours --force."""
+        args = [str(path) for path in simple_cbz_files] + ["-o", str(temp_dir / "out.cbz"), "--no-server"]
+
+        assert cli.main(args) == 0
+        assert "merge skipped" not in capsys.readouterr().out
+        assert cli.main(args) == 0
+        assert "merge skipped" in capsys.readouterr().out
+        assert cli.main(args + ["--force"]) == 0
+        assert "merge skipped" not in capsys.readouterr().out
+
+
+class TestMergeOrder:
+    """Tests for merging members in a global order across archives."""
+
+    def test_covers_first(self, simple_cbz_files, temp_dir):
+        """Test that covers of every archive come first, then the remaining pages."""
+        output = temp_dir / "merged.cbz"
+        merger = CBZMerger(simple_cbz_files)
+
+        merger.merge(output, order=merger.covers_first_order())
+
+        with zipfile.ZipFile(output) as zf:
+            assert zf.testzip() is None
+            assert zf.namelist() == ["0_page_001.jpg", "1_page_004.jpg", "0_page_002.jpg",
+                                     "0_page_003.jpg", "1_page_005.jpg", "1_page_006.jpg"]
+
+    def test_global_order_keeps_contents(self, conflicting_cbz_files, temp_dir):
+        """Test that reordering changes member order only, not names or data."""
+        merger = CBZMerger(conflicting_cbz_files)
+        merger.merge(temp_dir / "plain.cbz")
+        order = merger.global_order(lambda idx, entry: (natural_sort_key(entry), -idx))
+
+        merger.merge(temp_dir / "sorted.cbz", order=order)
+
+        with zipfile.ZipFile(temp_dir / "plain.cbz") as plain, \
+                zipfile.ZipFile(temp_dir / "sorted.cbz") as ordered:
+            names = ordered.namelist()
+            assert sorted(names) == sorted(plain.namelist()) and names != plain.namelist()
+            assert all(ordered.read(name) == plain.read(name) for name in names)
+
+    def test_order_is_validated_and_fingerprinted(self, simple_cbz_files, temp_dir):
+        """Test that invalid orders are rejected and a new order invalidates the output."""
+        output = temp_dir / "merged.cbz"
+        merger = CBZMerger(simple_cbz_files)
+
+        for order in ([0, 1], [0, 0, 1, 2, 3, 4], [1, 2, 3, 4, 5, 6]):
+            with pytest.raises(ValueError):
+                merger.merge(output, order=order)
+
+        merger.merge(output)
+        assert not merger.merge(output, order=merger.covers_first_order()).skipped
+        assert merger.merge(output, order=merger.covers_first_order()).skipped
+
+    def test_many_inputs_with_few_handles(self, many_cbz_dir, temp_dir):
+        """Test that interleaved orders over many inputs reopen each input only a few times."""
+        sources = sorted(many_cbz_dir.glob("*.cbz"))[:300]
+        merger = CBZMerger(sources)
+
+        stats = merger.merge(temp_dir / "merged.cbz", order=merger.covers_first_order(), max_open=8)
+
+        # Once for the covers, once for the rest of the pages
+        assert stats.sources_opened <= 2 * len(sources)
+        assert stats.sources_reused >= stats.entries_written - stats.sources_opened
+        with zipfile.ZipFile(temp_dir / "merged.cbz") as zf:
+            assert zf.testzip() is None
+            assert len(zf.namelist()) == stats.entries_written
+
+    def test_cli_covers_first(self, simple_cbz_files, temp_dir, capsys):
+        """Test that the CLI writes covers first and reports source reuse."""
+        output = temp_dir / "out.cbz"
+        args = [str(path) for path in simple_cbz_files] + ["-o", str(output), "--no-server"]
+
+        assert cli.main(args + ["--covers-first", "--max-open", "1"]) == 0
+
+        assert "reused" in capsys.readouterr().out
+        with zipfile.ZipFile(output) as zf:
+            assert zf.namelist()[:2] == ["0_page_001.jpg", "1_page_004.jpg"]
+
+
+def extract_folder(cbz_path: Path, folder: Path) -> Path:
+    """Unzip an archive into a folder of pages."""
+    with zipfile.ZipFile(cbz_path) as zf:
+        zf.extractall(folder)
+    return folder
+
+
+class TestImageFolders:
+    """Tests for folders of pages used as merge sources."""
+
+    def test_entries_in_natural_order(self, temp_dir):
+        """Test that pages are listed recursively in natural order, skipping hidden and non-image files."""
+        folder = temp_dir / "chapter"
+        (folder / "extra").mkdir(parents=True)
+        for name in ("p10.jpg", "p2.jpg", "p1.jpg", ".DS_Store", "extra/p1.png", "ComicInfo.xml",
+                     "Thumbs.db", "notes.txt"):
+            (folder / name).write_bytes(b"page " + name.encode())
+
+        cbz = CBZFile.from_path(folder)
+
+        assert cbz.directory
+        assert list(cbz.entries) == ["ComicInfo.xml", "extra/p1.png", "p1.jpg", "p2.jpg", "p10.jpg"]
+        assert cbz.size == sum(len(b"page " + name.encode()) for name in cbz.entries)
+        assert cbz.read_cover() == b"page extra/p1.png"
+
+    def test_merge_matches_archive(self, simple_cbz_files, temp_dir):
+        """Test that a folder merges exactly like the archive it was extracted from."""
+        folder = extract_folder(simple_cbz_files[0], temp_dir / "chapter")
+        CBZMerger(simple_cbz_files).merge(temp_dir / "from_archives.cbz")
+
+        stats = CBZMerger([folder, simple_cbz_files[1]]).merge(temp_dir / "from_folder.cbz",
+                                                                 compression="deflate:9,.jpg=store")
+
+        assert stats.entries_written == 6
+        with zipfile.ZipFile(temp_dir / "from_archives.cbz") as expected, \
+                zipfile.ZipFile(temp_dir / "from_folder.cbz") as merged:
+            assert merged.testzip() is None
+            assert merged.namelist() == expected.namelist()
+            assert all(merged.read(name) == expected.read(name) for name in merged.namelist())
+            assert all(info.compress_type == zipfile.ZIP_STORED for info in merged.infolist())
+
+    def test_rewritten_page_invalidates_output(self, simple_cbz_files, temp_dir):
+        """Test that changing one page makes the merge run again."""
+        folder = extract_folder(simple_cbz_files[0], temp_dir / "chapter")
+        output = temp_dir / "merged.cbz"
+        CBZMerger([folder, simple_cbz_files[1]]).merge(output)
+
+        page = folder / "page_002.jpg"
+        page.write_bytes(b"new page")
+        stat = page.stat()
+        os.utime(page, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        assert not CBZMerger([folder, simple_cbz_files[1]]).merge(output).skipped
+        with zipfile.ZipFile(output) as zf:
+            assert zf.read("0_page_002.jpg") == b"new page"
+
+    def test_folders_cannot_be_streamed(self, simple_cbz_files, temp_dir):
+        """Test that virtual merges reject folders instead of guessing CRCs."""
+        folder = extract_folder(simple_cbz_files[0], temp_dir / "chapter")
+
+        with pytest.raises(ValueError, match="Image folders"):
+            VirtualMergedCBZ(CBZMerger([folder, simple_cbz_files[1]]))
+
+    def test_cli_merges_page_folders(self, simple_cbz_files, temp_dir, capsys):
+        """Test that folders of pages found in a library are merged with its archives."""
+        library = temp_dir / "library"
+        extract_folder(simple_cbz_files[0], library / "ch1")
+        library.joinpath("ch2.cbz").write_bytes(simple_cbz_files[1].read_bytes())
+        output = temp_dir / "out.cbz"
+
+        assert cli.main([str(library), "-o", str(output), "--no-server"]) == 0
+        assert "Found 2 CBZ files" in capsys.readouterr().out
+
+        with zipfile.ZipFile(output) as zf:
+            assert zf.namelist() == ["0_page_001.jpg", "0_page_002.jpg", "0_page_003.jpg",
+                                     "1_page_004.jpg", "1_page_005.jpg", "1_page_006.jpg"]
+
+
+def sha256(path: Path) -> str:
+    """Hex digest of a file."""
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class TestReproducible:
+    """Tests for byte-identical output of reproducible merges."""
+
+    def test_same_bytes_across_runs_paths_and_times(self, simple_cbz_files, temp_dir):
+        """Test that copies of the inputs with other paths and times give the same bytes."""
+        first = temp_dir / "first.cbz"
+        CBZMerger(simple_cbz_files).merge(first, reproducible=True)
+
+        copies = []
+        for index, source in enumerate(simple_cbz_files):
+            copy = temp_dir / "elsewhere" / f"renamed_{index}.cbz"
+            copy.parent.mkdir(exist_ok=True)
+            copy.write_bytes(source.read_bytes())
+            os.utime(copy, (1_000_000_000, 1_000_000_000 + index))
+            copies.append(copy)
+        second = temp_dir / "second.cbz"
+        CBZMerger(copies).merge(second, reproducible=True)
+
+        assert sha256(first) == sha256(second)
+        with zipfile.ZipFile(first) as zf:
+            assert {info.date_time for info in zf.infolist()} == {(1980, 1, 1, 0, 0, 0)}
+
+    def test_same_bytes_with_shards_and_codecs(self, conflicting_cbz_files, temp_dir):
+        """Test that sharded writes give the same bytes as a single writer, for any codec."""
+        for policy in ("store", "lzma:9", "hot"):
+            single, sharded = temp_dir / f"single_{policy}.cbz", temp_dir / f"sharded_{policy}.cbz"
+            CBZMerger(conflicting_cbz_files).merge(single, compression=policy, reproducible=True)
+            CBZMerger(conflicting_cbz_files).merge(sharded, compression=policy, reproducible=True, shards=3)
+
+            assert sha256(single) == sha256(sharded), policy
+
+    def test_fingerprint_tracks_contents(self, simple_cbz_files, temp_dir):
+        """Test that touched inputs are still up to date and changed contents are not."""
+        output = temp_dir / "merged.cbz"
+        sources = [temp_dir / "a.cbz", temp_dir / "b.cbz"]
+        for source, original in zip(sources, simple_cbz_files):
+            source.write_bytes(original.read_bytes())
+        CBZMerger(sources).merge(output)
+        assert not CBZMerger(sources).merge(output, reproducible=True).skipped
+        digest = sha256(output)
+
+        os.utime(sources[0], (2_000_000_000, 2_000_000_000))
+        assert CBZMerger(sources).merge(output, reproducible=True).skipped
+
+        with zipfile.ZipFile(sources[1], 'a') as zf:
+            zf.writestr("page_007.jpg", b"new page")
+        assert not CBZMerger(sources).merge(output, reproducible=True).skipped
+        assert sha256(output) != digest
+
+    def test_cli_reproducible(self, simple_cbz_files, temp_dir):
+        """Test that forced re-merges from the CLI give the same bytes."""
+        output = temp_dir / "out.cbz"
+        args = [str(path) for path in simple_cbz_files] + ["-o", str(output), "--no-server", "--reproducible"]
+
+        assert cli.main(args) == 0
+        digest = sha256(output)
+        assert cli.main(args + ["--force"]) == 0
+        assert sha256(output) == digest
+
+
+class TestZip64Output:
+    """Tests for outputs needing ZIP64 records."""
+
+    def test_more_members_than_a_plain_zip_lists(self, temp_dir):
+        """Test that a merge of over 65,535 members writes a ZIP64 archive every reader lists."""
+        sources = []
+        for chapter in range(2):
+            source = temp_dir / f"chapter{chapter}.cbz"
+            with zipfile.ZipFile(source, 'w') as zf:
+                for page in range(33_000):
+                    zf.writestr(f"p{page}.jpg", b"")
+            sources.append(source)
+        output = temp_dir / "omnibus.cbz"
+
+        CBZMerger(sources).merge(output, compression="store", shards=2)
+
+        with open(output, 'rb') as fp:
+            end = zipio.find_end_record(fp)
+        assert end.zip64 and end.entry_count == 66_000
+        with zipfile.ZipFile(output) as zf:
+            names = zf.namelist()
+            assert len(names) == 66_000 and names[-1] == "1_p32999.jpg"
+            assert zf.read("1_p32999.jpg") == b""
+        assert CBZMerger(sources).merge(output, compression="store").skipped
@@ -0,0 +1,118 @@
+"""Unit tests for compression codecs and policies."""
+
+import zipfile
+
+import pytest
+
+from comick_merger import cli
+from comick_merger.cbz_merger import CBZMerger
+from comick_merger.codecs_policy import (
+    DEFAULT_POLICY, ZIP_ZSTANDARD, Codec, CompressionPolicy, available_codecs, parse_codec, parse_policy
+)
+
+
+TEXT = b"<ComicInfo><Title>Chapter</Title></ComicInfo>\n" * 2000
+
+
+class TestParsing:
+    """Tests for codec and policy specs."""
+
+    def test_parse_codec(self):
+        """Test that levels default per codec and are range checked."""
+        assert parse_codec("store") == Codec("store")
+        assert parse_codec("deflate") == Codec("deflate", 6)
+        assert parse_codec("LZMA:9") == Codec("lzma", 9)
+        assert str(parse_codec("bzip2:1")) == "bzip2:1"
+
+        for spec in ("gzip", "deflate:10", "bzip2:0", "lzma:x", "store:1"):
+            with pytest.raises(ValueError):
+                parse_codec(spec)
+
+    def test_zstd_needs_support(self):
+        """Test that Zstandard is offered only when zipfile can write it."""
+        assert ("zstd" in available_codecs()) == (ZIP_ZSTANDARD is not None)
+        if ZIP_ZSTANDARD is None:
+            with pytest.raises(ValueError, match="newer Python"):
+                parse_codec("zstd:3")
+
+    def test_parse_policy(self):
+        """Test default codecs, extension overrides and presets."""
+        policy = parse_policy("lzma:9, .JPG=store,.png=deflate:9")
+
+        assert policy.codec_for("0_page_001.jpg") == Codec("store")
+        assert policy.codec_for("01/scan.PNG") == Codec("deflate", 9)
+        assert policy.codec_for("ComicInfo.xml") == Codec("lzma", 9)
+        assert str(policy) == "lzma:9,.jpg=store,.png=deflate:9"
+        assert parse_policy(None) is DEFAULT_POLICY
+        assert parse_policy("default") == DEFAULT_POLICY
+        assert parse_policy("archive").default == Codec("lzma", 9)
+
+        with pytest.raises(ValueError):
+            parse_policy("lzma:9,jpg=store")
+
+
+class TestCodecs:
+    """Tests for writing merged archives with each codec."""
+
+    @pytest.mark.parametrize("spec", sorted(
+        f"{name}:{high}" if high is not None else name for name, (_, high) in available_codecs().items()
+    ))
+    def test_merge_with_codec(self, simple_cbz_files, temp_dir, spec):
+        """Test that every available codec produces an archive zipfile reads back."""
+        source = temp_dir / "text.cbz"
+        with zipfile.ZipFile(source, 'w') as zf:
+            zf.writestr("ComicInfo.xml", TEXT)
+        output = temp_dir / "merged.cbz"
+
+        CBZMerger([source] + simple_cbz_files).merge(output, compression=spec)
+
+        with zipfile.ZipFile(output) as zf:
+            assert zf.testzip() is None
+            assert zf.read("0_ComicInfo.xml") == TEXT
+            assert {info.compress_type for info in zf.infolist()} == {parse_codec(spec).method}
+
+    def test_levels_are_applied(self):
+        """Test that levels reach the compressor, including LZMA which zipfile fixes at 6."""
+        for name, (low, high) in available_codecs().items():
+            if low is None:
+                continue
+            data = bytes(range(256)) * 64 + TEXT
+            assert len(Codec(name, high).compress(data)) <= len(Codec(name, low).compress(data))
+        # LZMA properties (dictionary size) follow the 4-byte framing
+        assert Codec("lzma", 0).compress(TEXT)[4:9] != Codec("lzma", 9).compress(TEXT)[4:9]
+
+    def test_policy_per_member(self, simple_cbz_files, temp_dir):
+        """Test that extension overrides pick the codec of each member."""
+        source = temp_dir / "text.cbz"
+        with zipfile.ZipFile(source, 'w') as zf:
+            zf.writestr("ComicInfo.xml", TEXT)
+        output = temp_dir / "merged.cbz"
+
+        CBZMerger([source] + simple_cbz_files).merge(
+            output, compression=CompressionPolicy(Codec("bzip2", 9), ((".jpg", Codec("store")),))
+        )
+
+        with zipfile.ZipFile(output) as zf:
+            methods = {info.filename: info.compress_type for info in zf.infolist()}
+        assert methods.pop("0_ComicInfo.xml") == zipfile.ZIP_BZIP2
+        assert set(methods.values()) == {zipfile.ZIP_STORED}
+
+    def test_policy_is_fingerprinted(self, simple_cbz_files, temp_dir):
+        """Test that changing the policy invalidates an up to date output."""
+        output = temp_dir / "merged.cbz"
+        merger = CBZMerger(simple_cbz_files)
+
+        merger.merge(output)
+        assert merger.merge(output, compression="deflate:6").skipped
+        assert not merger.merge(output, compression="lzma:9").skipped
+        assert merger.merge(output, compression="lzma:9").skipped
+
+    def test_cli_rejects_invalid_policy(self, simple_cbz_files, temp_dir, capsys):
+        """Test that the CLI reports malformed policies before merging."""
+        args = [str(path) for path in simple_cbz_files] + ["-o", str(temp_dir / "out.cbz"), "--no-server"]
+
+        assert cli.main(args + ["--compression", "deflate:12"]) == 1
+        assert "between 0 and 9" in capsys.readouterr().err
+        assert not (temp_dir / "out.cbz").exists()
+
+        assert cli.main(args + ["--compression", "bzip2:5"]) == 0
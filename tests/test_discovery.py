@@ -0,0 +1,119 @@
+"""Unit tests for input discovery in directory trees."""
+
+import zipfile
+
+from comick_merger import cli
+from comick_merger.cbz_merger import CBZMerger
+from comick_merger.discovery import is_zip_archive, iter_inputs, walk_sources
+
+
+def make_tree(root, simple_cbz_files):
+    """Library with nested folders, misnamed archives and non-archives."""
+    page = simple_cbz_files[0].read_bytes()
+    layout = {
+        "Series/Vol 10/ch100.cbz": page,
+        "Series/Vol 2/ch10.cbz": page,
+        "Series/Vol 2/ch9.cbz": page,
+        "Series/Vol 2/notes.cbz": b"not an archive",
+        "Series/Vol 2/extra.bin": page,
+        "Series/cover.jpg": b"\xff\xd8\xff\xd9",
+        "Series/ch1.CBZ": page,
+    }
+    for name, data in layout.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    with zipfile.ZipFile(root / "Series" / "Vol 2" / "empty.zip", 'w'):
+        pass
+    return root / "Series"
+
+
+class TestDiscovery:
+    """Tests for walk_sources and iter_inputs."""
+
+    def test_magic_bytes(self, simple_cbz_files, temp_dir):
+        """Test that archives are recognised by content, not extension."""
+        (temp_dir / "fake.cbz").write_bytes(b"Rar!\x1a\x07\x00")
+        (temp_dir / "real.dat").write_bytes(simple_cbz_files[0].read_bytes())
+
+        assert not is_zip_archive(temp_dir / "fake.cbz")
+        assert is_zip_archive(temp_dir / "real.dat")
+        assert not is_zip_archive(temp_dir / "missing.cbz")
+
+    def test_natural_depth_first_order(self, simple_cbz_files, temp_dir):
+        """Test that archives come out in natural order of their path."""
+        root = make_tree(temp_dir, simple_cbz_files)
+
+        found = [path.relative_to(root).as_posix() for path in walk_sources(root)]
+
+        assert found == ["ch1.CBZ", "Vol 2/ch9.cbz", "Vol 2/ch10.cbz", "Vol 2/empty.zip",
+                         "Vol 2/extra.bin", "Vol 10/ch100.cbz"]
+
+    def test_iter_inputs_mixes_files_and_folders(self, simple_cbz_files, temp_dir):
+        """Test that files keep their place and folders are expanded in place."""
+        root = make_tree(temp_dir / "library", simple_cbz_files)
+        inputs = [simple_cbz_files[1], root / "Vol 10", simple_cbz_files[0]]
+
+        assert list(iter_inputs(inputs)) == [simple_cbz_files[1], root / "Vol 10" / "ch100.cbz",
+                                             simple_cbz_files[0]]
+
+    def test_early_close_stops_walk(self, many_cbz_dir):
+        """Test that the consumer can stop before the walk is over."""
+        inputs = iter_inputs([many_cbz_dir], queue_size=4)
+        first = [next(inputs) for _ in range(3)]
+        inputs.close()
+
+        assert [path.name for path in first] == ["chap1.cbz", "chap2.cbz", "chap3.cbz"]
+
+    def test_streamed_into_merger(self, many_cbz_dir):
+        """Test that a merger can be built while the tree is walked."""
+        merger = CBZMerger(iter_inputs([many_cbz_dir]))
+
+        assert len(merger.cbz_files) == sum(1 for _ in many_cbz_dir.glob("*.cbz"))
+        assert [cbz.path.name for cbz in merger.cbz_files[3:9]] == [
+            "chap9.cbz", "chap10.cbz", "chap11.cbz", "chap1000.cbz", "chap10000.cbz", "chapter00000.cbz"
+        ]
+
+    def test_cli_accepts_directories(self, simple_cbz_files, temp_dir, capsys):
+        """Test that the CLI merges a folder, skipping non-archives and its own output."""
+        root = make_tree(temp_dir / "library", simple_cbz_files)
+        output = root / "omnibus.cbz"
+        args = [str(root), "-o", str(output), "--no-server"]
+
+        assert cli.main(args) == 0
+        assert "Found 6 CBZ files" in capsys.readouterr().out
+        assert cli.main(args + ["--force"]) == 0
+        assert "Found 6 CBZ files" in capsys.readouterr().out
+
+        with zipfile.ZipFile(output) as zf:
+            assert zf.namelist()[:3] == ["0_page_001.jpg", "0_page_002.jpg", "0_page_003.jpg"]
+
+    def test_page_folders_are_sources(self, simple_cbz_files, temp_dir):
+        """Test that folders of images are yielded whole, in place, and folders with archives are walked."""
+        root = make_tree(temp_dir, simple_cbz_files)
+        for name in ("Vol 2/ch9.5/p1.jpg", "Vol 2/ch9.5/p2.png", "Vol 2/ch9.5/scans/p3.jpg"):
+            (root / name).parent.mkdir(parents=True, exist_ok=True)
+            (root / name).write_bytes(b"\xff\xd8\xff\xd9")
+
+        found = [path.relative_to(root).as_posix() for path in walk_sources(root)]
+
+        assert found[:4] == ["ch1.CBZ", "Vol 2/ch9.cbz", "Vol 2/ch9.5", "Vol 2/ch10.cbz"]
+        assert list(walk_sources(root / "Vol 2" / "ch9.5")) == [root / "Vol 2" / "ch9.5"]
+
+    def test_images_beside_archive_folders(self, simple_cbz_files, temp_dir):
+        """Test that a folder with a cover and volumes of archives is walked, not taken as pages."""
+        root = temp_dir / "Series"
+        for name in ("cover.jpg", "Vol 1/ch1.cbz", "Vol 2/ch2.cbz"):
+            (root / name).parent.mkdir(parents=True, exist_ok=True)
+            (root / name).write_bytes(simple_cbz_files[0].read_bytes() if name.endswith(".cbz") else b"\xff\xd8")
+
+        found = [path.relative_to(root).as_posix() for path in walk_sources(root)]
+
+        assert found == ["Vol 1/ch1.cbz", "Vol 2/ch2.cbz"]
+
+    def test_half_chapters_after_base_chapter(self, simple_cbz_files, temp_dir):
+        """Test that extensions are left out of the order: ch9.5.cbz comes after ch9.cbz."""
+        for name in ("ch10.cbz", "ch9.5.cbz", "ch9.cbz"):
+            (temp_dir / name).write_bytes(simple_cbz_files[0].read_bytes())
+
+        assert [path.name for path in walk_sources(temp_dir)] == ["ch9.cbz", "ch9.5.cbz", "ch10.cbz"]
@@ -0,0 +1,160 @@
+"""Unit tests for the columnar entry table and member list."""
+
+import io
+import zipfile
+
+import pytest
+
+from comick_merger.cbz_merger import CBZFile, CBZMerger
+from comick_merger.entries import EntryTable, EntryView, MemberList
+
+
+def table_of(*archives):
+    """Build a table with one archive per list of names."""
+    table = EntryTable()
+    for archive_id, names in enumerate(archives):
+        for name in names:
+            table.append(name, archive_id)
+    return table
+
+
+class TestEntryTable:
+    """Tests for EntryTable and EntryView."""
+
+    def test_view_behaves_like_a_list(self):
+        """Test that a view reads, indexes and compares like a list of names."""
+        table = table_of(["a.jpg", "é/ü.png"], ["b.jpg"])
+        view = table.view(0, 2)
+
+        assert len(view) == 2
+        assert view[1] == "é/ü.png"
+        assert view[-1] == "é/ü.png"
+        assert view[0:1] == ["a.jpg"]
+        assert list(view) == ["a.jpg", "é/ü.png"]
+        assert view == ["a.jpg", "é/ü.png"]
+        assert "b.jpg" not in view
+        with pytest.raises(IndexError):
+            view[2]
+
+    def test_find_conflicts(self):
+        """Test that conflicts list each archive once, in first-appearance order."""
+        table = table_of(
+            ["page_2.jpg", "page_1.jpg", "only_0.jpg"],
+            ["page_1.jpg", "page_2.jpg", "page_2.jpg"],
+            ["only_2.jpg"],
+            ["page_2.jpg"],
+        )
+
+        conflicts = table.find_conflicts()
+
+        assert list(conflicts) == ["page_2.jpg", "page_1.jpg"]
+        assert conflicts["page_2.jpg"] == [0, 1, 3]
+        assert conflicts["page_1.jpg"] == [0, 1]
+
+    def test_duplicate_within_one_archive_is_not_a_conflict(self):
+        """Test that a name repeated inside a single archive is not reported."""
+        table = table_of(["a.jpg", "a.jpg"], ["b.jpg"])
+
+        assert table.find_conflicts() == {}
+
+    def test_extend_copies_columns(self, conflicting_cbz_files):
+        """Test that extending from a view copies names and metadata under the new id."""
+        cbz = CBZFile.from_path(conflicting_cbz_files[1])
+        table = table_of(["first.jpg"])
+
+        view = table.extend(cbz.entries, 7)
+
+        assert list(view) == list(cbz.entries)
+        assert table.name(0) == "first.jpg"
+        assert list(table.archive_ids[1:]) == [7] * len(cbz.entries)
+        source = cbz.entries.table
+        assert table.crcs[1:] == source.crcs[cbz.entries.start:cbz.entries.stop]
+        assert table.sizes[1:] == source.sizes[cbz.entries.start:cbz.entries.stop]
+
+    def test_columns_match_zipfile(self, conflicting_cbz_files):
+        """Test that scanned columns hold the archive's central directory values."""
+        cbz = CBZFile.from_path(conflicting_cbz_files[0])
+        table, start = cbz.entries.table, cbz.entries.start
+
+        with zipfile.ZipFile(conflicting_cbz_files[0]) as zf:
+            infos = [info for info in zf.infolist() if not info.is_dir()]
+
+        assert isinstance(cbz.entries, EntryView)
+        for row, info in enumerate(infos, start):
+            assert table.name(row) == info.filename
+            assert table.sizes[row] == info.file_size
+            assert table.compressed_sizes[row] == info.compress_size
+            assert table.crcs[row] == info.CRC
+            assert table.methods[row] == info.compress_type
+            assert table.header_offsets[row] == info.header_offset
+
+    def test_merger_shares_one_table(self, conflicting_cbz_files):
+        """Test that all archives of a merger live in a single table, by index."""
+        merger = CBZMerger(conflicting_cbz_files)
+
+        assert all(cbz.entries.table is merger.table for cbz in merger.cbz_files)
+        assert sorted(set(merger.table.archive_ids)) == [0, 1, 2]
+
+        reordered = CBZMerger.from_cbz_files(merger.cbz_files[::-1])
+        assert reordered.table is not merger.table
+        assert reordered.detect_conflicts()["cover.jpg"] == [0, 1, 2]
+
+
+def written_member(index: int, offset: int) -> zipfile.ZipInfo:
+    """ZipInfo of a member as the merge writes it."""
+    zinfo = zipfile.ZipInfo(f"{index:05d}_page_é{index}.jpg", (2024, 2, 29, 23, 59, 58))
+    zinfo.create_system = 3
+    zinfo.external_attr = 0o600 << 16
+    zinfo.compress_type = zipfile.ZIP_LZMA if index % 3 == 0 else zipfile.ZIP_DEFLATED
+    zinfo.CRC = index * 2654435761 & 0xFFFFFFFF
+    zinfo.file_size = 250_000 + index
+    zinfo.compress_size = 240_000
+    zinfo.header_offset = offset
+    return zinfo
+
+
+def central_directory(filelist) -> bytes:
+    """Central directory and end records zipfile writes for ``filelist``."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        zf.filelist = filelist
+    return buffer.getvalue()
+
+
+class TestMemberList:
+    """Tests for MemberList."""
+
+    def test_members_round_trip(self):
+        """Test that members read back with the fields zipfile writes to the central directory."""
+        members = MemberList()
+        original = written_member(3, 5 * 2**32)
+        members.append(original)
+
+        (zinfo,) = members
+        assert len(members) == 1
+        for field in ("filename", "date_time", "CRC", "compress_size", "file_size", "header_offset",
+                      "compress_type", "flag_bits", "create_system", "create_version",
+                      "extract_version", "external_attr"):
+            assert getattr(zinfo, field) == getattr(original, field)
+        assert members[-1].filename == original.filename
+
+    def test_zipfile_writes_the_same_central_directory(self):
+        """Test that the central directory is byte-identical, ZIP64 records included."""
+        # Over 65,535 members, the later ones past 4 GiB
+        offsets = [index * 70_000 for index in range(70_000)]
+        zinfos = [written_member(index, offset) for index, offset in enumerate(offsets)]
+        members = MemberList()
+        for index, offset in enumerate(offsets):
+            members.append(written_member(index, offset))
+
+        expected = central_directory(zinfos)
+        assert b'PK\x06\x06' in expected[-200:]  # ZIP64 end record
+        assert central_directory(members) == expected
+
+    def test_extra_fields_are_refused(self):
+        """Test that a member with data the list does not keep is rejected."""
+        zinfo = written_member(1, 0)
+        zinfo.extra = b'\x35\xd9\x00\x00'
+
+        with pytest.raises(ValueError):
+            MemberList().append(zinfo)
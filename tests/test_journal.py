@@ -0,0 +1,132 @@
+"""Unit tests for resumable merges with a checkpoint journal."""
+
+import gc
+import warnings
+import zipfile
+
+import pytest
+
+from comick_merger.cbz_merger import CBZMerger, MergeCancelled, temp_output_path
+from comick_merger.journal import journal_path
+
+
+def _interrupt_after(count):
+    """Progress callback raising once ``count`` entries were written."""
+    def progress(event):
+        if event.entries_done == count:
+            raise MergeCancelled("simulated crash")
+    return progress
+
+
+@pytest.fixture
+def chapters(many_cbz_dir):
+    """Twenty small chapters (3 pages each)."""
+    return sorted(many_cbz_dir.glob("chapter*.cbz"))[:20]
+
+
+class TestResumableMerge:
+    """Tests for journaled merges and --resume."""
+
+    def test_journal_removed_after_success(self, chapters, temp_dir):
+        """Test that a completed journaled merge leaves no journal behind."""
+        output = temp_dir / "merged.cbz"
+
+        CBZMerger(chapters).merge(output, journal=True)
+
+        assert output.exists()
+        assert not journal_path(temp_output_path(output)).exists()
+
+    def test_failed_merge_keeps_partial_and_journal(self, chapters, temp_dir):
+        """Test that an interrupted journaled merge keeps its state."""
+        output = temp_dir / "merged.cbz"
+
+        with pytest.raises(MergeCancelled):
+            CBZMerger(chapters).merge(output, journal=True, progress=_interrupt_after(25))
+
+        assert not output.exists()
+        assert temp_output_path(output).exists()
+        lines = journal_path(temp_output_path(output)).read_text().splitlines()
+        assert len(lines) == 1 + 25  # Header + one record per written entry
+
+    def test_resume_continues_where_it_stopped(self, chapters, temp_dir):
+        """Test that resuming only writes the missing entries and yields a valid archive."""
+        output = temp_dir / "merged.cbz"
+        with pytest.raises(MergeCancelled):
+            CBZMerger(chapters).merge(output, journal=True, progress=_interrupt_after(25))
+
+        events = []
+        CBZMerger(chapters).merge(output, resume=True, progress=events.append)
+
+        assert events[0].entries_done == 26
+        assert not temp_output_path(output).exists()
+        with zipfile.ZipFile(output, 'r') as zf:
+            assert zf.testzip() is None
+            names = zf.namelist()
+
+        expected = temp_dir / "expected.cbz"
+        CBZMerger(chapters).merge(expected)
+        with zipfile.ZipFile(expected, 'r') as zf:
+            assert names == zf.namelist()
+
+    def test_resume_truncates_to_last_valid_member(self, chapters, temp_dir):
+        """Test that a torn last record and trailing garbage are discarded."""
+        output = temp_dir / "merged.cbz"
+        with pytest.raises(MergeCancelled):
+            CBZMerger(chapters).merge(output, journal=True, progress=_interrupt_after(10))
+
+        journal = journal_path(temp_output_path(output))
+        lines = journal.read_text().splitlines()
+        # Simulate a crash while writing the tenth record
+        journal.write_text("\n".join(lines[:-1]) + "\n" + lines[-1][:15])
+        with open(temp_output_path(output), 'ab') as f:
+            f.write(b"garbage")
+
+        events = []
+        CBZMerger(chapters).merge(output, resume=True, progress=events.append)
+
+        assert events[0].entries_done == 10
+        with zipfile.ZipFile(output, 'r') as zf:
+            assert zf.testzip() is None
+            assert len(zf.namelist()) == 60
+
+    def test_resume_ignores_journal_of_other_plan(self, chapters, temp_dir):
+        """Test that a journal from different inputs or options is not reused."""
+        output = temp_dir / "merged.cbz"
+        with pytest.raises(MergeCancelled):
+            CBZMerger(chapters).merge(output, journal=True, progress=_interrupt_after(10))
+
+        events = []
+        CBZMerger(chapters).merge(output, use_prefixes=False, resume=True, progress=events.append)
+
+        assert events[0].entries_done == 1
+        with zipfile.ZipFile(output, 'r') as zf:
+            assert all("/" in name for name in zf.namelist())
+
+    def test_resume_without_journal_starts_fresh(self, chapters, temp_dir):
+        """Test that --resume on a clean directory is a normal merge."""
+        output = temp_dir / "merged.cbz"
+
+        CBZMerger(chapters).merge(output, resume=True)
+
+        with zipfile.ZipFile(output, 'r') as zf:
+            assert len(zf.namelist()) == 60
+
+    def test_resume_with_no_valid_record(self, chapters, temp_dir):
+        """Test that a journal with no usable record is restarted without leaking its handle."""
+        output = temp_dir / "merged.cbz"
+        with pytest.raises(MergeCancelled):
+            CBZMerger(chapters).merge(output, journal=True, progress=_interrupt_after(10))
+
+        journal = journal_path(temp_output_path(output))
+        journal.write_text(journal.read_text().splitlines()[0] + "\n")
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", ResourceWarning)
+            CBZMerger(chapters).merge(output, resume=True)
+            gc.collect()
+
+        assert not [warning for warning in caught if warning.category is ResourceWarning]
+        assert not journal.exists()
+        with zipfile.ZipFile(output, 'r') as zf:
+            assert zf.testzip() is None
+            assert len(zf.namelist()) == 60
@@ -0,0 +1,159 @@
+"""Unit tests for differential chapter edits of merged archives."""
+
+import zipfile
+
+import pytest
+
+from comick_merger import cli
+from comick_merger.cbz_merger import FINGERPRINT_COMMENT, CBZMerger
+from comick_merger.patch import _padding_sizes, remove_chapter, replace_chapter
+
+
+def merged_contents(path):
+    """{name: data} of an archive, after checking its CRCs."""
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        return {name: zf.read(name) for name in zf.namelist()}
+
+
+def make_chapter(path, pages):
+    """Chapter archive holding ``pages`` (name -> data)."""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as zf:
+        for name, data in pages.items():
+            zf.writestr(name, data)
+    return path
+
+
+class TestPatch:
+    """Tests for replace_chapter and remove_chapter."""
+
+    @pytest.fixture
+    def omnibus(self, simple_cbz_files, temp_dir):
+        """Three-chapter merge: simple_1, simple_2, simple_1 again."""
+        output = temp_dir / "omnibus.cbz"
+        CBZMerger([simple_cbz_files[0], simple_cbz_files[1], simple_cbz_files[0]]).merge(output)
+        return output
+
+    def test_replace_matches_full_merge(self, simple_cbz_files, temp_dir, omnibus):
+        """Test that replacing a chapter gives the same members as merging again."""
+        expected = temp_dir / "expected.cbz"
+        CBZMerger([simple_cbz_files[0], simple_cbz_files[0], simple_cbz_files[0]]).merge(expected)
+
+        stats = replace_chapter(omnibus, 1, simple_cbz_files[0])
+
+        assert (stats.members_kept, stats.members_removed, stats.members_written) == (6, 3, 3)
+        assert not stats.in_place and stats.bytes_copied > 0
+        with zipfile.ZipFile(omnibus) as zf:
+            assert zf.namelist() == ["0_page_001.jpg", "0_page_002.jpg", "0_page_003.jpg",
+                                     "1_page_001.jpg", "1_page_002.jpg", "1_page_003.jpg",
+                                     "2_page_001.jpg", "2_page_002.jpg", "2_page_003.jpg"]
+            assert not zf.comment.startswith(FINGERPRINT_COMMENT)
+        assert merged_contents(omnibus) == merged_contents(expected)
+
+    def test_untouched_members_copied_verbatim(self, simple_cbz_files, omnibus):
+        """Test that kept members are not recompressed, even if the policy changes."""
+        with zipfile.ZipFile(omnibus) as zf:
+            before = {info.filename: (info.CRC, info.compress_size, info.compress_type)
+                      for info in zf.infolist()}
+
+        replace_chapter(omnibus, 2, simple_cbz_files[1], compression="store")
+
+        with zipfile.ZipFile(omnibus) as zf:
+            after = {info.filename: (info.CRC, info.compress_size, info.compress_type)
+                     for info in zf.infolist()}
+            assert {zf.getinfo(name).compress_type for name in zf.namelist() if name[0] == "2"} \
+                == {zipfile.ZIP_STORED}
+        assert {name: after[name] for name in after if name[0] != "2"} == \
+               {name: before[name] for name in before if name[0] != "2"}
+
+    def test_remove_and_add_back(self, simple_cbz_files, omnibus):
+        """Test that a removed chapter can be added back at its place."""
+        original = merged_contents(omnibus)
+
+        assert remove_chapter(omnibus, 1).members_removed == 3
+        assert sorted(merged_contents(omnibus)) == [name for name in sorted(original) if name[0] != "1"]
+
+        replace_chapter(omnibus, 1, simple_cbz_files[1])
+        with zipfile.ZipFile(omnibus) as zf:
+            assert zf.namelist() == list(original)
+        assert merged_contents(omnibus) == original
+
+    def test_invalid_chapters(self, simple_cbz_files, omnibus):
+        """Test that missing or too wide chapters are rejected without touching the archive."""
+        original = omnibus.read_bytes()
+
+        with pytest.raises(ValueError, match="not found"):
+            remove_chapter(omnibus, 5)
+        with pytest.raises(ValueError, match="does not fit"):
+            replace_chapter(omnibus, 10, simple_cbz_files[0])
+        assert omnibus.read_bytes() == original
+
+    def test_covers_first_archive_rejected(self, simple_cbz_files, temp_dir):
+        """Test that an archive whose chapters are interleaved (covers first) is not patched."""
+        omnibus = temp_dir / "covers.cbz"
+        merger = CBZMerger(simple_cbz_files)
+        merger.merge(omnibus, order=merger.covers_first_order())
+        original = omnibus.read_bytes()
+
+        with pytest.raises(ValueError, match="covers first"):
+            replace_chapter(omnibus, 0, simple_cbz_files[1])
+        with pytest.raises(ValueError, match="covers first"):
+            remove_chapter(omnibus, 1, in_place=True)
+        assert omnibus.read_bytes() == original
+
+    def test_in_place_last_chapter(self, simple_cbz_files, omnibus):
+        """Test that the last chapter is edited in place, whatever the new size."""
+        big = make_chapter(omnibus.with_name("big.cbz"), {f"p{i}.jpg": bytes([i]) * 5000 for i in range(5)})
+
+        stats = replace_chapter(omnibus, 2, big, in_place=True)
+
+        assert stats.in_place and stats.bytes_copied == 0
+        contents = merged_contents(omnibus)
+        assert [name for name in contents if name[0] == "2"] == [f"2_p{i}.jpg" for i in range(5)]
+
+        assert remove_chapter(omnibus, 2, in_place=True).in_place
+        assert len(merged_contents(omnibus)) == 6
+
+    def test_in_place_when_chapter_fits(self, temp_dir):
+        """Test that a smaller chapter is written in place, the rest padded, else copied."""
+        chapters = [make_chapter(temp_dir / f"c{i}.cbz", {f"p{j}.jpg": bytes([i]) * 3000 for j in range(3)})
+                    for i in range(3)]
+        omnibus = temp_dir / "omnibus.cbz"
+        CBZMerger(chapters).merge(omnibus, compression="store")
+        size = omnibus.stat().st_size
+        small = make_chapter(temp_dir / "small.cbz", {"p0.jpg": b"fixed", "p1.jpg": b"page"})
+
+        stats = replace_chapter(omnibus, 1, small, compression="store", in_place=True)
+
+        assert stats.in_place
+        assert omnibus.stat().st_size < size
+        contents = merged_contents(omnibus)
+        assert contents["1_p0.jpg"] == b"fixed" and contents["2_p2.jpg"] == bytes([2]) * 3000
+
+        # The padding keeps the original space: the original chapter fits back
+        assert replace_chapter(omnibus, 1, chapters[1], compression="store", in_place=True).in_place
+        assert merged_contents(omnibus)["1_p2.jpg"] == bytes([1]) * 3000
+
+        # A larger one does not: falls back to a copy
+        large = make_chapter(temp_dir / "large.cbz", {f"p{j}.jpg": b"x" * 3000 for j in range(4)})
+        assert not replace_chapter(omnibus, 1, large, compression="store", in_place=True).in_place
+        assert merged_contents(omnibus)["1_p3.jpg"] == b"x" * 3000
+
+    def test_padding_sizes(self):
+        """Test that gaps are split into valid padding fields or rejected."""
+        assert _padding_sizes(0, 0) == []
+        assert _padding_sizes(10, 2) == [10, 0]
+        assert _padding_sizes(2, 3) is None
+        assert _padding_sizes(10, 0) is None
+        sizes = _padding_sizes(65517, 2)
+        assert sum(sizes) == 65517 and all(size == 0 or 4 <= size <= 65515 for size in sizes)
+
+    def test_cli_patch(self, simple_cbz_files, omnibus, capsys):
+        """Test the patch subcommand."""
+        assert cli.main(["patch", str(omnibus), "1", "--replace", str(simple_cbz_files[0])]) == 0
+        assert "Replaced chapter 1" in capsys.readouterr().out
+        assert merged_contents(omnibus)["1_page_001.jpg"] == merged_contents(omnibus)["0_page_001.jpg"]
+
+        assert cli.main(["patch", str(omnibus), "0", "--remove", "--in-place"]) == 0
+        assert "Removed chapter 0" in capsys.readouterr().out
+        assert cli.main(["patch", str(omnibus), "0", "--remove"]) == 1
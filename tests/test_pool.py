@@ -0,0 +1,50 @@
+"""Unit tests for the pool of open source archives."""
+
+import io
+
+from comick_merger.cbz_merger import CBZFile
+from comick_merger.pool import SourcePool
+
+
+class TestSourcePool:
+    """Tests for SourcePool."""
+
+    def test_open_handles_are_bounded(self, many_cbz_dir):
+        """Test that at most max_open archives are open and evicted ones are closed."""
+        cbz_files = [CBZFile.from_path(path) for path in sorted(many_cbz_dir.glob("*.cbz"))[:10]]
+        pool = SourcePool(cbz_files, max_open=3)
+
+        handles = [pool.get(idx) for idx in range(10)]
+
+        assert pool.stats() == {"open": 3, "opened": 10, "reused": 0, "evicted": 7}
+        assert all(handle.fp is None for handle in handles[:7])
+        assert pool.get(9) is handles[9]
+        assert pool.stats()["reused"] == 1
+
+        pool.close()
+        assert pool.stats()["open"] == 0
+        assert all(handle.fp is None for handle in handles)
+
+    def test_reads_members(self, simple_cbz_files):
+        """Test that members are read from reused handles."""
+        cbz_files = [CBZFile.from_path(path) for path in simple_cbz_files]
+        with SourcePool(cbz_files) as pool:
+            for cbz_id, cbz in enumerate(cbz_files):
+                for entry in cbz.entries:
+                    assert pool.read(cbz_id, entry)
+
+            assert pool.stats()["opened"] == len(cbz_files)
+            assert pool.stats()["reused"] == sum(len(cbz.entries) for cbz in cbz_files) - len(cbz_files)
+
+    def test_stream_sources_stay_open(self, simple_cbz_files):
+        """Test that raw pools close their own streams but not the caller's."""
+        stream = io.BytesIO(simple_cbz_files[0].read_bytes())
+        cbz_files = [CBZFile.from_source(stream), CBZFile.from_path(simple_cbz_files[1])]
+        pool = SourcePool(cbz_files, max_open=1, raw=True)
+
+        assert pool.get(0) is stream
+        own = pool.get(1)
+
+        assert not stream.closed
+        pool.close()
+        assert own.closed and not stream.closed
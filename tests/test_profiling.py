@@ -0,0 +1,104 @@
+"""Unit tests for timing spans and the sampling profiler."""
+
+import json
+import pstats
+import threading
+import time
+
+from comick_merger import cli, profiling
+from comick_merger.cbz_merger import CBZMerger
+
+
+def busy(seconds):
+    """Burn CPU in Python code for ``seconds``."""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(100))
+
+
+class TestSpans:
+    """Tests for named timing spans."""
+
+    def test_nested_spans_are_counted(self):
+        """Test that every span records its calls and inclusive time."""
+        profiling.reset_spans()
+        with profiling.span("outer"):
+            for _ in range(3):
+                with profiling.span("inner"):
+                    time.sleep(0.001)
+
+        totals = profiling.span_totals()
+        assert totals["outer"].count == 1 and totals["inner"].count == 3
+        assert totals["outer"].seconds >= totals["inner"].seconds >= 0.003
+        assert "outer" in profiling.format_spans(totals).splitlines()[0]
+
+    def test_merge_phases(self, simple_cbz_files, temp_dir):
+        """Test that scanning, conflict detection and merge phases are timed."""
+        profiling.reset_spans()
+        merger = CBZMerger(simple_cbz_files)
+        merger.detect_conflicts()
+        merger.merge(temp_dir / "out.cbz")
+
+        totals = profiling.span_totals()
+        assert totals["CBZFile.from_path"].count == 2
+        assert totals["merge.compress"].count == 6
+        for name in ("detect_conflicts", "merge.plan", "merge.read", "merge.write", "merge.finish"):
+            assert totals[name].count >= 1, name
+
+
+class TestSampler:
+    """Tests for the sampling profiler."""
+
+    def test_samples_other_threads_with_spans(self, temp_dir):
+        """Test that stacks of worker threads are sampled under their active spans."""
+        def work():
+            with profiling.span("work"):
+                busy(0.2)
+
+        with profiling.Sampler(interval=0.002) as sampler:
+            thread = threading.Thread(target=work, name="worker")
+            thread.start()
+            thread.join()
+
+        # The thread may be sampled while starting, before its span opens
+        stacks = [stack for stack in sampler.stacks
+                  if stack[0] == "thread worker" and any(frame.startswith("busy (") for frame in stack)]
+        assert stacks and all(stack[1] == "[work]" for stack in stacks)
+
+        sampler.write(temp_dir / "out.collapsed")
+        lines = (temp_dir / "out.collapsed").read_text().splitlines()
+        assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) == sum(sampler.stacks.values())
+
+    def test_speedscope_output(self, temp_dir):
+        """Test that .json paths get a weighted speedscope profile."""
+        sampler = profiling.Sampler(interval=0.01)
+        sampler.sample()
+        sampler.sample()
+        sampler.write(temp_dir / "out.json")
+
+        profile = json.loads((temp_dir / "out.json").read_text())
+        frames = profile["shared"]["frames"]
+        (sampled,) = profile["profiles"]
+        assert sampled["type"] == "sampled" and len(sampled["samples"]) == len(sampled["weights"])
+        assert abs(sum(sampled["weights"]) - 0.01 * sum(sampler.stacks.values())) < 1e-9
+        assert all(0 <= index < len(frames) for sample in sampled["samples"] for index in sample)
+
+
+class TestCLIProfiling:
+    """Tests for --profile and --sample."""
+
+    def test_profile_and_sample(self, simple_cbz_files, temp_dir, capsys):
+        """Test that a profiled merge writes both outputs and prints the spans."""
+        args = [str(path) for path in simple_cbz_files] + [
+            "-o", str(temp_dir / "out.cbz"),
+            "--profile", str(temp_dir / "merge.prof"),
+            "--sample", str(temp_dir / "merge.collapsed"),
+        ]
+
+        assert cli.main(args) == 0
+
+        out = capsys.readouterr().out
+        assert "Timing spans:" in out and "merge.write" in out
+        stats = pstats.Stats(str(temp_dir / "merge.prof"))
+        assert any(func[2] == "merge" for func in stats.stats)
+        assert (temp_dir / "merge.collapsed").exists()
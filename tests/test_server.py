@@ -0,0 +1,159 @@
+"""Unit tests for the persistent merge server and its client."""
+
+import os
+import threading
+import zipfile
+
+import pytest
+
+from comick_merger import cli, server
+
+
+@pytest.fixture
+def merge_server(temp_dir):
+    """A merge server running in a background thread."""
+    address = ("unix", str(temp_dir / "server.sock"))
+    instance = server.MergeServer(address, workers=2, queue_size=1)
+    thread = threading.Thread(target=instance.serve_forever, daemon=True)
+    thread.start()
+    yield instance
+    instance.shutdown()
+    thread.join()
+
+
+class TestAddress:
+    """Tests for server address parsing."""
+
+    def test_parse_address(self):
+        """Test Unix and TCP address specs."""
+        assert server.parse_address("unix:/tmp/x.sock") == ("unix", "/tmp/x.sock")
+        assert server.parse_address("tcp:127.0.0.1:9000") == ("tcp", ("127.0.0.1", 9000))
+
+    def test_parse_invalid_address(self):
+        """Test that malformed specs are rejected."""
+        with pytest.raises(ValueError):
+            server.parse_address("http://localhost")
+
+    def test_env_override(self, monkeypatch):
+        """Test that COMICK_SERVER selects the default address."""
+        monkeypatch.setenv(server.ADDRESS_ENV, "tcp:127.0.0.1:9001")
+        assert server.default_address() == ("tcp", ("127.0.0.1", 9001))
+
+
+class TestMergeServer:
+    """Tests for MergeServer."""
+
+    def test_ping(self, merge_server):
+        """Test that a running server answers pings."""
+        assert server.ping(merge_server.address)["ok"]
+
+    def test_no_server(self, temp_dir):
+        """Test that the client reports a missing server as None."""
+        assert server.ping(("unix", str(temp_dir / "missing.sock"))) is None
+
+    def test_merge_job_uses_warm_cache(self, merge_server, conflicting_cbz_files, temp_dir):
+        """Test that a second job reuses the scanned metadata."""
+        output = temp_dir / "merged.cbz"
+
+        response = server.submit_merge(conflicting_cbz_files, output, address=merge_server.address)
+
+        assert response["ok"]
+        assert response["conflicts"]["cover.jpg"] == [0, 1, 2]
+        with zipfile.ZipFile(output, 'r') as zf:
+            assert len(zf.namelist()) == 9
+
+        server.submit_merge(conflicting_cbz_files, output, check_only=True,
+                            address=merge_server.address)
+
+        stats = server.request({"op": "stats"}, merge_server.address)["cache"]
+        assert stats == {"archives": 3, "hits": 3, "misses": 3}
+
+    def test_job_errors_are_reported(self, merge_server, simple_cbz_files, invalid_cbz_dir, temp_dir):
+        """Test that a failing job returns an error instead of crashing the server."""
+        sources = [simple_cbz_files[0], invalid_cbz_dir / "not_a_zip.cbz"]
+
+        response = server.submit_merge(sources, temp_dir / "merged.cbz", address=merge_server.address)
+
+        assert not response["ok"]
+        assert "Not a valid ZIP/CBZ file" in response["error"]
+        assert server.ping(merge_server.address)["ok"]
+
+    def test_busy_server_refuses_jobs(self, merge_server, simple_cbz_files, temp_dir):
+        """Test that jobs beyond workers + queue size are refused."""
+        for _ in range(3):
+            merge_server._slots.acquire()
+
+        response = merge_server.dispatch({
+            "op": "merge", "sources": [str(p) for p in simple_cbz_files],
+            "output": str(temp_dir / "merged.cbz"),
+        })
+
+        assert response["busy"]
+        assert not (temp_dir / "merged.cbz").exists()
+
+    def test_socket_is_owner_only(self, merge_server):
+        """Test that other users cannot connect to the Unix socket."""
+        assert os.stat(merge_server.address[1]).st_mode & 0o777 == 0o600
+
+    def test_tcp_is_loopback_only(self):
+        """Test that non-loopback TCP addresses need an explicit opt-in."""
+        assert server.is_loopback("127.0.0.1") and server.is_loopback("localhost")
+        assert not server.is_loopback("0.0.0.0")
+        with pytest.raises(ValueError, match="allow-remote"):
+            server.MergeServer(("tcp", ("0.0.0.0", 0)))
+
+        instance = server.MergeServer(("tcp", ("127.0.0.1", 0)))
+        thread = threading.Thread(target=instance.serve_forever, daemon=True)
+        thread.start()
+        instance.shutdown()
+        thread.join()
+
+    def test_refuses_second_server(self, merge_server):
+        """Test that a second server cannot steal a live socket."""
+        with pytest.raises(RuntimeError, match="already running"):
+            server.MergeServer(merge_server.address)
+
+
+class TestCLIClient:
+    """Tests for the CLI using a running server transparently."""
+
+    def test_cli_uses_running_server(self, merge_server, simple_cbz_files, temp_dir, monkeypatch, capsys):
+        """Test that a plain CLI invocation is handled by the server."""
+        monkeypatch.setenv(server.ADDRESS_ENV, f"unix:{merge_server.address[1]}")
+        output = temp_dir / "merged.cbz"
+
+        assert cli.main([str(p) for p in simple_cbz_files] + ["-o", str(output)]) == 0
+
+        out = capsys.readouterr().out
+        assert "merge server" in out
+        assert "Read 0.0 MB" in out and "MB/s" in out
+        assert output.exists()
+        assert merge_server.cache.stats()["misses"] == 2
+
+    def test_cli_ignores_server_of_other_version(self, merge_server, simple_cbz_files, temp_dir,
+                                                 monkeypatch, capsys):
+        """Test that a server from another install is not used, by the CLI or submit_merge."""
+        monkeypatch.setenv(server.ADDRESS_ENV, f"unix:{merge_server.address[1]}")
+        monkeypatch.setattr(server, "__version__", "0.0.1")
+        output = temp_dir / "merged.cbz"
+
+        assert cli.main([str(p) for p in simple_cbz_files] + ["-o", str(output)]) == 0
+
+        captured = capsys.readouterr()
+        assert "runs version 0.0.1" in captured.err
+        assert "merge server" not in captured.out
+        assert output.exists()
+        assert merge_server.cache.stats()["misses"] == 0
+
+        response = merge_server.dispatch({"op": "merge", "version": "9.9", "sources": [], "output": ""})
+        assert response["version_mismatch"] and not response["ok"]
+
+    def test_cli_falls_back_without_server(self, simple_cbz_files, temp_dir, monkeypatch, capsys):
+        """Test that the CLI merges locally when no server is listening."""
+        monkeypatch.setenv(server.ADDRESS_ENV, f"unix:{temp_dir / 'missing.sock'}")
+        output = temp_dir / "merged.cbz"
+
+        assert cli.main([str(p) for p in simple_cbz_files] + ["-o", str(output)]) == 0
+
+        assert "merge server" not in capsys.readouterr().out
+        assert output.exists()
@@ -0,0 +1,91 @@
+"""Unit tests for sharded merges."""
+
+import threading
+import zipfile
+
+import pytest
+
+from comick_merger.cbz_merger import CBZMerger, MergeCancelled, temp_output_path
+from comick_merger.shards import copy_into, shard_bounds
+
+
+def contents(path):
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        return [(info.filename, zf.read(info)) for info in zf.infolist()]
+
+
+class TestHelpers:
+    """Tests for shard planning and fragment copies."""
+
+    def test_shard_bounds(self):
+        """Test that slices are contiguous, non-empty and balanced by weight."""
+        assert shard_bounds([10] * 8, 4) == [0, 2, 4, 6, 8]
+        assert shard_bounds([100, 1, 1, 1], 2) == [0, 1, 4]
+        assert shard_bounds([0] * 5, 2) == [0, 3, 5]
+        assert shard_bounds([5, 5], 8) == [0, 1, 2]
+        assert shard_bounds([], 3) == [0]
+
+    def test_copy_into(self, temp_dir):
+        """Test that a file is appended at the current position of the output."""
+        (temp_dir / "fragment").write_bytes(b"fragment" * 1000)
+
+        with open(temp_dir / "output", 'w+b') as output:
+            output.write(b"head")
+            assert copy_into(temp_dir / "fragment", output) == 8000
+            output.write(b"tail")
+
+        assert (temp_dir / "output").read_bytes() == b"head" + b"fragment" * 1000 + b"tail"
+
+
+class TestShardedMerge:
+    """Tests for merge(shards=N)."""
+
+    @pytest.mark.parametrize("shards", [2, 3, 16])
+    def test_same_archive_as_serial(self, conflicting_cbz_files, nested_cbz_files, temp_dir, shards):
+        """Test that sharded writing gives the same members, in the same order."""
+        merger = CBZMerger(conflicting_cbz_files + nested_cbz_files)
+        merger.merge(temp_dir / "serial.cbz", compression="lzma:1")
+
+        stats = merger.merge(temp_dir / "sharded.cbz", compression="lzma:1", shards=shards, force=True)
+
+        assert stats.entries_written == len(contents(temp_dir / "serial.cbz"))
+        assert contents(temp_dir / "sharded.cbz") == contents(temp_dir / "serial.cbz")
+        assert merger.is_up_to_date(temp_dir / "sharded.cbz", compression="lzma:1")
+        assert not list(temp_dir.glob("*.shard*"))
+
+    def test_many_inputs_global_order(self, many_cbz_dir, temp_dir):
+        """Test sharding a reordered merge of many inputs with progress from every shard."""
+        merger = CBZMerger(sorted(many_cbz_dir.glob("*.cbz"))[:200])
+        order = merger.covers_first_order()
+        updates = []
+
+        merger.merge(temp_dir / "serial.cbz", order=order)
+        merger.merge(temp_dir / "sharded.cbz", order=order, shards=4, max_open=8,
+                     progress=updates.append)
+
+        assert contents(temp_dir / "sharded.cbz") == contents(temp_dir / "serial.cbz")
+        assert sorted(update.entries_done for update in updates) == list(range(1, len(order) + 1))
+
+    def test_cancel_removes_fragments(self, many_cbz_dir, temp_dir):
+        """Test that cancelling a sharded merge leaves no partial output or fragments."""
+        cancel = threading.Event()
+        merger = CBZMerger(sorted(many_cbz_dir.glob("*.cbz"))[:50])
+        output = temp_dir / "merged.cbz"
+
+        def cancel_soon(update):
+            if update.entries_done == 10:
+                cancel.set()
+
+        with pytest.raises(MergeCancelled):
+            merger.merge(output, shards=4, progress=cancel_soon, cancel_event=cancel)
+
+        assert sorted(path.name for path in temp_dir.iterdir()) == []
+        assert not temp_output_path(output).exists()
+
+    def test_invalid_options(self, simple_cbz_files, temp_dir):
+        """Test that shards cannot be journaled and must be positive."""
+        merger = CBZMerger(simple_cbz_files)
+        for options in ({"shards": 0}, {"shards": 2, "journal": True}, {"shards": 2, "resume": True}):
+            with pytest.raises(ValueError):
+                merger.merge(temp_dir / "merged.cbz", **options)
@@ -0,0 +1,169 @@
+"""Unit tests for I/O throttling."""
+
+import json
+import zipfile
+
+import pytest
+
+from comick_merger import batch, cbz_merger
+from comick_merger.cbz_merger import CBZMerger
+from comick_merger.throttle import TokenBucket, parse_rate
+
+
+class FakeClock:
+    """Clock advanced only by the bucket's own sleeps."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class TestParseRate:
+    """Tests for parse_rate."""
+
+    @pytest.mark.parametrize("spec, expected", [
+        ("800", 800),
+        ("500K", 500 * 1024),
+        ("20m", 20 * 1024 ** 2),
+        ("1.5GiB/s", int(1.5 * 1024 ** 3)),
+        ("2MB", 2 * 1024 ** 2),
+        (4096, 4096),
+        (None, None),
+        ("", None),
+    ])
+    def test_valid_rates(self, spec, expected):
+        """Test that rates with binary units are parsed to bytes per second."""
+        assert parse_rate(spec) == expected
+
+    @pytest.mark.parametrize("spec", ["fast", "10X", "-5M", "0", 0])
+    def test_invalid_rates(self, spec):
+        """Test that malformed and non-positive rates are rejected."""
+        with pytest.raises(ValueError):
+            parse_rate(spec)
+
+
+class TestTokenBucket:
+    """Tests for TokenBucket."""
+
+    def test_burst_then_rate(self):
+        """Test that a full bucket passes a burst, then transfers settle at the rate."""
+        clock = FakeClock()
+        bucket = TokenBucket(1000, burst=250, clock=clock, sleep=clock.sleep)
+
+        assert bucket.consume(250) == 0.0
+        for _ in range(4):
+            bucket.consume(250)
+
+        assert clock.now == pytest.approx(1.0)
+        assert bucket.consumed == 1250
+        assert bucket.waited == pytest.approx(1.0)
+
+    def test_large_request_goes_through(self):
+        """Test that a request larger than the bucket waits for its debt instead of blocking."""
+        clock = FakeClock()
+        bucket = TokenBucket(100, burst=10, clock=clock, sleep=clock.sleep)
+
+        assert bucket.consume(510) == pytest.approx(5.0)
+
+    def test_idle_time_refills_up_to_burst(self):
+        """Test that idle time refills the bucket, but never beyond its capacity."""
+        clock = FakeClock()
+        bucket = TokenBucket(100, burst=50, clock=clock, sleep=clock.sleep)
+        bucket.consume(50)
+
+        clock.now += 60
+        assert bucket.consume(50) == 0.0
+        assert bucket.consume(10) == pytest.approx(0.1)
+
+
+class TestThrottledMerge:
+    """Tests for merge read and write limits."""
+
+    def test_stats_report_throughput(self, simple_cbz_files, temp_dir):
+        """Test that a merge reports the bytes it read and wrote."""
+        output = temp_dir / "merged.cbz"
+        merger = CBZMerger(simple_cbz_files)
+
+        stats = merger.merge(output)
+
+        assert stats.bytes_read == sum(info.compress_size for path in simple_cbz_files
+                                       for info in zipfile.ZipFile(path).infolist())
+        assert stats.bytes_written == output.stat().st_size
+        assert stats.throttled_seconds == 0.0
+        assert stats.write_rate > 0
+
+    @pytest.mark.parametrize("shards", [1, 2])
+    def test_read_limit_slows_merge(self, simple_cbz_files, temp_dir, shards):
+        """Test that a read limit makes the merge wait, without changing its output."""
+        merger = CBZMerger(simple_cbz_files)
+        merger.merge(temp_dir / "free.cbz", shards=shards)
+        total = merger.merge(temp_dir / "measure.cbz", force=True).bytes_read
+
+        # Twice the total per second: about a quarter second over the burst
+        stats = merger.merge(temp_dir / "limited.cbz", shards=shards, read_limit=total * 2)
+
+        assert stats.throttled_seconds > 0.15
+        assert stats.seconds >= stats.throttled_seconds
+        with zipfile.ZipFile(temp_dir / "free.cbz") as free, \
+                zipfile.ZipFile(temp_dir / "limited.cbz") as limited:
+            assert [(info.filename, info.CRC) for info in free.infolist()] == \
+                [(info.filename, info.CRC) for info in limited.infolist()]
+
+    def test_shards_capped_by_max_open(self, simple_cbz_files, temp_dir, monkeypatch):
+        """Test that no more shards run than inputs may be open at once."""
+        shard_counts = []
+        shard_bounds = cbz_merger.shard_bounds
+
+        def record(weights, shards):
+            shard_counts.append(shards)
+            return shard_bounds(weights, shards)
+
+        monkeypatch.setattr(cbz_merger, "shard_bounds", record)
+        CBZMerger(simple_cbz_files).merge(temp_dir / "out.cbz", shards=8, max_open=2)
+
+        assert shard_counts == [2]
+
+    def test_write_limit_slows_merge(self, simple_cbz_files, temp_dir):
+        """Test that a write limit makes the merge wait."""
+        merger = CBZMerger(simple_cbz_files)
+        size = merger.merge(temp_dir / "measure.cbz").bytes_written
+
+        # Members make up about half of the archive: over half a second at this rate
+        stats = merger.merge(temp_dir / "limited.cbz", write_limit=size // 2)
+
+        assert stats.throttled_seconds > 0.15
+
+
+class TestBatchLimits:
+    """Tests for per-job limits in the batch queue."""
+
+    def test_limits_are_stored_per_job(self, simple_cbz_files, temp_dir):
+        """Test that enqueue stores parsed limits, and workers report throughput."""
+        queue = batch.WorkQueue(temp_dir / "queue")
+        job_id = queue.enqueue(simple_cbz_files, temp_dir / "out.cbz", max_open=2,
+                               read_limit="64M", write_limit=1 << 30)
+
+        job = json.loads((queue.pending / f"{job_id}.json").read_text())
+        assert (job["max_open"], job["read_limit"], job["write_limit"]) == (2, 64 << 20, 1 << 30)
+
+        lines = []
+        batch.run_worker(queue.root, log=lines.append)
+        assert "MB/s" in lines[-1]
+        result = json.loads((queue.done / f"{job_id}.json").read_text())
+        assert result["bytes_written"] == (temp_dir / "out.cbz").stat().st_size
+        assert result["bytes_read"] > 0
+
+    @pytest.mark.parametrize("limits", [{"read_limit": "lots"}, {"write_limit": "-1M"}, {"max_open": 0}])
+    def test_invalid_limits_are_rejected(self, simple_cbz_files, temp_dir, limits):
+        """Test that a job with an invalid limit is not queued."""
+        queue = batch.WorkQueue(temp_dir / "queue")
+
+        with pytest.raises(ValueError):
+            queue.enqueue(simple_cbz_files, temp_dir / "out.cbz", **limits)
+
+        assert queue.status()["pending"] == 0
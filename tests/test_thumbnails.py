@@ -0,0 +1,69 @@
+"""Unit tests for GUI thumbnail caching."""
+
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip("PyQt6")
+
+from PyQt6.QtCore import QSize  # noqa: E402
+from PyQt6.QtGui import QImage  # noqa: E402
+
+from comick_merger import thumbnails  # noqa: E402
+from comick_merger.cbz_merger import archive_fingerprint  # noqa: E402
+from comick_merger.thumbnails import ThumbnailLoader, prune_disk_cache  # noqa: E402
+
+
+class TestPruneDiskCache:
+    """Tests for prune_disk_cache."""
+
+    def test_removes_least_recently_used(self, temp_dir):
+        """Test that the oldest thumbnails are deleted until the budget is met."""
+        for index in range(4):
+            path = temp_dir / f"thumb{index}.png"
+            path.write_bytes(b"x" * 100)
+            os.utime(path, ns=(index * 10**9, index * 10**9))
+
+        remaining = prune_disk_cache(temp_dir, 250)
+
+        assert remaining == 200
+        assert sorted(path.name for path in temp_dir.glob("*.png")) == ["thumb2.png", "thumb3.png"]
+
+
+class TestThumbnailLoader:
+    """Tests for ThumbnailLoader cache keys."""
+
+    def test_lookups_use_last_fingerprint(self, simple_cbz_files, temp_dir, monkeypatch):
+        """Test that GUI-side lookups never fingerprint, and a reloaded archive replaces its thumbnail."""
+        path = temp_dir / "chapter.cbz"
+        shutil.copy(simple_cbz_files[0], path)
+        loader = ThumbnailLoader(QSize(8, 8))
+        image = QImage(8, 8, QImage.Format.Format_RGB32)
+        loader._on_done(str(path), archive_fingerprint(path), image, False)
+
+        def no_disk_access(path):
+            raise AssertionError("fingerprint computed on the GUI thread")
+
+        monkeypatch.setattr(thumbnails, "archive_fingerprint", no_disk_access)
+        assert loader.cached(path) is not None
+        loader._request(path)
+        assert not loader._in_flight
+
+        # A task that found the archive changed replaces the old thumbnail
+        loader._on_done(str(path), "changed", image, False)
+        assert len(loader.cache) == 1 and loader.cached(path) is not None
+
+    def test_forget_clears_failures_and_thumbnail(self, temp_dir):
+        """Test that forget() lets a failed or cached archive be loaded again."""
+        path = temp_dir / "chapter.cbz"
+        loader = ThumbnailLoader(QSize(8, 8))
+        loader._on_done(str(path), "abc", QImage(8, 8, QImage.Format.Format_RGB32), False)
+
+        loader.forget(path)
+        assert loader.cached(path) is None and len(loader.cache) == 0
+
+        loader._on_done(str(path), "", QImage(), False)
+        assert path in loader._failed
+        loader.forget(path)
+        assert path not in loader._failed
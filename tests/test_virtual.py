@@ -0,0 +1,122 @@
+"""Unit tests for the virtual merged archive and its HTTP server."""
+
+import io
+import random
+import threading
+import urllib.request
+import zipfile
+from dataclasses import replace
+
+import pytest
+
+from comick_merger import zipio
+from comick_merger.cbz_merger import CBZFile, CBZMerger
+from comick_merger.entries import EntryTable
+from comick_merger.virtual import VirtualMergedCBZ, http_server, parse_range
+
+
+def merged_contents(data: bytes):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        return {name: zf.read(name) for name in zf.namelist()}
+
+
+class TestVirtualMergedCBZ:
+    """Tests for VirtualMergedCBZ."""
+
+    @pytest.mark.parametrize("use_prefixes", [True, False])
+    def test_same_members_as_merge(self, conflicting_cbz_files, nested_cbz_files, temp_dir, use_prefixes):
+        """Test that the virtual archive holds exactly what merge() writes."""
+        sources = conflicting_cbz_files + nested_cbz_files
+        output = temp_dir / "merged.cbz"
+        CBZMerger(sources).merge(output, use_prefixes=use_prefixes)
+
+        with VirtualMergedCBZ(CBZMerger(sources), use_prefixes=use_prefixes) as virtual:
+            data = virtual.read()
+
+        assert len(data) == virtual.size
+        with zipfile.ZipFile(output) as zf:
+            expected = {name: zf.read(name) for name in zf.namelist()}
+        assert merged_contents(data) == expected
+
+    def test_random_ranges(self, conflicting_cbz_files):
+        """Test that any range, including across records, matches the full stream."""
+        virtual = VirtualMergedCBZ(CBZMerger(conflicting_cbz_files))
+        data = virtual.read_at(0, virtual.size)
+        rng = random.Random(1)
+
+        for _ in range(300):
+            start = rng.randrange(virtual.size)
+            size = rng.randrange(1, 200)
+            assert virtual.read_at(start, size) == data[start:start + size]
+
+        virtual.seek(-10, io.SEEK_END)
+        assert virtual.read() == data[-10:]
+        assert virtual.read_at(virtual.size, 10) == b""
+        virtual.close()
+
+    def test_in_memory_sources(self, simple_cbz_files):
+        """Test that buffers and streams can back a virtual archive."""
+        sources = [simple_cbz_files[0].read_bytes(), io.BytesIO(simple_cbz_files[1].read_bytes())]
+
+        with VirtualMergedCBZ(CBZMerger(sources)) as virtual:
+            contents = merged_contents(virtual.read())
+
+        assert sorted(contents) == ["0_page_001.jpg", "0_page_002.jpg", "0_page_003.jpg",
+                                    "1_page_004.jpg", "1_page_005.jpg", "1_page_006.jpg"]
+        assert not sources[1].closed
+
+    def test_zip64_member_count(self, simple_cbz_files):
+        """Test that more than 65,535 members get ZIP64 records zipfile can read."""
+        source = CBZFile.from_path(simple_cbz_files[0])
+        table = EntryTable()
+        src = source.entries.table
+        for idx in range(70_000):
+            # Every member points at the same compressed page of the source
+            table.append(f"page_{idx:05d}.jpg", 0, src.sizes[0], src.compressed_sizes[0],
+                         src.crcs[0], src.methods[0], src.header_offsets[0])
+        merger = CBZMerger.from_cbz_files([replace(source, entries=table.view())])
+
+        with VirtualMergedCBZ(merger) as virtual:
+            assert zipio.find_end_record(virtual).zip64
+            with zipfile.ZipFile(virtual) as zf:
+                assert len(zf.infolist()) == 70_000
+                assert zf.read("0_page_69999.jpg") == zf.read("0_page_00000.jpg")
+
+
+class TestHTTP:
+    """Tests for streaming virtual volumes over HTTP."""
+
+    def test_parse_range(self):
+        """Test single-range parsing, including suffix and open ranges."""
+        assert parse_range(None, 100) is None
+        assert parse_range("bytes=0-9", 100) == (0, 10)
+        assert parse_range("bytes=90-", 100) == (90, 100)
+        assert parse_range("bytes=-5", 100) == (95, 100)
+        assert parse_range("bytes=50-500", 100) == (50, 100)
+        with pytest.raises(ValueError):
+            parse_range("bytes=100-", 100)
+
+    def test_range_requests(self, conflicting_cbz_files):
+        """Test full and partial downloads of a virtual volume."""
+        virtual = VirtualMergedCBZ(CBZMerger(conflicting_cbz_files))
+        server = http_server({"omnibus.cbz": virtual})
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/omnibus.cbz"
+        try:
+            with urllib.request.urlopen(url) as response:
+                full = response.read()
+                assert int(response.headers["Content-Length"]) == virtual.size
+
+            request = urllib.request.Request(url, headers={"Range": "bytes=100-199"})
+            with urllib.request.urlopen(request) as response:
+                assert response.status == 206
+                assert response.headers["Content-Range"] == f"bytes 100-199/{virtual.size}"
+                assert response.read() == full[100:200]
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+        assert merged_contents(full)
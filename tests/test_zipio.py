@@ -0,0 +1,117 @@
+"""Unit tests for the lean central directory reader, checked against zipfile."""
+
+import io
+import zipfile
+
+import pytest
+
+from comick_merger import zipio
+from comick_merger.entries import EntryTable
+
+
+def zipfile_rows(data: bytes):
+    """(name, size, compressed size, crc, method, header offset) of each file, per zipfile."""
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return [(info.filename, info.file_size, info.compress_size, info.CRC,
+                 info.compress_type, info.header_offset)
+                for info in zf.infolist() if not info.is_dir()]
+
+
+def lean_rows(data: bytes):
+    """The same rows, read by zipio."""
+    view = zipio.read_entries(io.BytesIO(data))
+    table = view.table
+    return [(table.name(row), table.sizes[row], table.compressed_sizes[row], table.crcs[row],
+             table.methods[row], table.header_offsets[row])
+            for row in range(view.start, view.stop)]
+
+
+def make_zip(names, comment=b"", compression=zipfile.ZIP_DEFLATED) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression) as zf:
+        for name in names:
+            zf.writestr(name, f"data of {name}".encode() * 3)
+        zf.comment = comment
+    return buffer.getvalue()
+
+
+class TestReadEntries:
+    """Tests for zipio.read_entries."""
+
+    def test_matches_zipfile_on_test_data(self, test_data_dir):
+        """Test that every test archive lists exactly as zipfile lists it."""
+        paths = [path for path in sorted(test_data_dir.rglob("*.cbz"))
+                 if path.parent.name != "invalid"][:200]
+        assert paths
+        for path in paths:
+            data = path.read_bytes()
+            assert lean_rows(data) == zipfile_rows(data), path
+
+    @pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED,
+                                             zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA])
+    def test_matches_zipfile_with_comment_and_unicode(self, compression):
+        """Test archives with a comment, directories and non-ASCII names."""
+        data = make_zip(["dir/", "dir/page.jpg", "chapitre é/01.png", "表紙.webp"],
+                        comment=b"Scans by someone " * 100,
+                        compression=compression)
+
+        assert lean_rows(data) == zipfile_rows(data)
+
+    def test_matches_zipfile_with_legacy_encoding(self):
+        """Test that names without the UTF-8 flag are decoded as cp437."""
+        # zipfile always writes UTF-8, patch a byte in an ASCII name instead
+        data = make_zip(["caf#.jpg"]).replace(b"caf#", b"caf\x82")
+
+        rows = lean_rows(data)
+
+        assert rows == zipfile_rows(data)
+        assert rows[0][0] == "café.jpg"
+
+    def test_matches_zipfile_with_prefix(self):
+        """Test that offsets account for data prepended to the archive."""
+        data = b"#!/bin/sh\nexit 0\n" * 10 + make_zip(["a.jpg", "b.jpg"])
+
+        rows = lean_rows(data)
+
+        assert rows == zipfile_rows(data)
+        assert rows[0][5] > 0
+
+    def test_matches_zipfile_with_zip64(self, monkeypatch):
+        """Test ZIP64 end records and extra fields, forced through small limits."""
+        monkeypatch.setattr(zipfile, "ZIP64_LIMIT", 16)
+        monkeypatch.setattr(zipfile, "ZIP_FILECOUNT_LIMIT", 2)
+        data = make_zip([f"page_{i:02d}.jpg" for i in range(5)])
+        monkeypatch.undo()
+
+        assert zipio.find_end_record(io.BytesIO(data)).zip64
+        assert lean_rows(data) == zipfile_rows(data)
+
+    def test_unsupported_archives(self):
+        """Test that non-ZIP data and corrupt directories raise UnsupportedZip."""
+        with pytest.raises(zipio.UnsupportedZip):
+            zipio.read_entries(io.BytesIO(b"not a zip file" * 10))
+
+        data = bytearray(make_zip(["a.jpg", "b.jpg"]))
+        end = zipio.find_end_record(io.BytesIO(bytes(data)))
+        second = data.index(zipio.CENTRAL_SIGNATURE, end.directory_offset + 1)
+        data[second:second + 4] = b"XXXX"
+
+        table = EntryTable()
+        table.append("kept.jpg", 0)
+        with pytest.raises(zipio.UnsupportedZip):
+            zipio.read_entries(io.BytesIO(bytes(data)), table, 1)
+        assert list(table.view()) == ["kept.jpg"]  # Partial rows rolled back
+
+
+class TestHeaders:
+    """Tests for the headers written by zipio."""
+
+    @pytest.mark.parametrize("method, version", [(zipfile.ZIP_STORED, 20), (zipfile.ZIP_BZIP2, 46),
+                                                 (zipfile.ZIP_LZMA, 63), (93, 63)])
+    def test_extract_version_per_method(self, method, version):
+        """Test that local and central headers need the version zipfile writes for each method."""
+        local = zipio.local_header(b"page.jpg", method, 0, 0, 0)
+        central = zipio.central_header(b"page.jpg", method, 0, 0, 0, 0)
+
+        assert int.from_bytes(local[4:6], 'little') == version
+        assert int.from_bytes(central[6:8], 'little') == version